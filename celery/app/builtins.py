@@ -50,6 +50,7 @@ def add_backend_cleanup_task(app):
     @app.task(name='celery.backend_cleanup', _force_evaluate=True)
     def backend_cleanup():
         app.backend.cleanup()
+        app.backend.cleanup_blobs()
     return backend_cleanup
 
 
@@ -59,15 +60,20 @@ def add_unlock_chord_task(app):
 
     It joins chords by creating a task chain polling the header for completion.
 
+    If the :setting:`CELERYD_CHORD_UNLOCKER` setting is enabled workers will
+    not execute this task, but instead keep the pending chords in a single
+    index polled with batched backend queries
+    (see :mod:`celery.worker.unlock`).
+
     """
     from celery.canvas import subtask
-    from celery.exceptions import ChordError
     from celery.result import from_serializable
 
     default_propagate = app.conf.CELERY_CHORD_PROPAGATES
 
     @app.task(name='celery.chord_unlock', max_retries=None,
-              default_retry_delay=1, ignore_result=True, _force_evaluate=True)
+              default_retry_delay=1, ignore_result=True, _force_evaluate=True,
+              Strategy='celery.worker.unlock:default')
     def unlock_chord(group_id, callback, interval=None, propagate=None,
                      max_retries=None, result=None,
                      Result=app.AsyncResult, GroupResult=app.GroupResult,
@@ -86,32 +92,9 @@ def add_unlock_chord_task(app):
             group_id,
             [from_serializable(r, app=app) for r in result],
         )
-        j = deps.join_native if deps.supports_native_join else deps.join
 
         if deps.ready():
-            callback = subtask(callback)
-            try:
-                ret = j(propagate=propagate)
-            except Exception as exc:
-                try:
-                    culprit = next(deps._failed_join_report())
-                    reason = 'Dependency {0.id} raised {1!r}'.format(
-                        culprit, exc,
-                    )
-                except StopIteration:
-                    reason = repr(exc)
-
-                app._tasks[callback.task].backend.fail_from_current_stack(
-                    callback.id, exc=ChordError(reason),
-                )
-            else:
-                try:
-                    callback.delay(ret)
-                except Exception as exc:
-                    app._tasks[callback.task].backend.fail_from_current_stack(
-                        callback.id,
-                        exc=ChordError('Callback error: {0!r}'.format(exc)),
-                    )
+            app.backend.on_chord_ready(deps, subtask(callback), propagate)
         else:
             return unlock_chord.retry(countdown=interval,
                                       max_retries=max_retries)
@@ -145,7 +128,9 @@ def add_chunk_task(app):
     from celery.canvas import chunks as _chunks
 
     @app.task(name='celery.chunks', _force_evaluate=True)
-    def chunks(task, it, n):
+    def chunks(task, it, n=None, target_runtime=None):
+        if n is None:
+            return _chunks.apply_adaptive(task, it, target_runtime)
         return _chunks.apply_chunks(task, it, n)
     return chunks
 
@@ -154,13 +139,18 @@ def add_chunk_task(app):
 def add_group_task(app):
     _app = app
     from celery.canvas import maybe_subtask, subtask
-    from celery.result import from_serializable
+    from celery.result import ResultSequence, from_serializable
+    from celery.utils.functional import chunks as _chunks
 
     class Group(app.Task):
         app = _app
         name = 'celery.group'
         accept_magic_kwargs = False
 
+        #: Default number of tasks evaluated and published at a time
+        #: by :meth:`stream`.
+        stream_window = 1000
+
         def run(self, tasks, result, group_id, partial_args):
             app = self.app
             result = from_serializable(result, app)
@@ -218,6 +208,43 @@ def add_group_task(app):
             return super(Group, self).apply(
                 self.prepare(options, args=args, **kwargs),
                 **options).get()
+
+        def stream(self, tasks, partial_args=(), window=None, save=False,
+                   task_id=None, **options):
+            """Publish the members of a group directly while consuming
+            the `tasks` iterator, `window` tasks at a time.
+
+            The member task ids are made from the group id and a counter,
+            so the group result is stored in a compact form (and saved
+            after every window if `save` is enabled).
+
+            """
+            app = self.app
+            window = window or self.stream_window
+            group_id = task_id or uuid()
+            members = ResultSequence(group_id, app=app)
+            if app.conf.CELERY_ALWAYS_EAGER:
+                return app.GroupResult(group_id, [
+                    maybe_subtask(task).clone(partial_args).apply(
+                        task_id=members.task_id(i), group_id=group_id,
+                    ) for i, task in enumerate(tasks)
+                ])
+            result = app.GroupResult(group_id, members)
+            for part in _chunks(iter(tasks), window):
+                with app.producer_or_acquire() as pub:
+                    for task in part:
+                        maybe_subtask(task).clone(partial_args).apply_async(
+                            task_id=members.task_id(members.count),
+                            group_id=group_id, publisher=pub,
+                            add_to_parent=False, **options
+                        )
+                        members.count += 1
+                if save:
+                    result.save()
+            parent = get_current_worker_task()
+            if parent:
+                parent.request.children.append(result)
+            return result
     return Group
 
 
@@ -305,7 +332,7 @@ def add_chord_task(app):
     can be used as a subtask, and this generates the task
     responsible for that."""
     from celery import group
-    from celery.canvas import maybe_subtask
+    from celery.canvas import maybe_subtask, chord as _chord
     _app = app
     default_propagate = app.conf.CELERY_CHORD_PROPAGATES
 
@@ -317,7 +344,7 @@ def add_chord_task(app):
 
         def run(self, header, body, partial_args=(), interval=None,
                 countdown=1, max_retries=None, propagate=None,
-                eager=False, **kwargs):
+                eager=False, reduce_fanin=None, **kwargs):
             propagate = default_propagate if propagate is None else propagate
             group_id = uuid()
             AsyncResult = self.app.AsyncResult
@@ -325,7 +352,13 @@ def add_chord_task(app):
 
             # - convert back to group if serialized
             tasks = header.tasks if isinstance(header, group) else header
-            header = group([maybe_subtask(s).clone() for s in tasks])
+            tasks = [maybe_subtask(s).clone() for s in tasks]
+            # - wide fan-in is split into a tree of intermediate chords
+            if reduce_fanin and len(tasks) > reduce_fanin:
+                tasks = _chord.reduce_tree(
+                    tasks, maybe_subtask(body), reduce_fanin,
+                )
+            header = group(tasks)
             # - eager applies the group inline
             if eager:
                 return header.apply(args=partial_args, task_id=group_id)
@@ -102,8 +102,8 @@ class Inspect(object):
     def conf(self):
         return self._request('dump_conf')
 
-    def hello(self):
-        return self._request('hello')
+    def hello(self, **kwargs):
+        return self._request('hello', **kwargs)
 
     def memsample(self):
         return self._request('memsample')
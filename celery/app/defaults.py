@@ -114,8 +114,14 @@ NAMESPACES = {
         'EAGER_PROPAGATES_EXCEPTIONS': Option(False, type='bool'),
         'ENABLE_UTC': Option(True, type='bool'),
         'EVENT_SERIALIZER': Option('json'),
+        'EVENT_BATCH_COMPRESSION': Option('zlib', type='string'),
+        'EVENT_BATCH_INTERVAL': Option(0.5, type='float'),
+        'EVENT_BATCH_SIZE': Option(0, type='int'),
         'EVENT_QUEUE_EXPIRES': Option(None, type='float'),
         'EVENT_QUEUE_TTL': Option(None, type='float'),
+        'EVENT_RATE_LIMITS': Option(None, type='dict'),
+        'EVENT_SAMPLING': Option(None, type='dict'),
+        'EVENT_STATE': Option('celery.events.state:State'),
         'IMPORTS': Option((), type='tuple'),
         'INCLUDE': Option((), type='tuple'),
         'IGNORE_RESULT': Option(False, type='bool'),
@@ -128,6 +134,10 @@ NAMESPACES = {
         'REDIS_PASSWORD': Option(type='string', **_REDIS_OLD),
         'REDIS_MAX_CONNECTIONS': Option(type='int'),
         'RESULT_BACKEND': Option(type='string'),
+        'RESULT_BLOB_STORE': Option(type='string'),
+        'RESULT_BLOB_THRESHOLD': Option(type='int'),
+        'RESULT_COMPRESSION': Option(type='string'),
+        'RESULT_COMPRESSION_THRESHOLD': Option(1024, type='int'),
         'RESULT_DB_SHORT_LIVED_SESSIONS': Option(False, type='bool'),
         'RESULT_DB_TABLENAMES': Option(type='dict'),
         'RESULT_DBURI': Option(),
@@ -164,11 +174,17 @@ NAMESPACES = {
         'AGENT': Option(None, type='string'),
         'AUTOSCALER': Option('celery.worker.autoscale:Autoscaler'),
         'AUTORELOADER': Option('celery.worker.autoreload:Autoreloader'),
+        'CHAIN_FUSION_DEPTH': Option(0, type='int'),
+        'CHORD_UNLOCKER': Option(False, type='bool'),
         'CONCURRENCY': Option(0, type='int'),
         'TIMER': Option(type='string'),
         'TIMER_PRECISION': Option(1.0, type='float'),
         'FORCE_EXECV': Option(False, type='bool'),
+        'GOSSIP_PEERS': Option(0, type='int'),
+        'HEARTBEAT_FULL_EVERY': Option(10, type='int'),
         'HIJACK_ROOT_LOGGER': Option(True, type='bool'),
+        'MINGLE_LIMIT': Option(10, type='int'),
+        'MINGLE_TIMEOUT': Option(1.0, type='float'),
         'CONSUMER': Option('celery.worker.consumer:Consumer', type='string'),
         'LOG_FORMAT': Option(DEFAULT_PROCESS_LOG_FMT),
         'LOG_COLOR': Option(type='bool'),
@@ -192,6 +208,9 @@ NAMESPACES = {
         'SCHEDULER': Option('celery.beat:PersistentScheduler'),
         'SCHEDULE_FILENAME': Option('celerybeat-schedule'),
         'MAX_LOOP_INTERVAL': Option(0, type='float'),
+        'SHARD_DIR': Option(None, type='string'),
+        'SHARD_INTERVAL': Option(10.0, type='float'),
+        'USE_HEAP': Option(False, type='bool'),
         'LOG_LEVEL': Option('INFO', deprecate_by='2.4', remove_by='4.0',
                             alt='--loglevel argument'),
         'LOG_FILE': Option(deprecate_by='2.4', remove_by='4.0',
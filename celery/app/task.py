@@ -227,6 +227,12 @@ class Task(object):
     #: The result store backend used for this task.
     backend = None
 
+    #: Compression method used for the return value of this task
+    #: when stored in the result backend, e.g. `'zlib'` or `'bzip2'`.
+    #: Defaults to the :setting:`CELERY_RESULT_COMPRESSION` setting,
+    #: and can be disabled for this task by setting it to :const:`False`.
+    result_compression = None
+
     #: If disabled this task won't be registered automatically.
     autoregister = True
 
@@ -694,10 +700,16 @@ class Task(object):
         """``.si(*a, **k) -> .subtask(a, k, immutable=True)``"""
         return self.subtask(args, kwargs, immutable=True)
 
-    def chunks(self, it, n):
-        """Creates a :class:`~celery.canvas.chunks` task for this task."""
+    def chunks(self, it, n=None, **kwargs):
+        """Creates a :class:`~celery.canvas.chunks` task for this task.
+
+        The chunk size is adjusted to the runtime of the task if
+        a `target_runtime` keyword argument is given instead of `n`,
+        see :meth:`celery.canvas.chunks.apply_adaptive` for the caveats.
+
+        """
         from celery import chunks
-        return chunks(self.s(), it, n)
+        return chunks(self.s(), it, n, **kwargs)
 
     def map(self, it):
         """Creates a :class:`~celery.canvas.xmap` task from ``it``."""
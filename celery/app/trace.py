@@ -22,14 +22,15 @@ import sys
 from warnings import warn
 
 from billiard.einfo import ExceptionInfo
-from kombu.utils import kwdict
+from kombu.utils import kwdict, uuid
 
 from celery import current_app
 from celery import states, signals
 from celery._state import _task_stack
 from celery.app import set_default_app
-from celery.app.task import Task as BaseTask, Context
-from celery.exceptions import Ignore, RetryTaskError
+from celery.app.task import Task as BaseTask, Context, extract_exec_options
+from celery.exceptions import Ignore, QueueNotFound, RetryTaskError
+from celery.utils.functional import maybe_list
 from celery.utils.log import get_logger
 from celery.utils.objects import mro_lookup
 from celery.utils.serialization import (
@@ -50,6 +51,12 @@ FAILURE = states.FAILURE
 EXCEPTION_STATES = states.EXCEPTION_STATES
 IGNORE_STATES = frozenset([IGNORED, RETRY])
 
+#: Task options that can only be honored by sending
+#: the task as a message, so these tasks are never fused.
+FUSE_EXCLUDE_OPTIONS = (
+    'countdown', 'eta', 'expires', 'time_limit', 'soft_time_limit',
+)
+
 #: set by :func:`setup_worker_optimizations`
 _tasks = None
 _patched = {}
@@ -119,6 +126,83 @@ class TraceInfo(object):
             del(tb)
 
 
+def build_chain_fuser(app, hostname=None):
+    """Returns a function that decides if a chain callback can be executed
+    in the current process, instead of being sent as a message.
+
+    The function takes the callback signature, the positional
+    arguments for the callback and the request of the parent task,
+    and returns a function executing the callback if it can be fused,
+    or :const:`None` if it must be sent.
+
+    A callback is only fused if it would be routed to a queue
+    the worker consumes from, if it does not use any of the options
+    in :data:`FUSE_EXCLUDE_OPTIONS` or rate limits, and if less than
+    :setting:`CELERYD_CHAIN_FUSION_DEPTH` steps has been fused already.
+
+    Returns :const:`None` if chain fusion is disabled.
+
+    """
+    max_depth = app.conf.CELERYD_CHAIN_FUSION_DEPTH
+    if not max_depth:
+        return
+    queues, router = app.amqp.queues, app.amqp.router
+
+    def fuse(sig, args, parent):
+        depth = (parent.get('fused') or 0) + 1
+        if depth > max_depth or sig.subtask_type:
+            return
+        try:
+            task = app.tasks[sig.task]
+        except KeyError:
+            return
+        if task.rate_limit:
+            return
+        sig = sig.clone(args)
+        options = dict(extract_exec_options(task), **sig.options)
+        if any(options.get(key) for key in FUSE_EXCLUDE_OPTIONS):
+            return
+        try:
+            route = router.route(options, task.name, sig.args, sig.kwargs)
+        except QueueNotFound:
+            return
+        queue = route.get('queue')
+        if queue is None or queue.name not in queues.consume_from:
+            return
+        exchange = route.get('exchange')
+        exchange = getattr(exchange, 'name', exchange)
+        routing_key = route.get('routing_key')
+        if exchange and exchange != queue.exchange.name or \
+                routing_key and routing_key != queue.routing_key:
+            return
+
+        task_id = options.get('task_id') or uuid()
+        group_id = options.get('group_id')
+        request = {
+            'id': task_id,
+            'task': task.name,
+            'callbacks': maybe_list(options.get('link')),
+            'errbacks': maybe_list(options.get('link_error')),
+            'group': group_id,
+            'taskset': group_id,
+            'chord': options.get('chord'),
+            'utc': parent.utc,
+            'hostname': parent.hostname or hostname,
+            'is_eager': False,
+            'delivery_info': {
+                'exchange': queue.exchange.name,
+                'routing_key': routing_key or queue.routing_key,
+                'priority': options.get('priority'),
+            },
+            'fused': depth,
+        }
+        # the result of the next step is still a child of this task.
+        parent.children.append(task.AsyncResult(task_id))
+        return lambda: trace_task(task, task_id, sig.args, sig.kwargs,
+                                  request, hostname=hostname)
+    return fuse
+
+
 def build_tracer(name, task, loader=None, hostname=None, store_errors=True,
                  Info=TraceInfo, eager=False, propagate=False,
                  IGNORE_STATES=IGNORE_STATES):
@@ -167,6 +251,9 @@ def build_tracer(name, task, loader=None, hostname=None, store_errors=True,
         task_after_return = task.after_return
 
     store_result = backend.store_result
+    result_options = {}
+    if task.result_compression is not None:
+        result_options['compression'] = task.result_compression
     backend_cleanup = backend.process_cleanup
 
     pid = os.getpid()
@@ -185,8 +272,13 @@ def build_tracer(name, task, loader=None, hostname=None, store_errors=True,
     from celery import canvas
     subtask = canvas.subtask
 
+    fuse = None
+    if not eager:
+        fuse = build_chain_fuser(task._get_app(), hostname)
+
     def trace_task(uuid, args, kwargs, request=None):
         R = I = None
+        fused = None
         kwargs = kwdict(kwargs)
         try:
             push_task(task)
@@ -227,10 +319,20 @@ def build_tracer(name, task, loader=None, hostname=None, store_errors=True,
                 else:
                     # callback tasks must be applied before the result is
                     # stored, so that result.children is populated.
-                    [subtask(callback).apply_async((retval, ))
-                        for callback in task_request.callbacks or []]
+                    if fuse:
+                        fused = []
+                        for callback in task_request.callbacks or []:
+                            callback = subtask(callback)
+                            step = fuse(callback, (retval, ), task_request)
+                            if step is None:
+                                callback.apply_async((retval, ))
+                            else:
+                                fused.append(step)
+                    else:
+                        [subtask(callback).apply_async((retval, ))
+                            for callback in task_request.callbacks or []]
                     if publish_result:
-                        store_result(uuid, retval, SUCCESS)
+                        store_result(uuid, retval, SUCCESS, **result_options)
                     if task_on_success:
                         task_on_success(retval, uuid, args, kwargs)
                     if success_receivers:
@@ -248,6 +350,10 @@ def build_tracer(name, task, loader=None, hostname=None, store_errors=True,
                         send_postrun(sender=task, task_id=uuid, task=task,
                                      args=args, kwargs=kwargs,
                                      retval=retval, state=state)
+
+                # -*- FUSED CHAIN STEPS -*-
+                if fused:
+                    [step() for step in fused]
             finally:
                 pop_task()
                 pop_request()
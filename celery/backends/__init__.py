@@ -31,6 +31,7 @@ BACKEND_ALIASES = {
     'database': 'celery.backends.database:DatabaseBackend',
     'cassandra': 'celery.backends.cassandra:CassandraBackend',
     'couchbase': 'celery.backends.couchbase:CouchBaseBackend',
+    'sqlite': 'celery.backends.sqlite:SQLiteBackend',
     'disabled': 'celery.backends.base:DisabledBackend',
 }
 
@@ -53,6 +53,7 @@ class AMQPBackend(BaseBackend):
 
     supports_autoexpire = True
     supports_native_join = True
+    supports_meta_fields = True
 
     retry_policy = {
         'max_retries': 20,
@@ -107,14 +108,18 @@ class AMQPBackend(BaseBackend):
     def _routing_key(self, task_id):
         return task_id.replace('-', '')
 
-    def _store_result(self, task_id, result, status, traceback=None):
+    def _store_result(self, task_id, result, status, traceback=None,
+                      meta_fields=None):
         """Send task return value and status."""
+        meta = {'task_id': task_id, 'status': status,
+                'result': self.encode_result(result, status),
+                'traceback': traceback,
+                'children': self.current_task_children()}
+        if meta_fields:
+            meta.update(meta_fields)
         with self.mutex:
             with self.app.amqp.producer_pool.acquire(block=True) as pub:
-                pub.publish({'task_id': task_id, 'status': status,
-                             'result': self.encode_result(result, status),
-                             'traceback': traceback,
-                             'children': self.current_task_children()},
+                pub.publish(meta,
                             exchange=self.exchange,
                             routing_key=self._routing_key(task_id),
                             serializer=self.serializer,
@@ -142,7 +147,7 @@ class AMQPBackend(BaseBackend):
         if meta['status'] in PROPAGATE_STATES and propagate:
             raise self.exception_to_python(meta['result'])
         # consume() always returns READY_STATE.
-        return meta['result']
+        return self.load_result(meta)
 
     def get_task_meta(self, task_id, backlog_limit=1000):
         # Polling and using basic_get
@@ -16,15 +16,23 @@ from __future__ import absolute_import
 import time
 import sys
 
+from base64 import b64decode, b64encode
 from datetime import timedelta
 
 from billiard.einfo import ExceptionInfo
 from kombu import serialization
-from kombu.utils.encoding import bytes_to_str, ensure_bytes, from_utf8
+from kombu.utils import cached_property
+from kombu.compression import compress, decompress
+from kombu.utils.encoding import (
+    bytes_to_str, ensure_bytes, from_utf8, str_to_bytes,
+)
 
 from celery import states
 from celery.app import current_task
-from celery.exceptions import ChordError, TimeoutError, TaskRevokedError
+from celery.backends.blob import get_blob_store
+from celery.exceptions import (
+    ChordError, ImproperlyConfigured, TimeoutError, TaskRevokedError,
+)
 from celery.five import items
 from celery.result import from_serializable, GroupResult
 from celery.utils import timeutils
@@ -65,11 +73,50 @@ class BaseBackend(object):
     #: in this case.
     supports_autoexpire = False
 
+    #: If true the backend stores the fields returned by
+    #: :meth:`_prepare_stored` in the task metadata, which is required
+    #: to compress results or move them to the blob store.
+    supports_meta_fields = False
+
+    #: Results larger than this (in bytes, after serialization)
+    #: are moved to :attr:`blobs`.  Disabled if :const:`None`.
+    blob_threshold = None
+
+    #: Compression method used for results larger than
+    #: :attr:`compression_threshold` (in bytes, after serialization).
+    #: Can be overridden for each task using
+    #: :attr:`~celery.app.task.Task.result_compression`.
+    result_compression = None
+    compression_threshold = 1024
+
     def __init__(self, app, serializer=None,
-                 max_cached_results=None, **kwargs):
+                 max_cached_results=None, blob_threshold=None,
+                 blob_store=None, result_compression=None,
+                 compression_threshold=None, **kwargs):
         self.app = app
         conf = self.app.conf
         self.serializer = serializer or conf.CELERY_RESULT_SERIALIZER
+        self.result_compression = (result_compression or
+                                   conf.get('CELERY_RESULT_COMPRESSION') or
+                                   self.result_compression)
+        if compression_threshold is None:
+            compression_threshold = conf.get(
+                'CELERY_RESULT_COMPRESSION_THRESHOLD')
+        if compression_threshold is not None:
+            self.compression_threshold = compression_threshold
+        self.blob_threshold = (blob_threshold or
+                               conf.get('CELERY_RESULT_BLOB_THRESHOLD') or
+                               self.blob_threshold)
+        self.blob_store = blob_store or conf.get('CELERY_RESULT_BLOB_STORE')
+        if self.blob_threshold and not self.blob_store:
+            raise ImproperlyConfigured(
+                'CELERY_RESULT_BLOB_THRESHOLD requires a blob store, '
+                'please set CELERY_RESULT_BLOB_STORE')
+        if (self.result_compression or self.blob_threshold) and \
+                not self.supports_meta_fields:
+            raise ImproperlyConfigured(
+                'The {0} result backend does not support result '
+                'compression or blob stores'.format(type(self).__name__))
         (self.content_type,
          self.content_encoding,
          self.encoder) = serialization.registry._encoders[self.serializer]
@@ -186,15 +233,117 @@ class BaseBackend(object):
     def is_cached(self, task_id):
         return task_id in self._cache
 
-    def store_result(self, task_id, result, status, traceback=None, **kwargs):
-        """Update task state and result."""
+    def store_result(self, task_id, result, status, traceback=None,
+                     compression=None, **kwargs):
+        """Update task state and result.
+
+        :keyword compression: Compression method used if the result is
+            larger than :attr:`compression_threshold`, overriding
+            :attr:`result_compression`.  :const:`False` disables
+            compression.
+
+        """
         result = self.encode_result(result, status)
-        self._store_result(task_id, result, status, traceback, **kwargs)
+        stored, fields = self._prepare_stored(task_id, result, status,
+                                              compression)
+        if fields:
+            kwargs['meta_fields'] = fields
+        self._store_result(task_id, stored, status, traceback, **kwargs)
         return result
 
+    def store_results(self, results):
+        """Update the state and result of many tasks at once.
+
+        :param results: Iterable of
+            ``(task_id, result, status, traceback)`` tuples.
+
+        Backends supporting bulk writes should override
+        :meth:`_store_results` to store all of them in one operation.
+
+        The worker does not use this, as it stores the result of each
+        task when the task returns.  It is meant for code storing
+        results on behalf of many tasks, e.g. when importing results
+        or when a single task processes a batch of requests.
+
+        """
+        prepared = []
+        for task_id, result, status, traceback in results:
+            stored, fields = self._prepare_stored(
+                task_id, self.encode_result(result, status), status,
+            )
+            prepared.append((task_id, stored, status, traceback, fields))
+        self._store_results(prepared)
+
+    def _store_results(self, results):
+        # items are ``(task_id, result, status, traceback, meta_fields)``
+        for task_id, result, status, traceback, fields in results:
+            if fields:
+                self._store_result(task_id, result, status, traceback,
+                                   meta_fields=fields)
+            else:
+                self._store_result(task_id, result, status, traceback)
+
+    @cached_property
+    def blobs(self):
+        """The blob store large results are moved to
+        (see :mod:`celery.backends.blob`)."""
+        return get_blob_store(self.blob_store, app=self.app)
+
+    def _prepare_stored(self, task_id, result, status, compression=None):
+        # Returns the value to store, and the fields to add to the task
+        # metadata (if any) describing how the value is stored.
+        # Only successful results are compressed or moved to the blob
+        # store, as exceptions are small and are converted when read.
+        if compression is None:
+            compression = self.result_compression
+        if status != states.SUCCESS or not self.supports_meta_fields or \
+                not (compression or self.blob_threshold):
+            return result, None
+        payload = ensure_bytes(self.encode(result))
+        size, fields = len(payload), {}
+        if compression and size > self.compression_threshold:
+            compressed, content_type = compress(payload, compression)
+            if len(compressed) < size:
+                payload, fields['compression'] = compressed, content_type
+        if self.blob_threshold and len(payload) > self.blob_threshold:
+            self.blobs.put(task_id, payload)
+            fields['blob'] = task_id
+            return None, fields
+        if fields:
+            # stored inline as base64, which is a third larger.
+            data = b64encode(payload)
+            if len(data) < size:
+                return bytes_to_str(data), fields
+        return result, None
+
+    def load_result(self, meta):
+        """Returns the result of a successful task from its metadata,
+        decompressing it or reading it from the blob store if the
+        metadata says it was stored that way."""
+        result, compression = meta['result'], meta.get('compression')
+        blob = meta.get('blob')
+        if blob is not None:
+            if not self.blob_store:
+                raise ImproperlyConfigured(
+                    'Result was moved to a blob store, '
+                    'please set CELERY_RESULT_BLOB_STORE')
+            payload = self.blobs.get(blob)
+        elif compression:
+            payload = b64decode(str_to_bytes(result))
+        else:
+            return result
+        return self._decode_stored(payload, compression)
+
+    def _decode_stored(self, payload, content_type=None):
+        if content_type:
+            payload = decompress(payload, content_type)
+        return self.decode(payload)
+
     def forget(self, task_id):
         self._cache.pop(task_id, None)
         self._forget(task_id)
+        if self.blob_store:
+            self.blobs.delete(task_id)
 
     def _forget(self, task_id):
         raise NotImplementedError('backend does not implement forget.')
@@ -213,7 +362,7 @@ class BaseBackend(object):
         if meta['status'] in self.EXCEPTION_STATES:
             return self.exception_to_python(meta['result'])
         else:
-            return meta['result']
+            return self.load_result(meta)
 
     def get_children(self, task_id):
         """Get the list of subtasks sent by a task."""
@@ -234,6 +383,19 @@ class BaseBackend(object):
             self._cache[task_id] = meta
         return meta
 
+    def get_many_meta(self, task_ids, cache=True):
+        """Get the current metadata for many tasks at once.
+
+        Unlike :meth:`get_many` this does not wait for the tasks
+        to be ready, and returns a dict mapping task ids to metadata.
+
+        Backends supporting bulk lookups should override this
+        to fetch all of the tasks in a single round-trip.
+
+        """
+        return dict((task_id, self.get_task_meta(task_id, cache=cache))
+                    for task_id in task_ids)
+
     def reload_task_result(self, task_id):
         """Reload task result, even if it has been previously fetched."""
         self._cache[task_id] = self.get_task_meta(task_id, cache=False)
@@ -273,6 +435,14 @@ class BaseBackend(object):
         :class:`celery.task.DeleteExpiredTaskMetaTask`."""
         pass
 
+    def cleanup_blobs(self):
+        """Delete the blobs of expired results from the blob store.
+        Is run by the ``celery.backend_cleanup`` task."""
+        expires = self.prepare_expires(getattr(self, 'expires', None),
+                                       type=float)
+        if self.blob_store and expires:
+            self.blobs.cleanup(expires)
+
     def process_cleanup(self):
         """Cleanup actions to do at the end of a task worker process."""
         pass
@@ -283,6 +453,39 @@ class BaseBackend(object):
     def on_chord_part_return(self, task, propagate=False):
         pass
 
+    def on_chord_ready(self, deps, callback, propagate=True):
+        """Join the results of a chord header that is ready,
+        and apply the chord callback with the list of results.
+
+        If the join or the callback fails then the callback
+        is marked as failed with a :exc:`~celery.exceptions.ChordError`.
+
+        """
+        app = self.app
+        j = deps.join_native if deps.supports_native_join else deps.join
+        try:
+            ret = j(propagate=propagate)
+        except Exception as exc:
+            try:
+                culprit = next(deps._failed_join_report())
+                reason = 'Dependency {0.id} raised {1!r}'.format(
+                    culprit, exc,
+                )
+            except StopIteration:
+                reason = repr(exc)
+
+            app._tasks[callback.task].backend.fail_from_current_stack(
+                callback.id, exc=ChordError(reason),
+            )
+        else:
+            try:
+                callback.delay(ret)
+            except Exception as exc:
+                app._tasks[callback.task].backend.fail_from_current_stack(
+                    callback.id,
+                    exc=ChordError('Callback error: {0!r}'.format(exc)),
+                )
+
     def fallback_chord_unlock(self, group_id, body, result=None,
                               countdown=1, **kwargs):
         kwargs['result'] = [r.serializable() for r in result]
@@ -306,6 +509,7 @@ class KeyValueStoreBackend(BaseBackend):
     group_keyprefix = ensure_bytes('celery-taskset-meta-')
     chord_keyprefix = ensure_bytes('chord-unlock-')
     implements_incr = False
+    supports_meta_fields = True
 
     def get(self, key):
         raise NotImplementedError('Must implement the get method.')
@@ -357,6 +561,31 @@ class KeyValueStoreBackend(BaseBackend):
                         for i, value in enumerate(values)
                         if value is not None)
 
+    def get_many_meta(self, task_ids, cache=True):
+        if not self.supports_native_join:
+            return super(KeyValueStoreBackend, self).get_many_meta(
+                task_ids, cache=cache,
+            )
+        metas, ids = {}, []
+        for task_id in task_ids:
+            cached = cache and self._cache.get(task_id)
+            if cached:
+                metas[task_id] = cached
+            else:
+                ids.append(task_id)
+        if ids:
+            r = self._mget_to_results(
+                self.mget([self.get_key_for_task(k) for k in ids]), ids,
+            )
+            for task_id in ids:
+                meta = r.get(bytes_to_str(task_id))
+                if meta is None:
+                    meta = {'status': states.PENDING, 'result': None}
+                elif cache and meta['status'] in states.READY_STATES:
+                    self._cache[task_id] = meta
+                metas[task_id] = meta
+        return metas
+
     def get_many(self, task_ids, timeout=None, interval=0.5):
         ids = set(task_ids)
         cached_ids = set()
@@ -388,9 +617,12 @@ class KeyValueStoreBackend(BaseBackend):
     def _forget(self, task_id):
         self.delete(self.get_key_for_task(task_id))
 
-    def _store_result(self, task_id, result, status, traceback=None):
+    def _store_result(self, task_id, result, status, traceback=None,
+                      meta_fields=None):
         meta = {'status': status, 'result': result, 'traceback': traceback,
                 'children': self.current_task_children()}
+        if meta_fields:
+            meta.update(meta_fields)
         self.set(self.get_key_for_task(task_id), self.encode(meta))
         return result
 
@@ -432,7 +664,6 @@ class KeyValueStoreBackend(BaseBackend):
             return
         from celery import subtask
         from celery.result import GroupResult
-        app = self.app
         if propagate is None:
             propagate = self.app.conf.CELERY_CHORD_PROPAGATES
         gid = task.request.group
@@ -442,39 +673,19 @@ class KeyValueStoreBackend(BaseBackend):
         deps = GroupResult.restore(gid, backend=task.backend)
         val = self.incr(key)
         if val >= len(deps):
-            j = deps.join_native if deps.supports_native_join else deps.join
-            callback = subtask(task.request.chord)
             try:
-                ret = j(propagate=propagate)
-            except Exception as exc:
-                try:
-                    culprit = next(deps._failed_join_report())
-                    reason = 'Dependency {0.id} raised {1!r}'.format(
-                        culprit, exc,
-                    )
-                except StopIteration:
-                    reason = repr(exc)
-
-                app._tasks[callback.task].backend.fail_from_current_stack(
-                    callback.id, exc=ChordError(reason),
-                )
-            else:
-                try:
-                    callback.delay(ret)
-                except Exception as exc:
-                    app._tasks[callback.task].backend.fail_from_current_stack(
-                        callback.id,
-                        exc=ChordError('Callback error: {0!r}'.format(exc)),
-                    )
+                self.on_chord_ready(deps, subtask(task.request.chord),
+                                    propagate=propagate)
             finally:
                 deps.delete()
-                self.client.delete(key)
+                self.delete(key)
         else:
             self.expire(key, 86400)
 
 
 class DisabledBackend(BaseBackend):
     _cache = {}   # need this attribute to reset cache in tests.
+    supports_meta_fields = True  # nothing is stored.
 
     def store_result(self, *args, **kwargs):
         pass
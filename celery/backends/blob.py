@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.backends.blob
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Blob stores keeping large task results outside of the result backend.
+
+    When :setting:`CELERY_RESULT_BLOB_THRESHOLD` is set, results
+    larger than the threshold are written to the blob store,
+    and the result backend only stores the key of the blob
+    in the task metadata.
+
+"""
+from __future__ import absolute_import
+
+import errno
+import os
+import sys
+import time
+
+from hashlib import sha1
+
+from kombu.utils.encoding import ensure_bytes
+
+from celery import platforms
+from celery.exceptions import ImproperlyConfigured
+from celery.five import reraise
+from celery.utils.imports import symbol_by_name
+
+__all__ = ['BlobStore', 'FileSystemBlobStore', 'get_blob_store']
+
+UNKNOWN_BLOB_STORE = """\
+Unknown result blob store: {0!r}.  Did you spell that correctly? ({1!r})\
+"""
+
+BLOB_STORE_ALIASES = {
+    'file': 'celery.backends.blob:FileSystemBlobStore',
+}
+
+
+def get_blob_store(url, app=None):
+    """Get blob store instance by URL, where the scheme is either
+    an alias (e.g. ``file:///var/run/celery/results``) or the name
+    of a :class:`BlobStore` subclass
+    (e.g. ``proj.blobs:S3BlobStore://bucket``)."""
+    scheme, sep, _ = url.partition('://')
+    if not sep:
+        scheme = url
+    try:
+        cls = symbol_by_name(scheme, BLOB_STORE_ALIASES)
+    except (ValueError, ImportError) as exc:
+        reraise(ImproperlyConfigured, ImproperlyConfigured(
+            UNKNOWN_BLOB_STORE.format(scheme, exc)), sys.exc_info()[2])
+    return cls(url, app=app)
+
+
+class BlobStore(object):
+    """Base class for blob stores.
+
+    Subclasses must implement :meth:`put`, :meth:`get` and :meth:`delete`,
+    e.g. to store the results in an object store, and :meth:`cleanup`
+    unless the store expires blobs by itself.
+
+    :param url: The URL the blob store was configured with.
+
+    """
+
+    def __init__(self, url=None, app=None, **kwargs):
+        self.url = url
+        self.app = app
+
+    def put(self, key, data):
+        """Store blob `data` (bytes) under `key`."""
+        raise NotImplementedError('Must implement the put method.')
+
+    def get(self, key):
+        """Returns the data stored under `key`."""
+        raise NotImplementedError('Must implement the get method.')
+
+    def delete(self, key):
+        """Delete the blob stored under `key`, if any."""
+        raise NotImplementedError('Must implement the delete method.')
+
+    def cleanup(self, expires):
+        """Delete the blobs stored more than `expires` seconds ago.
+
+        Called by the ``celery.backend_cleanup`` task, as the blobs of
+        results are not removed when the results expire.
+
+        """
+        pass
+
+
+class FileSystemBlobStore(BlobStore):
+    """Stores every blob as a file in a directory,
+    e.g. ``file:///var/run/celery/results``.
+
+    The directory should be shared by the workers and the clients
+    reading the results.
+
+    """
+
+    def __init__(self, url=None, path=None, **kwargs):
+        super(FileSystemBlobStore, self).__init__(url, **kwargs)
+        self.path = path or (url.partition('://')[2] if url else None)
+        if not self.path:
+            raise ImproperlyConfigured(
+                'Blob store {0!r} is missing the directory path'.format(url))
+        if not os.path.isdir(self.path):
+            with platforms.ignore_errno(errno.EEXIST):
+                os.makedirs(self.path)
+
+    def _filename(self, key):
+        # keys are task ids, which can be chosen by the user,
+        # so the file name is a hash to keep it in the directory.
+        return os.path.join(self.path, sha1(ensure_bytes(key)).hexdigest())
+
+    def put(self, key, data):
+        # write to a temporary file first, so that readers
+        # never see a partially written blob.
+        filename = self._filename(key)
+        tmp = '{0}.{1}.tmp'.format(filename, os.getpid())
+        with open(tmp, 'wb') as fh:
+            fh.write(ensure_bytes(data))
+        os.rename(tmp, filename)
+
+    def get(self, key):
+        with open(self._filename(key), 'rb') as fh:
+            return fh.read()
+
+    def delete(self, key):
+        with platforms.ignore_errno(errno.ENOENT):
+            os.remove(self._filename(key))
+
+    def cleanup(self, expires, now=time.time):
+        oldest = now() - expires
+        for name in os.listdir(self.path):
+            filename = os.path.join(self.path, name)
+            # the blob may be deleted by another process at any time.
+            with platforms.ignore_errno(errno.ENOENT):
+                if os.path.getmtime(filename) < oldest:
+                    os.remove(filename)
@@ -8,16 +8,19 @@
 """
 from __future__ import absolute_import
 
+import time
+
 from functools import wraps
 
 from celery import states
 from celery.exceptions import ImproperlyConfigured
-from celery.five import range
+from celery.five import items, range, values
+from celery.utils.functional import chunks
 from celery.utils.timeutils import maybe_timedelta
 
 from celery.backends.base import BaseBackend
 
-from .models import Task, TaskSet
+from .models import ChordCounter, Task, TaskSet
 from .session import ResultSession
 
 
@@ -56,6 +59,14 @@ class DatabaseBackend(BaseBackend):
     # to not bombard the database with queries.
     subpolling_interval = 0.5
 
+    #: Maximum number of task ids in the ``IN`` clause of one query.
+    max_query_ids = 500
+
+    #: Maximum number of rows deleted by one statement in :meth:`cleanup`.
+    cleanup_batch_size = 1000
+
+    supports_native_join = True
+
     def __init__(self, dburi=None, expires=None,
                  engine_options=None, **kwargs):
         super(DatabaseBackend, self).__init__(**kwargs)
@@ -73,6 +84,9 @@ class DatabaseBackend(BaseBackend):
         tablenames = conf.CELERY_RESULT_DB_TABLENAMES or {}
         Task.__table__.name = tablenames.get('task', 'celery_taskmeta')
         TaskSet.__table__.name = tablenames.get('group', 'celery_tasksetmeta')
+        ChordCounter.__table__.name = tablenames.get(
+            'chord', 'celery_chordcounter',
+        )
 
         if not self.dburi:
             raise ImproperlyConfigured(
@@ -105,6 +119,35 @@ class DatabaseBackend(BaseBackend):
         finally:
             session.close()
 
+    @retry
+    def _store_results(self, results, max_retries=3):
+        """Store many results using one query to find the existing
+        rows for every :attr:`max_query_ids` tasks, and one commit.
+
+        Used by :meth:`store_results`, which is not called by the worker.
+
+        """
+        session = self.ResultSession()
+        try:
+            results = dict((r[0], r) for r in results)
+            existing = {}
+            for ids in chunks(iter(list(results)), self.max_query_ids):
+                existing.update(
+                    (task.task_id, task) for task in
+                    session.query(Task).filter(Task.task_id.in_(ids))
+                )
+            for task_id, result, status, traceback, _ in values(results):
+                task = existing.get(task_id)
+                if task is None:
+                    task = Task(task_id)
+                    session.add(task)
+                task.result = result
+                task.status = status
+                task.traceback = traceback
+            session.commit()
+        finally:
+            session.close()
+
     @retry
     def _get_task_meta_for(self, task_id):
         """Get task metadata for a task by id."""
@@ -119,6 +162,57 @@ class DatabaseBackend(BaseBackend):
         finally:
             session.close()
 
+    @retry
+    def _get_many_meta_for(self, task_ids):
+        """Get task metadata for many tasks, using one query
+        for every :attr:`max_query_ids` tasks."""
+        session = self.ResultSession()
+        try:
+            metas = {}
+            for ids in chunks(iter(task_ids), self.max_query_ids):
+                metas.update(
+                    (task.task_id, task.to_dict()) for task in
+                    session.query(Task).filter(Task.task_id.in_(ids))
+                )
+            return metas
+        finally:
+            session.close()
+
+    def get_many_meta(self, task_ids, cache=True):
+        metas, ids = {}, []
+        for task_id in task_ids:
+            cached = cache and self._cache.get(task_id)
+            if cached:
+                metas[task_id] = cached
+            else:
+                ids.append(task_id)
+        if ids:
+            found = self._get_many_meta_for(ids)
+            for task_id in ids:
+                meta = found.get(task_id)
+                if meta is None:
+                    meta = Task(task_id).to_dict()
+                    meta['status'] = states.PENDING
+                elif cache and meta['status'] in states.READY_STATES:
+                    self._cache[task_id] = meta
+                metas[task_id] = meta
+        return metas
+
+    def get_many(self, task_ids, timeout=None, interval=0.5,
+                 READY_STATES=states.READY_STATES):
+        ids, iterations = set(task_ids), 0
+        while ids:
+            for task_id, meta in items(self.get_many_meta(ids)):
+                if meta['status'] in READY_STATES:
+                    ids.discard(task_id)
+                    yield task_id, meta
+            if ids:
+                if timeout and iterations * interval >= timeout:
+                    raise self.TimeoutError(
+                        'Operation timed out ({0})'.format(timeout))
+                time.sleep(interval)  # don't busy loop.
+                iterations += 1
+
     @retry
     def _save_group(self, group_id, result):
         """Store the result of an executed group."""
@@ -166,20 +260,95 @@ class DatabaseBackend(BaseBackend):
         finally:
             session.close()
 
-    def cleanup(self):
-        """Delete expired metadata."""
+    def on_chord_apply(self, group_id, body, result=None, **kwargs):
+        self.save_group(group_id, self.app.GroupResult(group_id, result))
+        self._create_chord_counter(group_id, len(result or ()))
+
+    def on_chord_part_return(self, task, propagate=None):
+        from celery import subtask
+        from celery.result import GroupResult
+        if propagate is None:
+            propagate = self.app.conf.CELERY_CHORD_PROPAGATES
+        gid = task.request.group
+        if not gid:
+            return
+        counter = self._incr_chord_counter(gid)
+        if counter is None:  # chord already completed
+            return
+        count, total = counter
+        if count >= total:
+            deps = GroupResult.restore(gid, backend=task.backend)
+            try:
+                self.on_chord_ready(deps, subtask(task.request.chord),
+                                    propagate=propagate)
+            finally:
+                self.delete_group(gid)
+                self._delete_chord_counter(gid)
+
+    @retry
+    def _create_chord_counter(self, group_id, total):
         session = self.ResultSession()
-        expires = self.expires
-        now = self.app.now()
         try:
-            session.query(Task).filter(
-                Task.date_done < (now - expires)).delete()
-            session.query(TaskSet).filter(
-                TaskSet.date_done < (now - expires)).delete()
+            session.add(ChordCounter(group_id, total))
+            session.commit()
+        finally:
+            session.close()
+
+    @retry
+    def _incr_chord_counter(self, group_id):
+        """Increment the counter of a chord, returning
+        ``(count, total)``, or :const:`None` if there's no counter."""
+        session = self.ResultSession()
+        try:
+            query = session.query(ChordCounter).filter(
+                ChordCounter.group_id == group_id)
+            query.update({ChordCounter.count: ChordCounter.count + 1},
+                         synchronize_session=False)
+            counter = query.first()
+            ret = (counter.count, counter.total) if counter else None
+            session.commit()
+            return ret
+        finally:
+            session.close()
+
+    @retry
+    def _delete_chord_counter(self, group_id):
+        session = self.ResultSession()
+        try:
+            session.query(ChordCounter).filter(
+                ChordCounter.group_id == group_id).delete()
             session.commit()
         finally:
             session.close()
 
+    def cleanup(self):
+        """Delete expired metadata.
+
+        Rows are deleted in batches of :attr:`cleanup_batch_size`,
+        each in a separate transaction, so that the tables are not
+        locked for long.
+
+        """
+        expired = self.app.now() - self.expires
+        for model in Task, TaskSet, ChordCounter:
+            while self._cleanup_batch(model, expired) >= \
+                    self.cleanup_batch_size:
+                pass
+
+    @retry
+    def _cleanup_batch(self, model, expired):
+        session = self.ResultSession()
+        try:
+            ids = [row[0] for row in session.query(model.id).filter(
+                model.date_done < expired).limit(self.cleanup_batch_size)]
+            if ids:
+                session.query(model).filter(model.id.in_(ids)).delete(
+                    synchronize_session=False)
+                session.commit()
+            return len(ids)
+        finally:
+            session.close()
+
     def __reduce__(self, args=(), kwargs={}):
         kwargs.update(
             dict(dburi=self.dburi,
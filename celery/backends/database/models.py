@@ -30,7 +30,8 @@ class Task(ResultModelBase):
     status = sa.Column(sa.String(50), default=states.PENDING)
     result = sa.Column(PickleType, nullable=True)
     date_done = sa.Column(sa.DateTime, default=datetime.utcnow,
-                          onupdate=datetime.utcnow, nullable=True)
+                          onupdate=datetime.utcnow, nullable=True,
+                          index=True)
     traceback = sa.Column(sa.Text, nullable=True)
 
     def __init__(self, task_id):
@@ -57,7 +58,7 @@ class TaskSet(ResultModelBase):
     taskset_id = sa.Column(sa.String(255), unique=True)
     result = sa.Column(sa.PickleType, nullable=True)
     date_done = sa.Column(sa.DateTime, default=datetime.utcnow,
-                          nullable=True)
+                          nullable=True, index=True)
 
     def __init__(self, taskset_id, result):
         self.taskset_id = taskset_id
@@ -70,3 +71,26 @@ class TaskSet(ResultModelBase):
 
     def __repr__(self):
         return '<TaskSet: {0.taskset_id}>'.format(self)
+
+
+class ChordCounter(ResultModelBase):
+    """Number of finished tasks in the header of a chord."""
+    __tablename__ = 'celery_chordcounter'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = sa.Column(sa.Integer, sa.Sequence('chordcounter_id_sequence'),
+                   autoincrement=True, primary_key=True)
+    group_id = sa.Column(sa.String(255), unique=True)
+    count = sa.Column(sa.Integer, default=0, nullable=False)
+    total = sa.Column(sa.Integer, nullable=False)
+    date_done = sa.Column(sa.DateTime, default=datetime.utcnow,
+                          nullable=True, index=True)
+
+    def __init__(self, group_id, total):
+        self.group_id = group_id
+        self.count = 0
+        self.total = total
+
+    def __repr__(self):
+        return '<ChordCounter: {0.group_id} {0.count}/{0.total}>'.format(
+            self)
@@ -8,6 +8,8 @@
 """
 from __future__ import absolute_import
 
+import time
+
 from datetime import datetime
 
 try:
@@ -20,18 +22,24 @@ if pymongo:
         from bson.binary import Binary
     except ImportError:                     # pragma: no cover
         from pymongo.binary import Binary   # noqa
+    from pymongo.errors import OperationFailure
 else:                                       # pragma: no cover
     Binary = None                           # noqa
+    OperationFailure = None                 # noqa
 
 from kombu.utils import cached_property
 
 from celery import states
 from celery.exceptions import ImproperlyConfigured
-from celery.five import string_t
-from celery.utils.timeutils import maybe_timedelta
+from celery.five import items, string_t
+from celery.utils.functional import chunks
+from celery.utils.log import get_logger
+from celery.utils.timeutils import maybe_timedelta, timedelta_seconds
 
 from .base import BaseBackend
 
+logger = get_logger(__name__)
+
 
 class Bunch(object):
 
@@ -48,8 +56,25 @@ class MongoBackend(BaseBackend):
     mongodb_taskmeta_collection = 'celery_taskmeta'
     mongodb_max_pool_size = 10
     mongodb_options = None
+    mongodb_bulk_writes = True
+
+    #: Maximum number of task ids in the ``$in`` clause of one query.
+    max_query_ids = 500
+
+    #: Prefix of the ids of the documents counting finished chord parts.
+    chord_keyprefix = 'chord-unlock-'
+
+    #: Optional fields of task result documents describing
+    #: how the result is stored, e.g. compressed.
+    storage_fields = ('compression', 'blob')
 
-    supports_autoexpire = False
+    #: Fields of task result documents returned by queries.
+    task_fields = ('status', 'result', 'date_done', 'traceback',
+                   'children') + storage_fields
+
+    supports_autoexpire = True
+    supports_native_join = True
+    supports_meta_fields = True
 
     def __init__(self, *args, **kwargs):
         """Initialize MongoDB backend instance.
@@ -59,8 +84,8 @@ class MongoBackend(BaseBackend):
 
         """
         super(MongoBackend, self).__init__(*args, **kwargs)
-        self.expires = kwargs.get('expires') or maybe_timedelta(
-            self.app.conf.CELERY_TASK_RESULT_EXPIRES)
+        self.expires = maybe_timedelta(
+            kwargs.get('expires') or self.app.conf.CELERY_TASK_RESULT_EXPIRES)
 
         if not pymongo:
             raise ImproperlyConfigured(
@@ -85,6 +110,8 @@ class MongoBackend(BaseBackend):
                 'taskmeta_collection', self.mongodb_taskmeta_collection)
             self.mongodb_max_pool_size = config.get(
                 'max_pool_size', self.mongodb_max_pool_size)
+            self.mongodb_bulk_writes = config.get(
+                'bulk_writes', self.mongodb_bulk_writes)
 
         self._connection = None
 
@@ -122,18 +149,55 @@ class MongoBackend(BaseBackend):
             del(self.database)
             self._connection = None
 
-    def _store_result(self, task_id, result, status, traceback=None):
+    def _task_document(self, task_id, result, status, traceback=None,
+                       meta_fields=None):
+        doc = {'_id': task_id,
+               'status': status,
+               'result': Binary(self.encode(result)),
+               'date_done': datetime.utcnow(),
+               'traceback': Binary(self.encode(traceback)),
+               'children': Binary(self.encode(self.current_task_children()))}
+        if meta_fields:
+            doc.update(meta_fields)
+        return doc
+
+    def _task_meta(self, obj):
+        meta = {
+            'task_id': obj['_id'],
+            'status': obj['status'],
+            'result': self.decode(obj['result']),
+            'date_done': obj['date_done'],
+            'traceback': self.decode(obj['traceback']),
+            'children': self.decode(obj['children']),
+        }
+        for field in self.storage_fields:
+            if obj.get(field) is not None:
+                meta[field] = obj[field]
+        return meta
+
+    def _store_result(self, task_id, result, status, traceback=None,
+                      meta_fields=None):
         """Store return value and status of an executed task."""
-        meta = {'_id': task_id,
-                'status': status,
-                'result': Binary(self.encode(result)),
-                'date_done': datetime.utcnow(),
-                'traceback': Binary(self.encode(traceback)),
-                'children': Binary(self.encode(self.current_task_children()))}
-        self.collection.save(meta)
+        self.collection.save(self._task_document(
+            task_id, result, status, traceback, meta_fields))
 
         return result
 
+    def _store_results(self, results):
+        """Store many results using one unordered bulk write,
+        if supported by the server and enabled by the ``bulk_writes``
+        setting."""
+        results = list(results)
+        bulk = getattr(self.collection, 'initialize_unordered_bulk_op', None)
+        if not results or bulk is None or not self.mongodb_bulk_writes:
+            return super(MongoBackend, self)._store_results(results)
+        op = bulk()
+        for task_id, result, status, traceback, fields in results:
+            op.find({'_id': task_id}).upsert().replace_one(
+                self._task_document(task_id, result, status, traceback,
+                                    fields))
+        op.execute()
+
     def _get_task_meta_for(self, task_id):
         """Get task metadata for a task by id."""
 
@@ -141,16 +205,63 @@ class MongoBackend(BaseBackend):
         if not obj:
             return {'status': states.PENDING, 'result': None}
 
-        meta = {
-            'task_id': obj['_id'],
-            'status': obj['status'],
-            'result': self.decode(obj['result']),
-            'date_done': obj['date_done'],
-            'traceback': self.decode(obj['traceback']),
-            'children': self.decode(obj['children']),
-        }
-
-        return meta
+        return self._task_meta(obj)
+
+    def _find_tasks(self, task_ids, status_in=None):
+        """Find the task result documents for many tasks, using one
+        query for every :attr:`max_query_ids` tasks, and returning
+        only the fields used by task metadata."""
+        metas = {}
+        for ids in chunks(iter(task_ids), self.max_query_ids):
+            spec = {'_id': {'$in': ids}}
+            if status_in is not None:
+                spec['status'] = {'$in': list(status_in)}
+            metas.update(
+                (obj['_id'], self._task_meta(obj))
+                for obj in self.collection.find(spec, self.task_fields)
+            )
+        return metas
+
+    def get_many_meta(self, task_ids, cache=True):
+        metas, ids = {}, []
+        for task_id in task_ids:
+            cached = cache and self._cache.get(task_id)
+            if cached:
+                metas[task_id] = cached
+            else:
+                ids.append(task_id)
+        if ids:
+            found = self._find_tasks(ids)
+            for task_id in ids:
+                meta = found.get(task_id)
+                if meta is None:
+                    meta = {'status': states.PENDING, 'result': None}
+                elif cache and meta['status'] in states.READY_STATES:
+                    self._cache[task_id] = meta
+                metas[task_id] = meta
+        return metas
+
+    def get_many(self, task_ids, timeout=None, interval=0.5,
+                 READY_STATES=states.READY_STATES):
+        ids, iterations = set(task_ids), 0
+        for task_id in list(ids):
+            cached = self._cache.get(task_id)
+            if cached and cached['status'] in READY_STATES:
+                ids.discard(task_id)
+                yield task_id, cached
+        while ids:
+            # only the documents of ready tasks are sent by the server.
+            found = self._find_tasks(ids, status_in=READY_STATES)
+            self._cache.update(found)
+            for task_id, meta in items(found):
+                ids.discard(task_id)
+                yield task_id, meta
+            if ids:
+                if timeout and iterations * interval >= timeout:
+                    raise self.TimeoutError(
+                        'Operation timed out ({0})'.format(timeout))
+                time.sleep(interval)  # don't busy loop.
+                iterations += 1
 
     def _save_group(self, group_id, result):
         """Save the group result."""
@@ -191,8 +302,46 @@ class MongoBackend(BaseBackend):
         # response was unable to be completed.
         self.collection.remove({'_id': task_id})
 
+    def get_key_for_chord(self, group_id):
+        return self.chord_keyprefix + group_id
+
+    def on_chord_apply(self, group_id, body, result=None, **kwargs):
+        self.save_group(group_id, self.app.GroupResult(group_id, result))
+        self.collection.save({'_id': self.get_key_for_chord(group_id),
+                              'count': 0,
+                              'total': len(result or ()),
+                              'date_done': datetime.utcnow()})
+
+    def on_chord_part_return(self, task, propagate=None):
+        from celery import subtask
+        from celery.result import GroupResult
+        if propagate is None:
+            propagate = self.app.conf.CELERY_CHORD_PROPAGATES
+        gid = task.request.group
+        if not gid:
+            return
+        key = self.get_key_for_chord(gid)
+        counter = self.collection.find_and_modify(
+            {'_id': key}, {'$inc': {'count': 1}}, new=True,
+        )
+        if counter is None:  # chord already completed
+            return
+        if counter['count'] >= counter['total']:
+            deps = GroupResult.restore(gid, backend=task.backend)
+            try:
+                self.on_chord_ready(deps, subtask(task.request.chord),
+                                    propagate=propagate)
+            finally:
+                self.delete_group(gid)
+                self.collection.remove({'_id': key})
+
     def cleanup(self):
-        """Delete expired metadata."""
+        """Delete expired metadata.
+
+        Not needed when the TTL index on ``date_done`` is used
+        to expire results (MongoDB 2.2 and later).
+
+        """
         self.collection.remove(
             {'date_done': {'$lt': self.app.now() - self.expires}},
         )
@@ -224,6 +373,35 @@ class MongoBackend(BaseBackend):
         collection = self.database[self.mongodb_taskmeta_collection]
 
         # Ensure an index on date_done is there, if not process the index
-        # in the background. Once completed cleanup will be much faster
-        collection.ensure_index('date_done', background='true')
+        # in the background.  When results expire the index is
+        # a TTL index, so the server deletes the expired results.
+        if self.expires:
+            expires = int(timedelta_seconds(self.expires))
+            index = collection.index_information().get('date_done_1')
+            if index and index.get('expireAfterSeconds') != expires:
+                logger.info('mongodb: result expiry changed to %ss',
+                            expires)
+                self._change_ttl_index(collection, index, expires)
+            collection.ensure_index('date_done', background=True,
+                                    expireAfterSeconds=expires)
+        else:
+            collection.ensure_index('date_done', background=True)
         return collection
+
+    def _change_ttl_index(self, collection, index, expires):
+        # Other workers starting at the same time may be changing the
+        # index too, so an index that is already gone is not an error.
+        if index.get('expireAfterSeconds') is not None:
+            # the expiry of a TTL index can be changed in place.
+            try:
+                return collection.database.command(
+                    'collMod', collection.name,
+                    index={'keyPattern': {'date_done': 1},
+                           'expireAfterSeconds': expires},
+                )
+            except OperationFailure:  # not supported by server
+                pass
+        try:
+            collection.drop_index('date_done_1')
+        except OperationFailure:
+            pass
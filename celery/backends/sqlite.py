@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.backends.sqlite
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Result store backend using a local SQLite database file.
+
+"""
+from __future__ import absolute_import
+
+import os
+import sqlite3
+import threading
+import time
+
+from contextlib import contextmanager
+
+from kombu.utils.encoding import bytes_to_str, ensure_bytes
+
+from celery.five import range
+
+from .base import KeyValueStoreBackend
+
+__all__ = ['SQLiteBackend']
+
+SCHEMA = """\
+CREATE TABLE IF NOT EXISTS celery_results (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    expires REAL
+)"""
+
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+
+
+class NullCache(dict):
+    """Result cache that never stores anything.
+
+    Used when results expire, as results in the local cache would
+    otherwise still be returned after they expired.
+
+    """
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class SQLiteBackend(KeyValueStoreBackend):
+    """Result store backend using a SQLite database file in WAL mode,
+    for deployments where all workers and clients are on the same host.
+
+    Every process and thread uses its own connection, so the backend can
+    be used by all the child processes of the worker pool at the same time:
+    readers are never blocked, and writers wait for each other
+    for up to :attr:`timeout` seconds.
+
+    Results are not cached in memory when they expire, as
+    reading them from the local database is cheap.
+
+    :keyword url: ``sqlite:///relative/path`` or ``sqlite:////absolute/path``.
+
+    """
+
+    #: Default database file, relative to the current directory.
+    filename = 'celery-results.sqlite'
+
+    #: Seconds to wait for another process holding the write lock.
+    timeout = 30.0
+
+    #: Maximum number of keys fetched by one query in :meth:`mget`.
+    mget_batch_size = 500
+
+    supports_native_join = True
+    implements_incr = True
+
+    def __init__(self, url=None, filename=None, expires=None,
+                 timeout=None, **kwargs):
+        super(SQLiteBackend, self).__init__(**kwargs)
+        self.url = url
+        if url:
+            path = url.partition('://')[2]
+            filename = path[1:] if path.startswith('/') else path
+        self.filename = filename or self.filename
+        self.timeout = timeout or self.timeout
+        self.expires = self.prepare_expires(expires, type=float)
+        if self.expires is not None:
+            self._cache = NullCache()
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        # Connections can't be shared with child processes or threads.
+        local, pid = self._local, os.getpid()
+        if getattr(local, 'pid', None) != pid:
+            local.conn, local.pid = self._connect(), pid
+        return local.conn
+
+    def _connect(self):
+        conn = sqlite3.connect(self.filename, timeout=self.timeout,
+                               isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(SCHEMA)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    def _expires_at(self, expires=None):
+        expires = self.expires if expires is None else expires
+        if expires is not None:
+            return time.time() + expires
+
+    def get(self, key):
+        row = self.conn.execute(
+            'SELECT value FROM celery_results WHERE key = ? AND ' +
+            NOT_EXPIRED, (bytes_to_str(key), time.time()),
+        ).fetchone()
+        if row is not None:
+            return bytes(row[0])
+
+    def mget(self, keys):
+        keys = [bytes_to_str(key) for key in keys]
+        execute, size = self.conn.execute, self.mget_batch_size
+        now, values = time.time(), {}
+        for i in range(0, len(keys), size):
+            chunk = keys[i:i + size]
+            values.update(
+                (key, bytes(value)) for key, value in execute(
+                    'SELECT key, value FROM celery_results '
+                    'WHERE key IN ({0}) AND {1}'.format(
+                        ','.join('?' * len(chunk)), NOT_EXPIRED),
+                    chunk + [now],
+                )
+            )
+        return values
+
+    def set(self, key, value):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO celery_results (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (bytes_to_str(key), sqlite3.Binary(ensure_bytes(value)),
+             self._expires_at()),
+        )
+
+    def delete(self, key):
+        self.conn.execute('DELETE FROM celery_results WHERE key = ?',
+                          (bytes_to_str(key), ))
+
+    def incr(self, key):
+        key = bytes_to_str(key)
+        with self._transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO celery_results '
+                         '(key, value) VALUES (?, 0)', (key, ))
+            conn.execute('UPDATE celery_results SET value = value + 1 '
+                         'WHERE key = ?', (key, ))
+            return conn.execute('SELECT value FROM celery_results '
+                                'WHERE key = ?', (key, )).fetchone()[0]
+
+    def expire(self, key, value):
+        self.conn.execute('UPDATE celery_results SET expires = ? '
+                          'WHERE key = ?',
+                          (self._expires_at(value), bytes_to_str(key)))
+
+    def cleanup(self):
+        """Delete expired results."""
+        self.conn.execute('DELETE FROM celery_results WHERE expires <= ?',
+                          (time.time(), ))
+
+    def __reduce__(self, args=(), kwargs={}):
+        kwargs.update(
+            dict(filename=self.filename,
+                 expires=self.expires,
+                 timeout=self.timeout))
+        return super(SQLiteBackend, self).__reduce__(args, kwargs)
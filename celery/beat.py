@@ -12,13 +12,19 @@ import errno
 import os
 import time
 import shelve
+import socket
 import sys
 import traceback
 
+from collections import MutableMapping
+from heapq import heapify, heappop, heappush
 from threading import Event, Thread
+from zlib import crc32
 
 from billiard import Process, ensure_multiprocessing
+from kombu import Consumer, Exchange, Producer, Queue
 from kombu.utils import cached_property, reprcall
+from kombu.utils.encoding import str_to_bytes
 from kombu.utils.functional import maybe_promise
 
 from . import __version__
@@ -28,7 +34,8 @@ from . import current_app
 from .five import items, reraise, values
 from .schedules import maybe_schedule, crontab
 from .utils.imports import instantiate
-from .utils.timeutils import humanize_seconds
+from .utils.serialization import pickle
+from .utils.timeutils import humanize_seconds, timedelta_seconds
 from .utils.log import get_logger
 
 logger = get_logger(__name__)
@@ -132,6 +139,7 @@ class Scheduler(object):
 
     :keyword schedule: see :attr:`schedule`.
     :keyword max_interval: see :attr:`max_interval`.
+    :keyword use_heap: see :attr:`use_heap`.
 
     """
     Entry = ScheduleEntry
@@ -145,25 +153,43 @@ class Scheduler(object):
     #: How often to sync the schedule (3 minutes by default)
     sync_every = 3 * 60
 
+    #: Keep the entries in a heap ordered by the time they must be
+    #: checked next, so that a tick only checks the entries that are due,
+    #: instead of every entry in the schedule.
+    use_heap = False
+
+    #: Seconds between the time an entry was due and the time it
+    #: was sent, for the latest entry sent in the last tick that
+    #: sent any tasks.
+    last_tick_lateness = None
+
     _last_sync = None
+    _heap = None
+    _lateness = None
 
     logger = logger  # compat
 
     def __init__(self, app, schedule=None, max_interval=None,
-                 Publisher=None, lazy=False, **kwargs):
+                 Publisher=None, lazy=False, use_heap=None, **kwargs):
         self.app = app
         self.data = maybe_promise({} if schedule is None else schedule)
         self.max_interval = (max_interval
                              or app.conf.CELERYBEAT_MAX_LOOP_INTERVAL
                              or self.max_interval)
+        self.use_heap = (app.conf.CELERYBEAT_USE_HEAP
+                         if use_heap is None else use_heap)
         self.Publisher = Publisher or app.amqp.TaskProducer
         if not lazy:
             self.setup_schedule()
 
     def install_default_entries(self, data):
         entries = {}
-        if self.app.conf.CELERY_TASK_RESULT_EXPIRES and \
-                not self.app.backend.supports_autoexpire:
+        backend = self.app.backend
+        # blobs of expired results must be deleted even if
+        # the backend expires the results by itself.
+        if self.app.conf.CELERY_TASK_RESULT_EXPIRES and (
+                not backend.supports_autoexpire or
+                getattr(backend, 'blob_store', None)):
             if 'celery.backend_cleanup' not in data:
                 entries['celery.backend_cleanup'] = {
                     'task': 'celery.backend_cleanup',
@@ -176,6 +202,9 @@ class Scheduler(object):
 
         if is_due:
             info('Scheduler: Sending due task %s (%s)', entry.name, entry.task)
+            late = self._due_since(entry)
+            if self._lateness is not None:
+                self._lateness = max(self._lateness, late)
             try:
                 result = self.apply_async(entry, publisher=publisher)
             except Exception as exc:
@@ -191,6 +220,18 @@ class Scheduler(object):
         Executes all due tasks.
 
         """
+        self._lateness = -1  # nothing sent yet in this tick.
+        try:
+            return self._tick()
+        finally:
+            late, self._lateness = self._lateness, None
+            if late >= 0:
+                self.last_tick_lateness = late
+                info('Scheduler: Due tasks sent up to %.3fs late', late)
+
+    def _tick(self):
+        if self.use_heap:
+            return self._tick_heap()
         remaining_times = []
         try:
             for entry in values(self.schedule):
@@ -202,6 +243,33 @@ class Scheduler(object):
 
         return min(remaining_times + [self.max_interval])
 
+    def _tick_heap(self, now=time.time):
+        # The heap contains ``(time to check, name)`` tuples, and entries
+        # are only checked again at the time returned by ``is_due``.
+        # It's rebuilt when the schedule is changed using the scheduler
+        # methods, or if the number of entries changed.
+        H, schedule = self._heap, self.schedule
+        if H is None or len(H) != len(schedule):
+            H = self._heap = [(0, name) for name in schedule]
+            heapify(H)
+        publisher, max_interval = self.publisher, self.max_interval
+        checked_at = now()
+        while H and H[0][0] <= checked_at:
+            _, name = heappop(H)
+            try:
+                entry = schedule[name]
+            except KeyError:  # removed from schedule
+                continue
+            next_time_to_run = self.maybe_due(entry, publisher)
+            heappush(H, (checked_at + (next_time_to_run or max_interval),
+                         name))
+        if not H:
+            return max_interval
+        return max(min(H[0][0] - now(), max_interval), 0)
+
+    def _invalidate_heap(self):
+        self._heap = None
+
     def should_sync(self):
         return (not self._last_sync or
                 (time.time() - self._last_sync) > self.sync_every)
@@ -215,8 +283,26 @@ class Scheduler(object):
         # so we have that done if an exception is raised (doesn't schedule
         # forever.)
         entry = self.reserve(entry)
-        task = self.app.tasks.get(entry.task)
+        try:
+            return self._send_entry(entry, publisher)
+        finally:
+            if self.should_sync():
+                self._do_sync()
+
+    def _due_since(self, entry):
+        # seconds since the entry was due, must be called before reserve.
+        # Only used for logging, so must never stop the entry from
+        # being sent (e.g. custom schedules not supporting this).
+        schedule = entry.schedule
+        try:
+            return timedelta_seconds(-schedule.remaining_estimate(
+                schedule.maybe_make_aware(entry.last_run_at),
+            ))
+        except Exception:
+            return 0
 
+    def _send_entry(self, entry, publisher=None):
+        task = self.app.tasks.get(entry.task)
         try:
             if task:
                 result = task.apply_async(entry.args, entry.kwargs,
@@ -229,10 +315,7 @@ class Scheduler(object):
         except Exception as exc:
             reraise(SchedulingError, SchedulingError(
                 "Couldn't apply scheduled task {0.name}: {exc}".format(
-                    entry, exc)), sys.exc_info()[2])
-        finally:
-            if self.should_sync():
-                self._do_sync()
+                    entry, exc=exc)), sys.exc_info()[2])
         return result
 
     def send_task(self, *args, **kwargs):
@@ -257,6 +340,7 @@ class Scheduler(object):
     def add(self, **kwargs):
         entry = self.Entry(**kwargs)
         self.schedule[entry.name] = entry
+        self._invalidate_heap()
         return entry
 
     def _maybe_entry(self, name, entry):
@@ -268,6 +352,7 @@ class Scheduler(object):
         self.schedule.update(dict(
             (name, self._maybe_entry(name, entry))
             for name, entry in items(dict_)))
+        self._invalidate_heap()
 
     def merge_inplace(self, b):
         schedule = self.schedule
@@ -284,6 +369,7 @@ class Scheduler(object):
                 schedule[key].update(entry)
             else:
                 schedule[key] = entry
+        self._invalidate_heap()
 
     def _ensure_connected(self):
         # callback called for each retry while the connection
@@ -301,6 +387,7 @@ class Scheduler(object):
 
     def set_schedule(self, schedule):
         self.data = schedule
+        self._invalidate_heap()
     schedule = property(get_schedule, set_schedule)
 
     @cached_property
@@ -378,6 +465,7 @@ class PersistentScheduler(Scheduler):
 
     def set_schedule(self, schedule):
         self._store['entries'] = schedule
+        self._invalidate_heap()
     schedule = property(get_schedule, set_schedule)
 
     def sync(self):
@@ -393,6 +481,600 @@ class PersistentScheduler(Scheduler):
         return '    . db -> {self.schedule_filename}'.format(self=self)
 
 
+class JournalEntries(MutableMapping):
+    """The schedule entries of a :class:`JournalStore`.
+
+    Entries are kept pickled until they are accessed, and
+    changes are recorded so that they can be written to the journal.
+
+    """
+
+    def __init__(self, data=None, runs=None):
+        self._data = {} if data is None else data
+        self._runs = {} if runs is None else runs
+        self.changed = {}
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if isinstance(value, bytes):  # not loaded yet
+            value = self._data[key] = pickle.loads(value)
+            try:
+                value.last_run_at, value.total_run_count = self._runs.pop(key)
+            except KeyError:
+                pass
+        return value
+
+    def __setitem__(self, key, entry):
+        self._data[key] = entry
+        self._runs.pop(key, None)
+        self.changed[key] = False
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._runs.pop(key, None)
+        self.changed[key] = False
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def ran(self, key, entry):
+        """Replace entry after it has been run, only the time of the
+        last run and the run count of the entry will be journaled."""
+        self._data[key] = entry
+        self.changed.setdefault(key, True)
+
+    def touch(self, key):
+        """Mark entry as changed after it was modified in place."""
+        self.changed[key] = False
+
+    def raw(self, key):
+        """Returns the entry in pickled form."""
+        value = self._data[key]
+        if isinstance(value, bytes) and key not in self._runs:
+            return value
+        return pickle.dumps(self[key], protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class JournalStore(object):
+    """Schedule storage writing only the changes to the schedule.
+
+    The schedule is kept in a snapshot file (`filename`), and changes
+    to it are appended to a journal (`filename` + ``.journal``) when
+    synced.  For entries that have been run, only the time of the
+    last run and the run count is written.
+
+    The journal is compacted into a new snapshot in a background
+    thread when it contains :attr:`compact_after` records.
+
+    Provides the same interface as the :mod:`shelve` used by
+    :class:`PersistentScheduler`.
+
+    """
+    #: Write a new snapshot when the journal has this many records.
+    compact_after = 10000
+
+    _journal = None
+    _compactor = None
+
+    def __init__(self, filename, compact_after=None):
+        self.filename = filename
+        self.journal_filename = filename + '.journal'
+        self.compacting_filename = filename + '.journal.compacting'
+        self.compact_after = compact_after or self.compact_after
+        self.meta = {}
+        self.entries = JournalEntries()
+        self._meta_changed = self._cleared = False
+        self._records = 0
+        self._load()
+
+    @classmethod
+    def open(cls, filename, **kwargs):
+        return cls(filename)
+
+    def _load(self):
+        try:
+            with open(self.filename, 'rb') as fh:
+                snapshot = pickle.load(fh)
+        except (IOError, OSError) as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+        else:
+            self.meta = snapshot['meta']
+            self.entries = JournalEntries(snapshot['entries'])
+        if os.path.exists(self.compacting_filename):
+            # interrupted while compacting, the records may already be
+            # in the snapshot but replaying them again is harmless.
+            self._replay(self.compacting_filename)
+        self._replay(self.journal_filename)
+
+    def _replay(self, filename):
+        try:
+            fh = open(filename, 'rb')
+        except (IOError, OSError) as exc:
+            if exc.errno != errno.ENOENT:
+                raise
+            return
+        with fh:
+            size = os.fstat(fh.fileno()).st_size
+            while fh.tell() < size:
+                offset = fh.tell()
+                try:
+                    record = pickle.load(fh)
+                except Exception as exc:
+                    error('Truncating incomplete schedule journal %r: %r',
+                          filename, exc)
+                    fh.close()
+                    with open(filename, 'r+b') as wfh:
+                        wfh.truncate(offset)
+                    break
+                self._apply(record)
+                self._records += 1
+
+    def _apply(self, record):
+        op, args = record[0], record[1:]
+        data, runs = self.entries._data, self.entries._runs
+        if op == 'run':
+            key, last_run_at, total_run_count = args
+            if key in data:
+                value = data[key]
+                if isinstance(value, bytes):
+                    runs[key] = (last_run_at, total_run_count)
+                else:
+                    value.last_run_at = last_run_at
+                    value.total_run_count = total_run_count
+        elif op == 'set':
+            data[args[0]] = args[1]
+            runs.pop(args[0], None)
+        elif op == 'del':
+            data.pop(args[0], None)
+            runs.pop(args[0], None)
+        elif op == 'meta':
+            self.meta = args[0]
+        elif op == 'clear':
+            data.clear()
+            runs.clear()
+            self.meta = {}
+
+    def _records_to_write(self):
+        entries = self.entries
+        changed, entries.changed = entries.changed, {}
+        if self._cleared:
+            self._cleared = False
+            yield ('clear', )
+        if self._meta_changed:
+            self._meta_changed = False
+            yield ('meta', dict(self.meta))
+        for key, ran in items(changed):
+            if key not in entries:
+                yield ('del', key)
+            elif ran:
+                entry = entries[key]
+                yield ('run', key, entry.last_run_at, entry.total_run_count)
+            else:
+                yield ('set', key, entries.raw(key))
+
+    def sync(self):
+        self._write_journal()
+        if self._records >= self.compact_after:
+            self.compact()
+
+    def _write_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_filename, 'ab')
+        journal, dump = self._journal, pickle.dump
+        for record in self._records_to_write():
+            dump(record, journal, protocol=pickle.HIGHEST_PROTOCOL)
+            self._records += 1
+        journal.flush()
+
+    def compact(self, wait=False):
+        """Write a new snapshot and remove the journal.
+
+        The snapshot is written by a background thread,
+        unless `wait` is set.
+
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._write_journal()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.compacting_filename):
+            # previous compaction was interrupted.
+            return self._write_snapshot(*self._snapshot())
+        os.rename(self.journal_filename, self.compacting_filename)
+        self._records = 0
+        args = self._snapshot()
+        if wait:
+            return self._write_snapshot(*args)
+        self._compactor = Thread(target=self._write_snapshot, args=args)
+        self._compactor.daemon = True
+        self._compactor.start()
+
+    def _snapshot(self):
+        entries = self.entries
+        return dict(self.meta), dict(
+            (key, entries.raw(key)) for key in entries)
+
+    def _write_snapshot(self, meta, entries):
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as fh:
+            pickle.dump({'meta': meta, 'entries': entries}, fh,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.rename(tmp, self.filename)
+        with platforms.ignore_errno(errno.ENOENT):
+            os.remove(self.compacting_filename)
+
+    def close(self):
+        self.sync()
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def __getitem__(self, key):
+        if key == 'entries':
+            return self.entries
+        return self.meta[key]
+
+    def __setitem__(self, key, value):
+        if key == 'entries':
+            if value is not self.entries:
+                self.entries.clear()
+                self.entries.update(value)
+        else:
+            self.meta[key] = value
+            self._meta_changed = True
+
+    def __contains__(self, key):
+        return key == 'entries' or key in self.meta
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in items(dict(*args, **kwargs)):
+            self[key] = value
+
+    def clear(self):
+        self.meta = {}
+        self.entries = JournalEntries()
+        self._cleared = self._meta_changed = True
+
+
+class JournalScheduler(PersistentScheduler):
+    """Persistent scheduler using a :class:`JournalStore`, so
+    that only the entries that changed are written when syncing."""
+    persistence = JournalStore
+    known_suffixes = ('', '.tmp', '.journal', '.journal.compacting')
+
+    def reserve(self, entry):
+        new_entry = next(entry)
+        self.schedule.ran(entry.name, new_entry)
+        return new_entry
+
+    def merge_inplace(self, b):
+        entries = self.schedule
+        before = dict((key, self._editable(entries[key]))
+                      for key in b if key in entries)
+        super(JournalScheduler, self).merge_inplace(b)
+        for key, fields in items(before):
+            if self._editable(entries[key]) != fields:
+                entries.touch(key)
+
+    def _editable(self, entry):
+        return (entry.task, entry.schedule, entry.args,
+                entry.kwargs, entry.options)
+
+
+def shard_owner(name, shards):
+    """Returns the shard owning the schedule entry `name`.
+
+    Uses rendezvous hashing, so when a shard is added only the entries
+    that will be owned by the new shard move, and when a shard is removed
+    only the entries it owned move.
+
+    """
+    return max(shards, key=lambda shard: (
+        crc32(str_to_bytes('\x00'.join([shard, name]))) & 0xffffffff, shard,
+    ))
+
+
+class ShardMembership(object):
+    """Keeps track of the beat instances sharing a schedule.
+
+    :param shard_id: Unique name of this instance.
+    :keyword interval: How often heartbeats are sent, in seconds.
+    :keyword expires: Instances that have not sent a heartbeat for this
+        many seconds are removed.  Default is three times the interval.
+
+    """
+    interval = 10.0
+
+    _last_heartbeat = None
+
+    def __init__(self, shard_id, interval=None, expires=None):
+        self.shard_id = shard_id
+        self.interval = interval or self.interval
+        self.expires = expires or self.interval * 3
+
+    def members(self, now=time.time):
+        """Returns sorted tuple of alive instances, including this one,
+        sending a heartbeat first if it's time to."""
+        if self._last_heartbeat is None or \
+                now() - self._last_heartbeat >= self.interval:
+            self.heartbeat()
+            self._last_heartbeat = now()
+        return tuple(sorted(self.alive(now()) | set([self.shard_id])))
+
+    def heartbeat(self):
+        raise NotImplementedError('subclass responsibility')
+
+    def alive(self, now):
+        raise NotImplementedError('subclass responsibility')
+
+    def leave(self):
+        pass
+
+
+class FileShardMembership(ShardMembership):
+    """Membership using a directory of files, where the modification
+    time of each file is the time of the last heartbeat.
+
+    Only useful when all instances are on the same machine,
+    or share the directory.
+
+    """
+    suffix = '.shard'
+
+    def __init__(self, path, shard_id, **kwargs):
+        super(FileShardMembership, self).__init__(shard_id, **kwargs)
+        self.path = path
+        self.filename = os.path.join(path, shard_id + self.suffix)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def heartbeat(self):
+        with open(self.filename, 'a'):
+            os.utime(self.filename, None)
+
+    def alive(self, now):
+        alive = set()
+        for name in os.listdir(self.path):
+            if name.endswith(self.suffix):
+                try:
+                    mtime = os.path.getmtime(os.path.join(self.path, name))
+                except OSError:  # removed by leave
+                    continue
+                if now - mtime < self.expires:
+                    alive.add(name[:-len(self.suffix)])
+        return alive
+
+    def leave(self):
+        with platforms.ignore_errno(errno.ENOENT):
+            os.remove(self.filename)
+
+
+class BrokerShardMembership(ShardMembership):
+    """Membership using heartbeat messages sent to a fanout exchange.
+
+    Connection errors are logged, and the last known membership is used
+    until the connection is reestablished at the next heartbeat or check.
+
+    """
+    exchange = Exchange('celerybeat.shards', type='fanout',
+                        durable=False, auto_delete=True)
+
+    #: Seconds to wait for heartbeats each time they are read,
+    #: as a zero timeout is not supported by all transports.
+    drain_timeout = 0.05
+
+    #: Maximum number of times to retry connecting each time
+    #: the membership is used while the broker is down.
+    max_retries = 1
+
+    _consumer = None
+    producer = None
+
+    def __init__(self, connection, shard_id, **kwargs):
+        super(BrokerShardMembership, self).__init__(shard_id, **kwargs)
+        self.connection = connection
+        self.queue = Queue('celerybeat.shard.{0}'.format(shard_id),
+                           exchange=self.exchange, durable=False,
+                           exclusive=True, auto_delete=True)
+        self.seen = {}
+        self._alive = set()
+
+    def _consume(self):
+        if self._consumer is None:
+            self.connection.ensure_connection(
+                self._on_connection_error, self.max_retries,
+            )
+            channel = self.connection.channel()
+            self.producer = Producer(channel, exchange=self.exchange,
+                                     serializer='json')
+            self._consumer = Consumer(
+                channel, [self.queue], callbacks=[self.on_message],
+                accept=['json'], no_ack=True,
+            )
+            self._consumer.consume()
+        return self._consumer
+
+    def _on_connection_error(self, exc, interval):
+        error('beat: shards: Connection error: %s. '
+              'Trying again in %s seconds...', exc, interval)
+
+    def _ensure(self, fun, *args):
+        # returns false if the connection was lost.
+        conn = self.connection
+        try:
+            fun(*args)
+        except conn.connection_errors + conn.channel_errors as exc:
+            error('beat: shards: Connection error: %r', exc, exc_info=1)
+            self._consumer = self.producer = None
+            try:
+                conn.collect()
+            except Exception:
+                pass
+            return False
+        return True
+
+    def _send(self, leaving=False):
+        self._consume()
+        self.producer.publish(
+            {'shard': self.shard_id, 'leaving': leaving},
+            declare=[self.exchange],
+        )
+
+    def send(self, leaving=False):
+        self._ensure(self._send, leaving)
+
+    def heartbeat(self):
+        self.send()
+
+    def on_message(self, body, message, now=time.time):
+        shard = body.get('shard')
+        if body.get('leaving'):
+            self.seen.pop(shard, None)
+        elif shard:
+            self.seen[shard] = now()
+
+    def _drain(self):
+        self._consume()
+        while 1:
+            try:
+                self.connection.drain_events(timeout=self.drain_timeout)
+            except socket.timeout:
+                break
+
+    def alive(self, now):
+        if self._ensure(self._drain):
+            self._alive = set(shard for shard, seen_at in items(self.seen)
+                              if now - seen_at < self.expires)
+        return self._alive
+
+    def leave(self):
+        if self._consumer is not None:
+            self.send(leaving=True)
+            self.connection.release()
+
+
+class ShardedScheduler(PersistentScheduler):
+    """Persistent scheduler sharing the schedule with other instances,
+    where every instance only sends the entries it owns
+    (see :func:`shard_owner`).
+
+    Instances find each other using the broker, or using a directory
+    of heartbeat files if :setting:`CELERYBEAT_SHARD_DIR` is set.
+
+    When the membership changes, entries owned by another instance are
+    skipped immediately, while entries moved to this instance are only
+    sent after the new membership has been seen for the heartbeat expiry
+    time, so the previous owner has stopped sending them.  The last
+    run time of moved entries is set to the time of the change.
+    At startup all entries are considered moved to this instance.
+
+    Every instance must use a different schedule file.
+
+    """
+    Membership = BrokerShardMembership
+    FileMembership = FileShardMembership
+
+    _previous = None
+    _changed_at = None
+
+    def __init__(self, *args, **kwargs):
+        self.shard_id = kwargs.pop('shard_id', None) or '{0}.{1}'.format(
+            socket.gethostname(), os.getpid(),
+        )
+        self.membership = kwargs.pop('membership', None)
+        PersistentScheduler.__init__(self, *args, **kwargs)
+        if self.membership is None:
+            self.membership = self.get_membership()
+        self.members = ()
+        self._owners = {}
+        self._previous_owners = {}
+        self._adopted = set()
+
+    def get_membership(self):
+        conf = self.app.conf
+        if conf.CELERYBEAT_SHARD_DIR:
+            return self.FileMembership(
+                conf.CELERYBEAT_SHARD_DIR, self.shard_id,
+                interval=conf.CELERYBEAT_SHARD_INTERVAL,
+            )
+        return self.Membership(
+            self.app.connection(), self.shard_id,
+            interval=conf.CELERYBEAT_SHARD_INTERVAL,
+        )
+
+    def update_members(self, now=time.time):
+        members = self.membership.members()
+        if members != self.members:
+            info('beat: shards changed: %s', ', '.join(members))
+            self._previous, self.members = self.members, members
+            self._previous_owners, self._owners = self._owners, {}
+            self._changed_at, self._changed_at_dt = now(), self.app.now()
+            self._adopted.clear()
+            self._invalidate_heap()
+
+    def owner(self, name, previous=False):
+        owners, members = self._owners, self.members
+        if previous:
+            owners, members = self._previous_owners, self._previous
+        try:
+            return owners[name]
+        except KeyError:
+            if not members:
+                return
+            owner = owners[name] = shard_owner(name, members)
+            return owner
+
+    def settled(self, now=time.time):
+        return (self._changed_at is None or
+                now() - self._changed_at >= self.membership.expires)
+
+    def maybe_due(self, entry, publisher=None):
+        name = entry.name
+        if self.owner(name) != self.shard_id:
+            return
+        if self._previous is not None and name not in self._adopted and \
+                self.owner(name, previous=True) != self.shard_id:
+            if not self.settled():
+                return self.membership.interval
+            entry.last_run_at = self._changed_at_dt
+            self._adopted.add(name)
+        return super(ShardedScheduler, self).maybe_due(entry, publisher)
+
+    def tick(self):
+        self.update_members()
+        return min(super(ShardedScheduler, self).tick(),
+                   self.membership.interval)
+
+    def close(self):
+        try:
+            self.membership.leave()
+        finally:
+            super(ShardedScheduler, self).close()
+
+    @property
+    def info(self):
+        return '{0}\n    . shard -> {1}'.format(
+            super(ShardedScheduler, self).info, self.shard_id)
+
+
 class Service(object):
     scheduler_cls = PersistentScheduler
 
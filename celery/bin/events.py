@@ -29,6 +29,11 @@ The :program:`celery events` command.
 
     Camera: Optional shutter rate limit (e.g. 10/m).
 
+.. cmdoption:: --event-log
+
+    Monitor/Camera: Record received events in this directory, and
+    replay the events already recorded there on startup.
+
 .. cmdoption:: -l, --loglevel
 
     Logging level, choose between `DEBUG`, `INFO`, `WARNING`,
@@ -63,6 +68,7 @@ class events(Command):
         celery events
         celery events -d
         celery events -C mod.attr -F 1.0 --detach --maxrate=100/m -l info
+        celery events -C mod.attr --event-log=/var/run/celery/events
     """
     doc = __doc__
     supports_args = False
@@ -70,7 +76,8 @@ class events(Command):
     def run(self, dump=False, camera=None, frequency=1.0, maxrate=None,
             loglevel='INFO', logfile=None, prog_name='celery events',
             pidfile=None, uid=None, gid=None, umask=None,
-            working_directory=None, detach=False, **kwargs):
+            working_directory=None, detach=False, event_log=None,
+            **kwargs):
         self.prog_name = prog_name
 
         if dump:
@@ -81,18 +88,18 @@ class events(Command):
                                   pidfile=pidfile, uid=uid, gid=gid,
                                   umask=umask,
                                   working_directory=working_directory,
-                                  detach=detach)
-        return self.run_evtop()
+                                  detach=detach, event_log=event_log)
+        return self.run_evtop(event_log=event_log)
 
     def run_evdump(self):
         from celery.events.dumper import evdump
         self.set_process_status('dump')
         return evdump(app=self.app)
 
-    def run_evtop(self):
+    def run_evtop(self, event_log=None):
         from celery.events.cursesmon import evtop
         self.set_process_status('top')
-        return evtop(app=self.app)
+        return evtop(app=self.app, event_log=event_log)
 
     def run_evcam(self, camera, logfile=None, pidfile=None, uid=None,
                   gid=None, umask=None, working_directory=None,
@@ -123,6 +130,7 @@ class events(Command):
              Option('-F', '--frequency', '--freq',
                     type='float', default=1.0),
              Option('-r', '--maxrate'),
+             Option('--event-log'),
              Option('-l', '--loglevel', default='INFO'))
             + daemon_options(default_pidfile='celeryev.pid')
             + tuple(self.app.user_options['events'])
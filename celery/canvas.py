@@ -15,12 +15,14 @@ from __future__ import absolute_import
 from copy import deepcopy
 from functools import partial as _partial, reduce
 from operator import itemgetter
-from itertools import chain as _chain
+from itertools import chain as _chain, islice
+from time import time
 
 from kombu.utils import cached_property, fxrange, kwdict, reprcall, uuid
 
 from celery._state import current_app
 from celery.exceptions import NotRegistered
+from celery.five import items, range
 from celery.result import AsyncResult, GroupResult
 from celery.utils.functional import (
     maybe_list, is_list, regen,
@@ -371,25 +373,90 @@ class xstarmap(_basemap):
                                                truncate(repr(it), 100))
 
 
+class ChunkSizer(object):
+    """Decides the size of chunks so that each chunk takes about
+    `target` seconds to execute.
+
+    The size is calculated from a moving average of the
+    runtime per item, updated using :meth:`update`.
+
+    :keyword target: Desired runtime for a single chunk, in seconds.
+    :keyword initial: Size used before any runtime has been recorded.
+    :keyword min_size: Smallest chunk size.
+    :keyword max_size: Largest chunk size.
+    :keyword alpha: Weight of the last measurement in the moving average.
+
+    """
+
+    def __init__(self, target=1.0, initial=1, min_size=1, max_size=10000,
+                 alpha=0.5):
+        self.target = target
+        self.initial = initial
+        self.min_size = min_size
+        self.max_size = max_size
+        self.alpha = alpha
+        self.per_item = None
+
+    def update(self, n, runtime):
+        """Record that `n` items took `runtime` seconds to execute."""
+        if n:
+            per_item = float(runtime) / n
+            self.per_item = (
+                per_item if self.per_item is None
+                else self.alpha * per_item + (1 - self.alpha) * self.per_item
+            )
+        return self.size
+
+    @property
+    def size(self):
+        if self.per_item is None:
+            return self.initial
+        if self.per_item <= 0:
+            return self.max_size
+        return int(max(self.min_size,
+                       min(self.max_size, self.target / self.per_item)))
+
+
 @Signature.register_type
 class chunks(Signature):
     _unpack_args = itemgetter('task', 'it', 'n')
 
-    def __init__(self, task, it, n, **options):
+    #: Number of chunks published for every sample executed
+    #: when the chunk size is adaptive.
+    adaptive_window = 10
+
+    def __init__(self, task, it, n=None, target_runtime=None, **options):
+        if n is None and target_runtime is None:
+            raise ValueError('chunks requires a chunk size (n), '
+                             'or a target_runtime for adaptive chunks')
+        kwargs = {'task': task, 'it': regen(it), 'n': n}
+        if target_runtime is not None:
+            kwargs['target_runtime'] = target_runtime
         Signature.__init__(
-            self, 'celery.chunks', (),
-            {'task': task, 'it': regen(it), 'n': n},
-            immutable=True, **options
+            self, 'celery.chunks', (), kwargs, immutable=True, **options
         )
 
     @classmethod
     def from_dict(self, d):
-        return chunks(*self._unpack_args(d['kwargs']), **d['options'])
+        return chunks(*self._unpack_args(d['kwargs']),
+                      target_runtime=d['kwargs'].get('target_runtime'),
+                      **d['options'])
 
     def apply_async(self, args=(), kwargs={}, **opts):
+        if self.kwargs['n'] is None:
+            # adaptive chunk size is decided by the task in the worker.
+            task, it, _ = self._unpack_args(self.kwargs)
+            return self.type.apply_async(
+                (), dict(self.kwargs, it=list(it)), **opts
+            )
         return self.group().apply_async(args, kwargs, **opts)
 
     def __call__(self, **options):
+        if self.kwargs['n'] is None:
+            task, it, _ = self._unpack_args(self.kwargs)
+            return self.apply_adaptive(
+                task, it, self.kwargs.get('target_runtime'),
+            )
         return self.group()(**options)
 
     def group(self):
@@ -401,6 +468,58 @@ class chunks(Signature):
     def apply_chunks(cls, task, it, n):
         return cls(task, it, n)()
 
+    @classmethod
+    def apply_adaptive(cls, task, it, target_runtime=None, window=None,
+                       Sizer=ChunkSizer, time=time):
+        """Split `it` into chunks taking about `target_runtime` seconds
+        each (default is one second).
+
+        The runtime per item is measured by executing a chunk
+        in the current process, and the chunk size is adjusted
+        every `window` chunks by executing another one, so the size
+        follows changes in the cost of the items while consuming the input.
+
+        .. warning::
+
+            The sample chunks (about one in ``window + 1`` chunks)
+            are executed synchronously by the process calling this,
+            i.e. the worker executing the ``celery.chunks`` task, or the
+            client when the signature is called directly.  They are not
+            routed, and time limits and retries do not apply to them.
+            This is why adaptive chunks must be enabled explicitly
+            by giving a `target_runtime` instead of a chunk size.
+
+        Returns a :class:`~celery.result.GroupResult` with
+        the results of all of the chunks.
+
+        """
+        task = subtask(task)
+        fun, backend = task.type, task.type.backend
+        window = window or cls.adaptive_window
+        sizer = Sizer(target_runtime or 1.0)
+        it, results = iter(it), []
+        while 1:
+            # sample: execute a chunk locally to measure the runtime.
+            sample = list(islice(it, sizer.size))
+            if not sample:
+                break
+            time_start = time()
+            retval = [fun(*item) for item in sample]
+            sizer.update(len(sample), time() - time_start)
+            sample_id = uuid()
+            backend.mark_as_done(sample_id, retval)
+            results.append(task.AsyncResult(sample_id))
+
+            with fun.app.producer_or_acquire() as pub:
+                for _ in range(window):
+                    part = list(islice(it, sizer.size))
+                    if not part:
+                        break
+                    results.append(xstarmap(task, part).apply_async(
+                        publisher=pub,
+                    ))
+        return GroupResult(uuid(), results)
+
 
 def _maybe_group(tasks):
     if isinstance(tasks, group):
@@ -443,6 +562,31 @@ class group(Signature):
         type = tasks[0].type.app.tasks[self['task']]
         return type(*type.prepare(options, tasks, partial_args))
 
+    def stream(self, *partial_args, **options):
+        """Apply the group without evaluating all of the tasks first.
+
+        The tasks iterator is consumed while the tasks are published,
+        so a group created from a generator can have millions of
+        members while using bounded memory in the client.
+
+        :keyword window: Number of tasks evaluated and published at
+            a time (default is 1000).
+        :keyword save: Save the group result after every window,
+            so that it can be restored using
+            :meth:`~celery.result.GroupResult.restore`.
+
+        The member task ids are made from the group id and a counter,
+        and the returned :class:`~celery.result.GroupResult` keeps
+        its results in a compact :class:`~celery.result.ResultSequence`.
+
+        """
+        try:
+            tasks = self.tasks.consume()
+        except AttributeError:
+            tasks = iter(self.tasks)
+        return self.type.stream(tasks, partial_args,
+                                **dict(self.options, **options))
+
     def freeze(self, _id=None):
         opts = self.options
         try:
@@ -473,9 +617,16 @@ class group(Signature):
 
 @Signature.register_type
 class chord(Signature):
+    #: Options not copied from the body to the intermediate
+    #: combine tasks of a reduction tree.
+    _reduce_exclude_options = frozenset([
+        'task_id', 'reply_to', 'link', 'link_error', 'chord', 'group_id',
+    ])
 
     def __init__(self, header, body=None, task='celery.chord',
-                 args=(), kwargs={}, **options):
+                 args=(), kwargs={}, reduce_fanin=None, **options):
+        if reduce_fanin:
+            kwargs = dict(kwargs, reduce_fanin=reduce_fanin)
         Signature.__init__(
             self, task, args,
             dict(kwargs, header=_maybe_group(header),
@@ -518,6 +669,31 @@ class chord(Signature):
             pass
         return s
 
+    @classmethod
+    def reduce_tree(cls, tasks, body, fanin):
+        """Nest the header tasks in a tree of chords, so that no
+        task receives the results of more than `fanin` tasks.
+
+        The intermediate nodes of the tree are copies of the body
+        (without links and task id), so the body must be a reducer
+        accepting a list of its own return values, e.g. ``xsum``.
+
+        Returns the new list of header tasks, which will have
+        no more than `fanin` elements.
+
+        """
+        if fanin < 2:
+            raise ValueError('reduce_fanin must be at least 2')
+        exclude = cls._reduce_exclude_options
+        combine = body.replace(options=dict(
+            (k, v) for k, v in items(body.options) if k not in exclude
+        ))
+        tasks = list(tasks)
+        while len(tasks) > fanin:
+            tasks = [cls(part, combine.clone())
+                     for part in _chunks(iter(tasks), fanin)]
+        return tasks
+
     def link(self, callback):
         self.body.link(callback)
         return callback
@@ -11,6 +11,7 @@
 from __future__ import absolute_import
 
 import os
+import sys
 import time
 import socket
 import threading
@@ -19,15 +20,23 @@ from collections import deque
 from contextlib import contextmanager
 from copy import copy
 from operator import itemgetter
+from random import random
+from zlib import crc32
 
 from kombu import Exchange, Queue, Producer
 from kombu.mixins import ConsumerMixin
 from kombu.utils import cached_property
+from kombu.utils.encoding import str_to_bytes
+from kombu.utils.limits import TokenBucket
 
 from celery.app import app_or_default
+from celery.five import Queue as FastQueue, items, reraise
 from celery.utils import uuid
 from celery.utils.functional import dictfilter
-from celery.utils.timeutils import adjust_timestamp, utcoffset, maybe_s_to_ms
+from celery.utils.threads import bgThread
+from celery.utils.timeutils import (
+    adjust_timestamp, utcoffset, maybe_s_to_ms, rate,
+)
 
 event_exchange = Exchange('celeryev', type='topic')
 
@@ -93,11 +102,39 @@ class EventDispatcher(object):
        while the connection is down. :meth:`flush` must be called
        as soon as the connection is re-established.
 
+    :keyword batch_size: If set, events in :attr:`batch_groups` are
+        buffered and sent as a single message containing a list of events,
+        when this many events has been buffered for a group.
+        Default is :setting:`CELERY_EVENT_BATCH_SIZE`.
+
+    :keyword batch_interval: Maximum number of seconds events are
+        buffered before being sent.  :meth:`flush_batches` must be called
+        periodically for this to be honored when no new events are sent.
+        Default is :setting:`CELERY_EVENT_BATCH_INTERVAL`.
+
+    :keyword sampling: Mapping of event types and task names to the
+        ratio of events to send, see :meth:`sample`.
+        Default is :setting:`CELERY_EVENT_SAMPLING`.
+
+    :keyword rate_limits: Mapping of event types to the maximum rate
+        they can be sent at (e.g. ``"100/s"``).
+        Default is :setting:`CELERY_EVENT_RATE_LIMITS`.
+
     You need to :meth:`close` this after use.
 
     """
     DISABLED_TRANSPORTS = set(['sql'])
 
+    #: Event groups that can be sent in batches.  Worker events are
+    #: never batched, as heartbeats and elections must be sent promptly.
+    batch_groups = frozenset(['task'])
+
+    #: Event types sent with the hostname of the sender appended to the
+    #: routing key (e.g. ``worker.heartbeat.worker1@example.com``),
+    #: so that consumers can bind to the events of a single worker.
+    #: Only used when :setting:`CELERYD_GOSSIP_PEERS` is enabled.
+    hostname_routed = frozenset(['worker-heartbeat'])
+
     # set of callbacks to be called when :meth:`enabled`.
     on_enabled = None
 
@@ -106,7 +143,8 @@ class EventDispatcher(object):
 
     def __init__(self, connection=None, hostname=None, enabled=True,
                  channel=None, buffer_while_offline=True, app=None,
-                 serializer=None, groups=None):
+                 serializer=None, groups=None, batch_size=None,
+                 batch_interval=None, sampling=None, rate_limits=None):
         self.app = app_or_default(app or self.app)
         self.connection = connection
         self.channel = channel
@@ -121,6 +159,28 @@ class EventDispatcher(object):
         self.groups = set(groups or [])
         self.tzoffset = [-time.timezone, -time.altzone]
         self.clock = self.app.clock
+        conf = self.app.conf
+        self.batch_size = (conf.CELERY_EVENT_BATCH_SIZE
+                           if batch_size is None else batch_size)
+        self.batch_interval = (conf.CELERY_EVENT_BATCH_INTERVAL
+                               if batch_interval is None else batch_interval)
+        self.batch_compression = conf.CELERY_EVENT_BATCH_COMPRESSION
+        if not conf.CELERYD_GOSSIP_PEERS:
+            self.hostname_routed = frozenset()
+        self._batches = {}
+        self._batch_started = None
+        self.sampling = dict(conf.CELERY_EVENT_SAMPLING or {}
+                             if sampling is None else sampling)
+        self.rate_limits = dict(conf.CELERY_EVENT_RATE_LIMITS or {}
+                                if rate_limits is None else rate_limits)
+        self._buckets = {}
+        for type, limit in items(self.rate_limits):
+            limit = rate(limit)
+            if limit:
+                self._buckets[type] = TokenBucket(limit, max(limit, 1))
+        self._capped = {}
+        #: True if events may be dropped by :meth:`sample`.
+        self.sampled = bool(self.sampling or self._buckets)
         if not connection and channel:
             self.connection = channel.connection.client
         self.enabled = enabled
@@ -154,6 +214,43 @@ class EventDispatcher(object):
             for callback in self.on_disabled:
                 callback()
 
+    def sample(self, type, name=None, uuid=None, random=random):
+        """Decide if an event should be sent.
+
+        Returns the weight of the event: the number of events it
+        represents, or 0 if the event should not be sent.
+
+        The ratio of events sent is the product of the ratios for the event
+        type and the task `name` in :attr:`sampling`.  If `uuid` is
+        provided the choice is made from a hash of the id, so that
+        the same tasks are chosen for every event type with the same ratio.
+
+        Events exceeding the rate limit for the type are dropped,
+        and added to the weight of the next event sent.
+
+        This should be called before preparing the fields
+        of the event, so that no work is spent on events not sent.
+
+        """
+        sampling = self.sampling
+        ratio = sampling.get(type, 1.0)
+        if name is not None:
+            ratio *= sampling.get(name, 1.0)
+        if ratio < 1.0:
+            if ratio <= 0.0:
+                return 0
+            key = ((crc32(str_to_bytes(uuid)) & 0xffffffff) / 4294967296.0
+                   if uuid is not None else random())
+            if key >= ratio:
+                return 0
+        bucket = self._buckets.get(type)
+        if bucket is not None:
+            if not bucket.can_consume(1):
+                self._capped[type] = self._capped.get(type, 0) + 1
+                return 0
+            return (1 + self._capped.pop(type, 0)) / ratio
+        return 1 / ratio
+
     def publish(self, type, fields, producer, retry=False,
                 retry_policy=None, blind=False, utcoffset=utcoffset,
                 Event=Event):
@@ -180,9 +277,12 @@ class EventDispatcher(object):
             event = Event(type, hostname=self.hostname, utcoffset=utcoffset(),
                           pid=self.pid, clock=clock, **fields)
             exchange = self.exchange
+            routing_key = type.replace('-', '.')
+            if type in self.hostname_routed:
+                routing_key = '.'.join([routing_key, self.hostname])
             producer.publish(
                 event,
-                routing_key=type.replace('-', '.'),
+                routing_key=routing_key,
                 exchange=exchange.name,
                 retry=retry,
                 retry_policy=retry_policy,
@@ -191,10 +291,63 @@ class EventDispatcher(object):
                 headers=self.headers,
             )
 
-    def send(self, type, blind=False, **fields):
+    def publish_batched(self, type, fields, group, blind=False,
+                        utcoffset=utcoffset, Event=Event, now=time.time):
+        """Add event to the batch for its group, sending the batch
+        if it is full or the oldest buffered event has expired."""
+        with self.mutex:
+            clock = None if blind else self.clock.forward()
+            event = Event(type, hostname=self.hostname, utcoffset=utcoffset(),
+                          pid=self.pid, clock=clock, **fields)
+            batch = self._batches.get(group)
+            if batch is None:
+                batch = self._batches[group] = []
+            batch.append(event)
+            if self._batch_started is None:
+                self._batch_started = now()
+            if now() - self._batch_started >= self.batch_interval:
+                self._flush_batches()
+            elif len(batch) >= self.batch_size:
+                self._flush_batch(group, batch)
+
+    def flush_batches(self):
+        """Send all buffered batches of events."""
+        if self._batches:
+            with self.mutex:
+                self._flush_batches()
+
+    def _flush_batches(self):
+        for group, batch in items(self._batches):
+            if batch:
+                self._flush_batch(group, batch)
+        self._batch_started = None
+
+    def _flush_batch(self, group, batch):
+        exchange = self.exchange
+        try:
+            self.producer.publish(
+                list(batch),
+                routing_key='{0}.batch'.format(group),
+                exchange=exchange.name,
+                declare=[exchange],
+                serializer=self.serializer,
+                compression=self.batch_compression,
+                headers=self.headers,
+            )
+        except Exception:
+            if not self.buffer_while_offline:
+                del batch[:]
+                raise
+            # keep the events, they are sent with the next batch.
+        else:
+            del batch[:]
+
+    def send(self, type, blind=False, weight=1, **fields):
         """Send event.
 
         :param type: Event type name, with group separated by dash (`-`).
+        :keyword weight: Number of events this event represents,
+            as returned by :meth:`sample`.
         :keyword retry: Retry in the event of connection failure.
         :keyword retry_policy: Dict of custom retry policy, see
             :meth:`~kombu.Connection.ensure`.
@@ -208,8 +361,13 @@ class EventDispatcher(object):
         """
         if self.enabled:
             groups = self.groups
-            if groups and group_from(type) not in groups:
+            group = group_from(type)
+            if groups and group not in groups:
                 return
+            if weight != 1:
+                fields['weight'] = weight
+            if self.batch_size and group in self.batch_groups:
+                return self.publish_batched(type, fields, group, blind)
             try:
                 self.publish(type, fields, self.producer, blind)
             except Exception as exc:
@@ -218,7 +376,8 @@ class EventDispatcher(object):
                 self._outbound_buffer.append((type, fields, exc))
 
     def flush(self):
-        """Flushes the outbound buffer."""
+        """Flushes the outbound buffer, and any batches of events."""
+        self.flush_batches()
         while self._outbound_buffer:
             try:
                 type, fields, _ = self._outbound_buffer.popleft()
@@ -232,6 +391,8 @@ class EventDispatcher(object):
 
     def close(self):
         """Close the event dispatcher."""
+        if self.producer is not None:
+            self.flush_batches()
         self.mutex.locked() and self.mutex.release()
         self.producer = None
 
@@ -243,26 +404,89 @@ class EventDispatcher(object):
     publisher = property(_get_publisher, _set_publisher)  # XXX compat
 
 
+class Decoder(bgThread):
+    """Thread decoding messages and calling `receive` with the
+    decoded message body, so that decoding and processing events
+    overlaps with reading from the network.
+
+    :keyword maxsize: Maximum number of messages waiting to be
+        decoded, reading messages blocks when this is exceeded.
+
+    Errors raised while processing events are re-raised by
+    the next call to :meth:`put`.
+
+    """
+
+    def __init__(self, receive, maxsize=10000):
+        super(Decoder, self).__init__()
+        self.receive = receive
+        self.queue = FastQueue(maxsize)
+        self.exc_info = None
+
+    def put(self, message):
+        if self.exc_info:
+            exc_info, self.exc_info = self.exc_info, None
+            reraise(*exc_info)
+        self.queue.put(message)
+
+    def body(self):
+        message = self.queue.get()
+        if message is None:  # sent by stop
+            self._is_shutdown.set()
+        elif self.exc_info is None:
+            try:
+                self.receive(message.decode(), message)
+            except Exception:
+                self.exc_info = sys.exc_info()
+
+    def stop(self):
+        # messages already received are processed before stopping.
+        self.queue.put(None)
+        self._is_stopped.wait()
+        if self.exc_info:
+            exc_info, self.exc_info = self.exc_info, None
+            reraise(*exc_info)
+
+
 class EventReceiver(ConsumerMixin):
     """Capture events.
 
     :param connection: Connection to the broker.
     :keyword handlers: Event handlers.
+    :keyword localize: Convert timestamps to the local timezone, using
+        the ``utcoffset`` field of the event.  Can be disabled when all
+        nodes use the same timezone, or the consumer does not need
+        to compare timestamps from different nodes.
+    :keyword threaded: Decode and process events in a separate
+        thread (see :class:`Decoder`).  Note that handlers are then
+        called from that thread.
 
     :attr:`handlers` is a dict of event types and their handlers,
     the special handler `"*"` captures all events that doesn't have a
     handler.
 
+    Batches of events sent by dispatchers with batching enabled
+    are unpacked, so that every event is processed separately.
+
+    Handlers receive the decoded message body as the event, with
+    the ``local_received`` field added, to avoid copying every event.
+
     """
+    Decoder = Decoder
+
+    _decoder = None
 
     def __init__(self, connection, handlers=None, routing_key='#',
-                 node_id=None, app=None, queue_prefix='celeryev'):
+                 node_id=None, app=None, queue_prefix='celeryev',
+                 localize=True, threaded=False):
         self.app = app_or_default(app)
         self.connection = connection
         self.handlers = {} if handlers is None else handlers
         self.routing_key = routing_key
         self.node_id = node_id or uuid()
         self.queue_prefix = queue_prefix
+        self.localize = localize
+        self.threaded = threaded
         self.exchange = get_exchange(self.connection or self.app.connection())
         self.queue = Queue('.'.join([self.queue_prefix, self.node_id]),
                            exchange=self.exchange,
@@ -286,15 +510,30 @@ class EventReceiver(ConsumerMixin):
         handler and handler(event)
 
     def get_consumers(self, Consumer, channel):
+        if self.threaded:
+            return [Consumer(queues=[self.queue],
+                             on_message=self._put_message, no_ack=True,
+                             accept=['application/json'])]
         return [Consumer(queues=[self.queue],
                          callbacks=[self._receive], no_ack=True,
                          accept=['application/json'])]
 
     def on_consume_ready(self, connection, channel, consumers,
                          wakeup=True, **kwargs):
+        if self.threaded and self._decoder is None:
+            self._decoder = self.Decoder(self._receive)
+            self._decoder.start()
         if wakeup:
             self.wakeup_workers(channel=channel)
 
+    def on_consume_end(self, connection, channel):
+        decoder, self._decoder = self._decoder, None
+        if decoder is not None:
+            decoder.stop()
+
+    def _put_message(self, message):
+        self._decoder.put(message)
+
     def itercapture(self, limit=None, timeout=None, wakeup=True):
         return self.consume(limit=limit, timeout=timeout, wakeup=wakeup)
 
@@ -330,7 +569,34 @@ class EventReceiver(ConsumerMixin):
         return type, Event(type, body, local_received=now())
 
     def _receive(self, body, message):
-        self.process(*self.event_from_message(body))
+        self.process_events(body if isinstance(body, list) else [body])
+
+    def process_events(self, events, now=time.time, tzfields=_TZGETTER,
+                       utcoffset=utcoffset):
+        """Process a list of decoded events (modified in place).
+
+        The logical clock is adjusted once for the whole batch, and
+        the receive time and the local utcoffset is only looked up once.
+
+        """
+        if not events:
+            return
+        received, here = now(), utcoffset() if self.localize else None
+        clock = max(event.get('clock') or 0 for event in events)
+        if clock:
+            self.adjust_clock(clock)
+        process = self.process
+        for event in events:
+            if here is not None:
+                try:
+                    offset, timestamp = tzfields(event)
+                except KeyError:
+                    pass
+                else:
+                    event['timestamp'] = timestamp - (offset - here) * 3600
+            event['local_received'] = received
+            type = event['type'] = event.get('type', '').lower()
+            process(type, event)
 
 
 class Events(object):
@@ -350,8 +616,9 @@ class Events(object):
 
     @cached_property
     def State(self):
-        return self.app.subclass_with_self('celery.events.state:State',
-                                           reverse='events.State')
+        return self.app.subclass_with_self(
+            self.app.conf.CELERY_EVENT_STATE, reverse='events.State',
+        )
 
     @contextmanager
     def default_dispatcher(self, hostname=None, enabled=True,
@@ -21,6 +21,7 @@ from math import ceil
 from celery import VERSION_BANNER
 from celery import states
 from celery.app import app_or_default
+from celery.events.log import EventLog
 from celery.five import items, values
 from celery.utils.text import abbr, abbrtask
 
@@ -36,7 +37,8 @@ MIN_TASK_WIDTH = 16
 # we don't care about coverage.
 
 STATUS_SCREEN = """\
-events: {s.event_count} tasks:{s.task_count} workers:{w_alive}/{w_all}
+events: {s.event_count} tasks:{s.task_count} workers:{w_alive}/{w_all} \
+rate:{rate:.1f}/s
 """
 
 
@@ -424,6 +426,7 @@ class CursesMonitor(object):  # pragma: no cover
                     w_alive=len([w for w in values(self.state.workers)
                                 if w.alive]),
                     w_all=len(self.state.workers),
+                    rate=self.state.metrics.throughput(),
                 ),
                 curses.A_DIM,
             )
@@ -498,7 +501,8 @@ class DisplayThread(threading.Thread):  # pragma: no cover
             self.display.nap()
 
 
-def capture_events(app, state, display):  # pragma: no cover
+def capture_events(app, state, display, on_event=None):  # pragma: no cover
+    on_event = on_event or state.event
 
     def on_connection_error(exc, interval):
         print('Connection Error: {0!r}. Retry in {1}s.'.format(
@@ -510,7 +514,7 @@ def capture_events(app, state, display):  # pragma: no cover
             try:
                 conn.ensure_connection(on_connection_error,
                                        app.conf.BROKER_CONNECTION_MAX_RETRIES)
-                recv = app.events.Receiver(conn, handlers={'*': state.event})
+                recv = app.events.Receiver(conn, handlers={'*': on_event})
                 display.resetscreen()
                 display.init_screen()
                 recv.capture()
@@ -518,15 +522,20 @@ def capture_events(app, state, display):  # pragma: no cover
                 print('Connection lost: {0!r}'.format(exc), file=sys.stderr)
 
 
-def evtop(app=None):  # pragma: no cover
+def evtop(app=None, event_log=None):  # pragma: no cover
     app = app_or_default(app)
     state = app.events.State()
+    on_event, log = state.event, None
+    if event_log:
+        log = EventLog(event_log)
+        log.replay(state)
+        on_event = log.recorder(state)
     display = CursesMonitor(state, app)
     display.init_screen()
     refresher = DisplayThread(display)
     refresher.start()
     try:
-        capture_events(app, state, display)
+        capture_events(app, state, display, on_event)
     except Exception:
         refresher.shutdown = True
         refresher.join()
@@ -536,6 +545,9 @@ def evtop(app=None):  # pragma: no cover
         refresher.shutdown = True
         refresher.join()
         display.resetscreen()
+    finally:
+        if log is not None:
+            log.close()
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -0,0 +1,582 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.events.indexed
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Alternative to :class:`celery.events.state.State` able to keep
+    track of millions of tasks.
+
+    Instead of keeping a :class:`~celery.events.state.Task` object for
+    every task, the fields of the tasks are stored in arrays (one array
+    per field), with task names and hostnames stored only once.
+    Indexes are kept by task name, worker and state, so that these
+    queries do not need to scan all of the tasks.  This uses a few
+    hundred bytes per task, in addition to the arguments and results
+    kept for the most recent tasks.
+
+    :class:`~celery.events.state.Task` objects are created on demand
+    when tasks are accessed, so modifying them will not change the state.
+
+"""
+from __future__ import absolute_import
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Mapping
+from heapq import nlargest
+from itertools import islice
+from time import time
+
+from celery import states
+from celery.five import items, range
+from celery.utils.functional import LRUCache
+
+from .state import EVENT_STATES, State, Task, Worker
+
+__all__ = ['TaskTable', 'IndexedState']
+
+#: Fields only stored for the most recent tasks,
+#: see :attr:`TaskTable.max_task_details`.
+DETAIL_FIELDS = ('args', 'kwargs', 'result', 'exception', 'traceback',
+                 'eta', 'expires', 'exchange', 'routing_key')
+
+#: Fields kept from events arriving out of order.
+MERGE_FIELDS = frozenset(Task.merge_rules[states.RECEIVED])
+
+#: Maps final states to the task attribute set to the time
+#: the task finished.
+FINISHED_FIELDS = {
+    states.SUCCESS: 'succeeded',
+    states.FAILURE: 'failed',
+    states.REVOKED: 'revoked',
+    states.RETRY: 'retried',
+}
+
+
+def _new_worker(hostname):
+    return Worker(hostname=hostname)
+
+
+class _Interned(object):
+    """Table of strings, each stored only once and referred
+    to by number.  0 is reserved for :const:`None`."""
+
+    def __init__(self):
+        self.values = [None]
+        self.ids = {None: 0}
+
+    def add(self, value):
+        try:
+            return self.ids[value]
+        except KeyError:
+            id = self.ids[value] = len(self.values)
+            self.values.append(value)
+            return id
+
+
+class _Column(object):
+    """Sequence view of a column in logical (insertion) order,
+    used to bisect the ring buffer."""
+
+    def __init__(self, table, column):
+        self.table = table
+        self.column = column
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        return self.column[self.table._row(self.table.oldest + index)]
+
+
+class TaskTable(Mapping):
+    """Compact storage of task state.
+
+    Tasks are stored in a ring buffer of arrays, so when
+    `max_tasks` is exceeded the oldest task will be evicted.
+
+    Every task is identified by a sequence number, increasing by
+    one for every new task, used in the indexes so that
+    evicted tasks can be detected.
+
+    Works as a read-only mapping of task ids to
+    :class:`~celery.events.state.Task` objects.
+
+    :keyword max_tasks: Maximum number of tasks to keep.
+    :keyword max_task_details: Number of tasks to keep the arguments,
+        result and traceback for, as these are usually much larger than
+        the rest of the task.
+    :keyword get_worker: Function returning the
+        :class:`~celery.events.state.Worker` for a hostname.
+
+    """
+
+    def __init__(self, max_tasks=1000000, max_task_details=10000,
+                 get_worker=None):
+        self.max_tasks = max_tasks
+        self.max_task_details = max_task_details
+        self.get_worker = get_worker or _new_worker
+        self.clear(ready=False)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('get_worker', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.get_worker = _new_worker
+
+    def clear(self, ready=True):
+        """Remove all tasks, or only the tasks in a ready state
+        if `ready` is true."""
+        if ready and self.seq:
+            keep = sorted(
+                seq for state, seqs in items(self._by_state)
+                if self._states.values[state] not in states.READY_STATES
+                for seq in seqs
+            )
+            previous = self.copy()
+        else:
+            keep, previous = [], None
+        self.seq = 0                    # sequence number of the next task
+        self._index = {}                # task id -> sequence number
+        self._uuids = []
+        self._seqs = array('l')
+        self._names = _Interned()
+        self._hostnames = _Interned()
+        self._states = _Interned()
+        self._name = array('I')
+        self._worker = array('I')
+        self._state = array('H')
+        self._clock = array('l')
+        self._retries = array('I')
+        self._first_seen = array('d')
+        self._timestamp = array('d')
+        self._sent = array('d')
+        self._received = array('d')
+        self._started = array('d')
+        self._finished = array('d')
+        self._runtime = array('d')
+        self._details = LRUCache(limit=self.max_task_details)
+        self._by_name = {}
+        self._by_worker = {}
+        self._by_state = {}
+        self._evicted = 0
+        for seq in keep:
+            self._copy_task(previous, seq)
+
+    def copy(self):
+        """Returns a shallow copy of the table."""
+        other = self.__class__.__new__(self.__class__)
+        other.__dict__.update(self.__dict__)
+        return other
+
+    @property
+    def limit(self):
+        # like LRUCache the oldest task is evicted
+        # when a new task is added to a full table.
+        return self.max_tasks
+
+    @property
+    def oldest(self):
+        """Sequence number of the oldest task kept."""
+        return self.seq - len(self._uuids)
+
+    def _row(self, seq):
+        return seq % self.max_tasks
+
+    def _append(self, uuid, first_seen):
+        seq = self.seq
+        self.seq += 1
+        self._index[uuid] = seq
+        if len(self._uuids) < self.max_tasks:
+            self._uuids.append(uuid)
+            self._seqs.append(seq)
+            for column in (self._name, self._worker, self._state,
+                           self._clock, self._retries):
+                column.append(0)
+            for column in (self._timestamp, self._sent, self._received,
+                           self._started, self._finished, self._runtime):
+                column.append(0.0)
+            self._first_seen.append(first_seen)
+        else:
+            row = self._row(seq)
+            self._evict(row)
+            self._uuids[row] = uuid
+            self._seqs[row] = seq
+            for column in (self._name, self._worker, self._state,
+                           self._clock, self._retries):
+                column[row] = 0
+            for column in (self._timestamp, self._sent, self._received,
+                           self._started, self._finished, self._runtime):
+                column[row] = 0.0
+            self._first_seen[row] = first_seen
+        self._by_state.setdefault(0, set()).add(seq)
+        return seq
+
+    def _evict(self, row):
+        seq = self._seqs[row]
+        self._index.pop(self._uuids[row], None)
+        self._by_state[self._state[row]].discard(seq)
+        self._details.pop(seq, None)
+        self._evicted += 1
+        if self._evicted >= max(self.max_tasks // 4, 1):
+            self._trim_indexes(seq + 1)
+
+    def _trim_indexes(self, oldest):
+        # remove references to evicted tasks from the front of the indexes.
+        for index in (self._by_name, self._by_worker):
+            for seqs in list(index.values()):
+                del seqs[:bisect_left(seqs, oldest)]
+        self._evicted = 0
+
+    def _index_add(self, index, key, seq):
+        try:
+            seqs = index[key]
+        except KeyError:
+            seqs = index[key] = array('l')
+        if not seqs or seqs[-1] < seq:
+            seqs.append(seq)
+        else:
+            # an older task can be assigned to a worker after newer
+            # tasks (e.g. task-sent before task-received), and the
+            # indexes must stay sorted for trimming and ordering.
+            i = bisect_left(seqs, seq)
+            if i == len(seqs) or seqs[i] != seq:
+                seqs.insert(i, seq)
+
+    def _copy_task(self, other, seq):
+        row = other._row(seq)
+        new = self._append(other._uuids[row], other._first_seen[row])
+        self._set_state(new, self._states.add(
+            other._states.values[other._state[row]]))
+        self._set_name(new, other._names.values[other._name[row]])
+        self._set_worker(new, other._hostnames.values[other._worker[row]])
+        dest = self._row(new)
+        for column in ('_clock', '_retries', '_timestamp', '_sent',
+                       '_received', '_started', '_finished', '_runtime'):
+            getattr(self, column)[dest] = getattr(other, column)[row]
+        details = other._details.get(seq)
+        if details is not None:
+            self._details[new] = details
+
+    def _set_state(self, seq, state):
+        row = self._row(seq)
+        prev = self._state[row]
+        if state != prev:
+            self._by_state[prev].discard(seq)
+            self._by_state.setdefault(state, set()).add(seq)
+            self._state[row] = state
+
+    def _set_name(self, seq, name):
+        row = self._row(seq)
+        name = self._names.add(name)
+        if name and name != self._name[row]:
+            self._name[row] = name
+            self._index_add(self._by_name, name, seq)
+
+    def _set_worker(self, seq, hostname):
+        row = self._row(seq)
+        worker = self._hostnames.add(hostname)
+        if worker and worker != self._worker[row]:
+            self._worker[row] = worker
+            self._index_add(self._by_worker, worker, seq)
+
+    def update(self, type, fields, _precedence=states.precedence):
+        """Update task from event.
+
+        :param type: Event type without the group (e.g. ``succeeded``).
+        :param fields: Event fields.
+
+        Returns true if the task was created.
+
+        """
+        uuid = fields['uuid']
+        seq = self._index.get(uuid)
+        created = seq is None
+        if created:
+            first_seen = fields.get('local_received')
+            seq = self._append(
+                uuid, time() if first_seen is None else first_seen,
+            )
+        row = self._row(seq)
+        state = EVENT_STATES.get(type) or type.upper()
+        timestamp = fields.get('timestamp') or 0.0
+
+        if type == 'received':
+            self._received[row] = timestamp
+        elif type == 'started':
+            self._started[row] = timestamp
+        elif type == 'sent':
+            self._sent[row] = timestamp
+        elif state in FINISHED_FIELDS:
+            self._finished[row] = timestamp
+
+        self._set_worker(seq, fields.get('hostname'))
+        current = self._states.values[self._state[row]]
+        if current is not None and state != states.RETRY and \
+                current != states.RETRY and \
+                _precedence(state) > _precedence(current):
+            # this event logically happens-before the current state,
+            # so only keep the fields that belong to that state.
+            if state != states.RECEIVED:
+                return created
+            fields = dict((key, value) for key, value in items(fields)
+                          if key in MERGE_FIELDS)
+        else:
+            self._set_state(seq, self._states.add(state))
+            self._timestamp[row] = timestamp
+            self._clock[row] = fields.get('clock') or 0
+            runtime = fields.get('runtime')
+            if runtime is not None:
+                self._runtime[row] = runtime
+
+        name = fields.get('name')
+        if name is not None:
+            self._set_name(seq, name)
+        retries = fields.get('retries')
+        if retries is not None:
+            self._retries[row] = retries
+        details = None
+        for key in DETAIL_FIELDS:
+            value = fields.get(key)
+            if value is not None:
+                if details is None:
+                    details = self._details.get(seq)
+                    if details is None:
+                        details = self._details[seq] = {}
+                details[key] = value
+        return created
+
+    def queue_info(self, uuid):
+        """Returns tuple of ``(name, time_queued)`` for task, where
+        `time_queued` is the time the task was sent, or received
+        if that is not known."""
+        row = self._row(self._index[uuid])
+        return (self._names.values[self._name[row]],
+                self._sent[row] or self._received[row] or None)
+
+    def task(self, seq):
+        """Create :class:`~celery.events.state.Task` for the task with
+        sequence number `seq`."""
+        row = self._row(seq)
+        state = self._states.values[self._state[row]] or states.PENDING
+        hostname = self._hostnames.values[self._worker[row]]
+        task = Task(
+            uuid=self._uuids[row],
+            name=self._names.values[self._name[row]],
+            state=state,
+            worker=self.get_worker(hostname) if hostname else None,
+            clock=self._clock[row],
+            retries=self._retries[row],
+            timestamp=self._timestamp[row] or None,
+            sent=self._sent[row] or False,
+            received=self._received[row] or False,
+            started=self._started[row] or False,
+            runtime=self._runtime[row] or None,
+        )
+        finished = self._finished[row]
+        if finished and state in FINISHED_FIELDS:
+            task[FINISHED_FIELDS[state]] = finished
+        details = self._details.get(seq)
+        if details:
+            # not Task.update, which applies a state transition.
+            dict.update(task, details)
+        return task
+
+    def _iterseqs(self, seqs, limit=None):
+        # newest first, skipping evicted tasks.
+        oldest = self.oldest
+        it = (seq for seq in reversed(seqs) if seq >= oldest)
+        return islice(it, 0, limit) if limit else it
+
+    def _items(self, seqs):
+        task, uuids, row = self.task, self._uuids, self._row
+        for seq in seqs:
+            yield uuids[row(seq)], task(seq)
+
+    def by_time(self, limit=None):
+        """Iterate over ``(uuid, Task)`` tuples, newest first."""
+        return self._items(self._iterseqs(range(self.oldest, self.seq),
+                                          limit))
+
+    def by_name(self, name, limit=None):
+        """Iterate over ``(uuid, Task)`` tuples for tasks of
+        type `name`, newest first."""
+        name_id = self._names.ids.get(name)
+        seqs = self._by_name.get(name_id, ())
+        name_at, row = self._name, self._row
+        return islice(self._items(
+            seq for seq in self._iterseqs(seqs)
+            if name_at[row(seq)] == name_id), 0, limit)
+
+    def by_worker(self, hostname, limit=None):
+        """Iterate over ``(uuid, Task)`` tuples for tasks
+        executed by `hostname`, newest first."""
+        worker_id = self._hostnames.ids.get(hostname)
+        seqs = self._by_worker.get(worker_id, ())
+        worker_at, row = self._worker, self._row
+        return islice(self._items(
+            seq for seq in self._iterseqs(seqs)
+            if worker_at[row(seq)] == worker_id), 0, limit)
+
+    def by_state(self, state, limit=None):
+        """Iterate over ``(uuid, Task)`` tuples for tasks
+        in `state`, newest first."""
+        seqs = self._by_state.get(self._states.ids.get(state), ())
+        return self._items(nlargest(limit, seqs) if limit
+                           else sorted(seqs, reverse=True))
+
+    def between(self, start, end=None, limit=None):
+        """Iterate over ``(uuid, Task)`` tuples for tasks first seen
+        between `start` and `end` (local timestamps), oldest first."""
+        column = _Column(self, self._first_seen)
+        lo = bisect_left(column, start)
+        hi = bisect_right(column, end) if end is not None else len(column)
+        seqs = range(self.oldest + lo, self.oldest + hi)
+        return self._items(islice(seqs, 0, limit) if limit else seqs)
+
+    def names(self):
+        """Returns a set of the task names seen for tasks still kept."""
+        oldest = self.oldest
+        return set(self._names.values[name]
+                   for name, seqs in items(self._by_name)
+                   if seqs and seqs[-1] >= oldest)
+
+    def count(self, state):
+        """Returns the number of tasks in `state`."""
+        return len(self._by_state.get(self._states.ids.get(state), ()))
+
+    def __getitem__(self, uuid):
+        return self.task(self._index[uuid])
+
+    def __contains__(self, uuid):
+        return uuid in self._index
+
+    def __iter__(self):
+        uuids, row = self._uuids, self._row
+        return (uuids[row(seq)] for seq in range(self.oldest, self.seq))
+
+    def __len__(self):
+        return len(self._uuids)
+
+
+class IndexedState(State):
+    """Cluster state keeping tasks in a :class:`TaskTable`.
+
+    Can be used instead of :class:`~celery.events.state.State`,
+    by setting :setting:`CELERY_EVENT_STATE` to
+    ``"celery.events.indexed:IndexedState"``.
+
+    :attr:`tasks` is a read-only mapping, so tasks can only be changed
+    by events.  Tasks ordered by time are ordered by the time
+    the first event for the task was received.
+
+    """
+
+    def __init__(self, callback=None, workers=None, tasks=None,
+                 taskheap=None, max_workers_in_memory=5000,
+                 max_tasks_in_memory=1000000, max_task_details=10000,
+                 metrics=None):
+        super(IndexedState, self).__init__(
+            callback, workers, tasks=(), taskheap=(),
+            max_workers_in_memory=max_workers_in_memory,
+            max_tasks_in_memory=max_tasks_in_memory,
+            metrics=metrics,
+        )
+        self.max_task_details = max_task_details
+        if tasks is None:
+            tasks = TaskTable(max_tasks_in_memory, max_task_details)
+        tasks.get_worker = self._get_worker
+        self.tasks = tasks
+
+    def _get_worker(self, hostname):
+        return self.get_or_create_worker(hostname)[0]
+
+    def _clear_tasks(self, ready=True):
+        before = set(self.tasks) if self._changed_tasks is not None else None
+        self.tasks.clear(ready)
+        if before is not None:
+            self._mark_removed(self._removed_tasks, self._changed_tasks,
+                               before.difference(self.tasks))
+
+    def _changes(self):
+        # tasks are only materialized when the changes are requested.
+        changes = super(IndexedState, self)._changes()
+        tasks = self.tasks
+        return changes._replace(tasks=dict(
+            (uuid, tasks[uuid]) for uuid in changes.tasks if uuid in tasks
+        ))
+
+    def _track_task(self, uuid):
+        if uuid not in self.tasks:
+            self._mark_removed(self._removed_tasks, self._changed_tasks,
+                               self._evicting(self.tasks))
+        self._changed_tasks[uuid] = None
+        self._removed_tasks.discard(uuid)
+
+    def get_or_create_task(self, uuid):
+        """Get or create task by uuid."""
+        created = uuid not in self.tasks
+        if created:
+            if self._changed_tasks is not None:
+                self._track_task(uuid)
+            self.tasks.update('pending', {'uuid': uuid})
+        return self.tasks[uuid], created
+
+    def task_event(self, type, fields):
+        """Process task event."""
+        worker, _ = self.get_or_create_worker(fields['hostname'])
+        time_received = fields.get('local_received')
+        if time_received:
+            worker.update_heartbeat(time_received, fields.get('timestamp'))
+        if type == 'received':
+            self.task_count += fields.get('weight', 1)
+        if self._changed_tasks is not None:
+            self._track_task(fields['uuid'])
+        created = self.tasks.update(type, fields)
+        self._task_metrics(type, fields,
+                           *self.tasks.queue_info(fields['uuid']))
+        return created
+
+    def itertasks(self, limit=None):
+        return islice(iter(items(self.tasks)), 0, limit)
+
+    def tasks_by_time(self, limit=None):
+        """Generator giving tasks ordered by time (newest first),
+        in ``(uuid, Task)`` tuples."""
+        return self.tasks.by_time(limit)
+    tasks_by_timestamp = tasks_by_time
+
+    def tasks_by_type(self, name, limit=None):
+        """Get all tasks by type (newest first).
+
+        Returns a list of ``(uuid, Task)`` tuples.
+
+        """
+        return self.tasks.by_name(name, limit)
+
+    def tasks_by_worker(self, hostname, limit=None):
+        """Get all tasks by worker (newest first)."""
+        return self.tasks.by_worker(hostname, limit)
+
+    def tasks_by_state(self, state, limit=None):
+        """Get all tasks in state (newest first)."""
+        return self.tasks.by_state(state, limit)
+
+    def tasks_between(self, start, end=None, limit=None):
+        """Get all tasks first seen between `start` and `end`,
+        as local timestamps (oldest first)."""
+        return self.tasks.between(start, end, limit)
+
+    def task_types(self):
+        """Returns a list of all seen task types."""
+        return list(sorted(self.tasks.names()))
+
+    def __reduce__(self):
+        return self.__class__, (
+            self.event_callback, self.workers, self.tasks, None,
+            self.max_workers_in_memory, self.max_tasks_in_memory,
+            self.max_task_details, self.metrics,
+        )
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.events.log
+    ~~~~~~~~~~~~~~~~~
+
+    Durable log of received events.
+
+    Events are appended to a directory of segment files in compressed
+    blocks, and the time range covered by each block is kept in an
+    index, so that monitors and cameras can rebuild their
+    :class:`~celery.events.state.State` after a restart, either from
+    the beginning of the log or from any point in time.
+
+"""
+from __future__ import absolute_import
+
+import os
+import struct
+import zlib
+
+from time import time
+
+from celery.events.state import _lamportinfo
+from celery.five import range
+from celery.utils.log import get_logger
+from celery.utils.serialization import pickle
+
+__all__ = ['EventLog']
+
+logger = get_logger(__name__)
+
+#: Block header: length of data, number of events,
+#: lowest and highest timestamp.
+BLOCK = struct.Struct('!IIdd')
+
+#: Index entry: offset of the block in the segment + block header.
+INDEX = struct.Struct('!QIIdd')
+
+SEGMENT_SUFFIX = '.log'
+INDEX_SUFFIX = '.idx'
+
+CORRUPT_BLOCK = """\
+Event log segment %r has a corrupt block at offset %r: %r\
+"""
+
+
+def _order(event):
+    # same ordering as State uses for its task heap: task-sent events
+    # are sent by clients that do not share the logical clock.
+    clock = 0 if event.get('type') == 'task-sent' else event.get('clock')
+    return _lamportinfo(clock or 0, event.get('timestamp') or 0,
+                        event.get('hostname') or '', None)
+
+
+class EventLog(object):
+    """Append-only log of events kept in `path`.
+
+    :param path: Directory to store the log in, it will be
+        created if it does not exist.
+    :keyword block_size: Maximum number of events written in one block.
+    :keyword flush_interval: Maximum number of seconds events are
+        buffered before they are written.
+    :keyword segment_size: Start a new segment file when the current
+        segment is larger than this (in bytes).
+    :keyword max_segments: Remove the oldest segments when there are more
+        than this number of segments.  Default is to keep all segments.
+
+    Events are written in blocks sorted by the logical clock, so
+    that replaying the log applies events in the same order
+    as :class:`~celery.events.state.State` would sort them.
+
+    The log can be used directly as an event handler, or combined
+    with a state using :meth:`recorder`::
+
+        log = EventLog('/var/run/celery/events')
+        log.replay(state)
+        recv = app.events.Receiver(conn, handlers={'*': log.recorder(state)})
+
+    .. note::
+
+        Blocks are serialized using :mod:`pickle`, so the log directory
+        must only be writable by trusted users.
+
+    """
+    block_size = 4096
+    flush_interval = 1.0
+    segment_size = 64 * 1024 * 1024
+    max_segments = None
+
+    #: zlib compression level, favors speed over size by default.
+    compress_level = 1
+
+    _segment = None
+    _index = None
+
+    def __init__(self, path, block_size=None, flush_interval=None,
+                 segment_size=None, max_segments=None):
+        self.path = path
+        self.block_size = block_size or self.block_size
+        self.flush_interval = (self.flush_interval if flush_interval is None
+                               else flush_interval)
+        self.segment_size = segment_size or self.segment_size
+        self.max_segments = max_segments or self.max_segments
+        self._buffer = []
+        self._buffer_started = None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def append(self, event, time=time):
+        """Add event to the log.
+
+        The event is buffered, and will be written when the
+        current block is full or the flush interval has passed.
+
+        """
+        buffer = self._buffer
+        if not buffer:
+            self._buffer_started = time()
+        buffer.append(event)
+        if len(buffer) >= self.block_size or \
+                time() - self._buffer_started >= self.flush_interval:
+            self.flush()
+    __call__ = append
+
+    def recorder(self, state):
+        """Returns an event handler applying events to `state`
+        and appending them to the log."""
+        apply, append = state.event, self.append
+
+        def record(event):
+            apply(event)
+            append(event)
+        return record
+
+    def flush(self):
+        """Write buffered events to the log."""
+        events, self._buffer = self._buffer, []
+        if events:
+            self._write_block(events)
+
+    def close(self):
+        self.flush()
+        self._close_segment()
+
+    def _write_block(self, events, dumps=pickle.dumps,
+                     compress=zlib.compress):
+        events.sort(key=_order)
+        stamps = [event.get('timestamp') or 0 for event in events]
+        data = compress(dumps(events, protocol=pickle.HIGHEST_PROTOCOL),
+                        self.compress_level)
+        header = (len(data), len(events), min(stamps), max(stamps))
+        segment, index = self._open_segment()
+        offset = segment.tell()
+        segment.write(BLOCK.pack(*header) + data)
+        segment.flush()
+        # the index is written last, so it never refers to
+        # a block that has not been written completely.
+        index.write(INDEX.pack(offset, *header))
+        index.flush()
+        if segment.tell() >= self.segment_size:
+            self._close_segment()
+
+    def _open_segment(self):
+        if self._segment is None:
+            # a new segment is always started when the log is opened,
+            # so we never append to a segment that was left incomplete.
+            segments = self.segments()
+            n = segments[-1] + 1 if segments else 0
+            self._segment = open(self._filename(n, SEGMENT_SUFFIX), 'ab')
+            self._index = open(self._filename(n, INDEX_SUFFIX), 'ab')
+            self._prune(segments + [n])
+        return self._segment, self._index
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = self._index = None
+
+    def _prune(self, segments):
+        if self.max_segments:
+            for n in segments[:-self.max_segments]:
+                for suffix in SEGMENT_SUFFIX, INDEX_SUFFIX:
+                    try:
+                        os.unlink(self._filename(n, suffix))
+                    except OSError:
+                        pass
+
+    def _filename(self, n, suffix):
+        return os.path.join(self.path, '{0:010d}{1}'.format(n, suffix))
+
+    def segments(self):
+        """Returns the sorted list of segment numbers."""
+        return sorted(
+            int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.path)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def index(self, n):
+        """Returns the index of segment `n` as a list of
+        ``(offset, length, count, first, last)`` tuples.
+
+        The index is rebuilt from the block headers if the index
+        file is missing.
+
+        """
+        try:
+            with open(self._filename(n, INDEX_SUFFIX), 'rb') as fh:
+                data = fh.read()
+        except (IOError, OSError):
+            return self._scan(n)
+        size = INDEX.size
+        return [INDEX.unpack_from(data, offset)
+                for offset in range(0, len(data) - size + 1, size)]
+
+    def _scan(self, n):
+        entries = []
+        with open(self._filename(n, SEGMENT_SUFFIX), 'rb') as fh:
+            offset = 0
+            while 1:
+                header = fh.read(BLOCK.size)
+                if len(header) < BLOCK.size:
+                    break
+                entries.append((offset, ) + BLOCK.unpack(header))
+                offset += BLOCK.size + entries[-1][1]
+                fh.seek(offset)
+        return entries
+
+    def blocks(self, since=None, until=None,
+               loads=pickle.loads, decompress=zlib.decompress):
+        """Iterate over the blocks containing events with timestamps
+        in the range ``since..until``.
+
+        Yields ``(first, last, events)`` tuples, where `first` and `last`
+        is the lowest and highest timestamp in the block.
+
+        """
+        for n in self.segments():
+            try:
+                entries = [
+                    entry for entry in self.index(n)
+                    if (since is None or entry[4] >= since) and
+                    (until is None or entry[3] <= until)
+                ]
+            except (IOError, OSError):  # segment removed by prune
+                continue
+            if not entries:
+                continue
+            with open(self._filename(n, SEGMENT_SUFFIX), 'rb') as fh:
+                for offset, length, _, first, last in entries:
+                    fh.seek(offset + BLOCK.size)
+                    data = fh.read(length)
+                    if len(data) < length:  # incomplete write
+                        break
+                    try:
+                        events = loads(decompress(data))
+                    except Exception as exc:
+                        logger.error(CORRUPT_BLOCK, n, offset, exc)
+                        break
+                    yield first, last, events
+
+    def events(self, since=None, until=None):
+        """Iterate over logged events with timestamps in the range
+        ``since..until`` (both inclusive, and optional).
+
+        Events still buffered are not included, see :meth:`flush`.
+
+        """
+        for first, last, events in self.blocks(since, until):
+            if (since is None or first >= since) and \
+                    (until is None or last <= until):
+                for event in events:
+                    yield event
+            else:
+                for event in events:
+                    timestamp = event.get('timestamp') or 0
+                    if (since is None or timestamp >= since) and \
+                            (until is None or timestamp <= until):
+                        yield event
+
+    def replay(self, state, since=None, until=None):
+        """Apply logged events to `state`, returns the number of
+        events applied."""
+        return state.replay(self.events(since, until))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -9,6 +9,11 @@
     implementation of this writing the snapshots to a database
     in :mod:`djcelery.snapshots` in the `django-celery` distribution.
 
+    Cameras setting :attr:`Polaroid.delta` only receive the tasks and
+    workers that changed since the previous snapshot, so the cost of
+    taking a snapshot depends on the event rate rather than on the
+    number of tasks kept in memory.
+
 """
 from __future__ import absolute_import
 
@@ -16,6 +21,7 @@ from kombu.utils.limits import TokenBucket
 
 from celery import platforms
 from celery.app import app_or_default
+from celery.events.log import EventLog
 from celery.utils import timer2
 from celery.utils.dispatch import Signal
 from celery.utils.imports import instantiate
@@ -31,6 +37,10 @@ class Polaroid(object):
     cleanup_signal = Signal()
     clear_after = False
 
+    #: If enabled :meth:`on_changes` is called with the changes since
+    #: the previous shutter, instead of calling :meth:`on_shutter`.
+    delta = False
+
     _tref = None
     _ctref = None
 
@@ -43,6 +53,8 @@ class Polaroid(object):
         self.timer = timer or self.timer
         self.logger = logger
         self.maxrate = maxrate and TokenBucket(rate(maxrate))
+        if self.delta:
+            state.track_changes()
 
     def install(self):
         self._tref = self.timer.apply_interval(self.freq * 1000.0,
@@ -53,6 +65,11 @@ class Polaroid(object):
     def on_shutter(self, state):
         pass
 
+    def on_changes(self, state, changes):
+        """Called for delta cameras with the
+        :class:`~celery.events.state.Changes` since the last shutter."""
+        pass
+
     def on_cleanup(self):
         pass
 
@@ -65,7 +82,11 @@ class Polaroid(object):
         if self.maxrate is None or self.maxrate.can_consume():
             logger.debug('Shutter: %s', self.state)
             self.shutter_signal.send(self.state)
-            self.on_shutter(self.state)
+            if self.delta:
+                # changes are kept until the next shutter if rate limited.
+                self.on_changes(self.state, self.state._changes())
+            else:
+                self.on_shutter(self.state)
 
     def capture(self):
         self.state.freeze_while(self.shutter, clear_after=self.clear_after)
@@ -86,7 +107,8 @@ class Polaroid(object):
 
 
 def evcam(camera, freq=1.0, maxrate=None, loglevel=0,
-          logfile=None, pidfile=None, timer=None, app=None):
+          logfile=None, pidfile=None, timer=None, app=None,
+          event_log=None):
     app = app_or_default(app)
 
     if pidfile:
@@ -97,11 +119,17 @@ def evcam(camera, freq=1.0, maxrate=None, loglevel=0,
     print('-> evcam: Taking snapshots with {0} (every {1} secs.)'.format(
         camera, freq))
     state = app.events.State()
+    on_event, log = state.event, None
+    if event_log:
+        log = EventLog(event_log)
+        print('-> evcam: Replayed {0} events from {1}'.format(
+            log.replay(state), event_log))
+        on_event = log.recorder(state)
     cam = instantiate(camera, state, app=app, freq=freq,
                       maxrate=maxrate, timer=timer)
     cam.install()
     conn = app.connection()
-    recv = app.events.Receiver(conn, handlers={'*': state.event})
+    recv = app.events.Receiver(conn, handlers={'*': on_event})
     try:
         try:
             recv.capture(limit=None)
@@ -110,3 +138,5 @@ def evcam(camera, freq=1.0, maxrate=None, loglevel=0,
     finally:
         cam.cancel()
         conn.close()
+        if log is not None:
+            log.close()
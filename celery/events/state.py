@@ -20,8 +20,10 @@ from __future__ import absolute_import
 
 import threading
 
+from collections import namedtuple
 from heapq import heappush, heappop
 from itertools import islice
+from math import frexp
 from operator import itemgetter
 from time import time
 
@@ -29,7 +31,7 @@ from kombu.utils import kwdict
 
 from celery import states
 from celery.datastructures import AttributeDict
-from celery.five import items, values
+from celery.five import items, range, values
 from celery.utils.functional import LRUCache
 from celery.utils.log import get_logger
 
@@ -47,6 +49,24 @@ Substantial drift from %s may mean clocks are out of sync.  Current drift is
 %s seconds (including message overhead).\
 """
 
+#: Maps task event types to the state of the task.
+EVENT_STATES = {
+    'sent': states.PENDING,
+    'received': states.RECEIVED,
+    'started': states.STARTED,
+    'succeeded': states.SUCCESS,
+    'failed': states.FAILURE,
+    'retried': states.RETRY,
+    'revoked': states.REVOKED,
+}
+
+#: Tasks and workers changed since the last call to
+#: :meth:`State.changes`, and the ids of the tasks and hostnames of
+#: the workers removed from the state.
+Changes = namedtuple('Changes', (
+    'tasks', 'workers', 'removed_tasks', 'removed_workers',
+))
+
 logger = get_logger(__name__)
 warn = logger.warning
 
@@ -139,8 +159,15 @@ class Worker(AttributeDict):
         self.update(**kwargs)
         self.heartbeats = []
 
-    def on_heartbeat(self, timestamp=None, local_received=None, **kwargs):
-        """Callback for the :event:`worker-heartbeat` event."""
+    def on_heartbeat(self, timestamp=None, local_received=None,
+                     delta=False, **kwargs):
+        """Callback for the :event:`worker-heartbeat` event.
+
+        Heartbeats marked as `delta` only contain the fields that changed
+        since the previous heartbeat, so they are merged with the
+        fields already received.
+
+        """
         self.update(**kwargs)
         self.update_heartbeat(local_received, timestamp)
 
@@ -163,6 +190,14 @@ class Worker(AttributeDict):
     def status_string(self):
         return 'ONLINE' if self.alive else 'OFFLINE'
 
+    @property
+    def utilization(self):
+        """Ratio of pool processes busy executing tasks, or
+        :const:`None` if the pool size is not reported by the worker."""
+        pool_size = self.get('pool_size')
+        if pool_size:
+            return self.get('active', 0) / float(pool_size)
+
     @property
     def heartbeat_expires(self):
         return heartbeat_expires(self.heartbeats[-1],
@@ -295,15 +330,231 @@ class Task(AttributeDict):
         return self.state in states.READY_STATES
 
 
+class Histogram(object):
+    """Histogram of durations, using buckets growing by a factor of two,
+    so that percentiles can be estimated in constant time and space.
+
+    :keyword base: Upper bound of the first bucket, in seconds.
+    :keyword buckets: Number of buckets, values larger than the last
+        bucket are counted in the last bucket.
+
+    """
+
+    def __init__(self, base=0.001, buckets=24):
+        self.base = base
+        self.buckets = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value, weight=1, frexp=frexp):
+        if value >= self.base:
+            index = min(frexp(value / self.base)[1], len(self.buckets) - 1)
+        else:
+            index = 0
+        self.buckets[index] += weight
+        self.count += weight
+        self.total += value * weight
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Estimate the `q`'th percentile (0-100).
+
+        The upper bound of the bucket containing the percentile is
+        returned, so this may be up to twice the actual value.
+
+        """
+        if not self.count:
+            return None
+        threshold, seen = self.count * q / 100.0, 0
+        for index, count in enumerate(self.buckets[:-1]):
+            seen += count
+            if count and seen >= threshold:
+                return min(self.base * 2 ** index, self.max)
+        # the last bucket has no upper bound.
+        return self.max
+
+    @property
+    def mean(self):
+        if self.count:
+            return self.total / self.count
+
+
+class Throughput(object):
+    """Number of events in sliding windows of time (by default
+    the last 1, 5 and 15 minutes), using one counter per second.
+
+    :keyword windows: Window sizes in seconds.
+
+    """
+    windows = (60, 300, 900)
+
+    def __init__(self, windows=None):
+        self.windows = tuple(windows or self.windows)
+        self.size = max(self.windows)
+        self.slots = [0] * self.size
+        self.sums = dict((window, 0) for window in self.windows)
+        self.now = None
+
+    def add(self, timestamp, weight=1):
+        second = int(timestamp)
+        self.advance(second)
+        now = self.now
+        if second > now - self.size:
+            self.slots[second % self.size] += weight
+            for window in self.windows:
+                if second > now - window:
+                    self.sums[window] += weight
+
+    def advance(self, second):
+        """Move the windows forward to end at `second`."""
+        now = self.now
+        if now is None or second - now >= self.size:
+            self.slots = [0] * self.size
+            self.sums = dict((window, 0) for window in self.windows)
+        elif second > now:
+            slots, sums, size = self.slots, self.sums, self.size
+            for current in range(now + 1, second + 1):
+                for window in self.windows:
+                    sums[window] -= slots[(current - window) % size]
+                slots[current % size] = 0
+        else:
+            return
+        self.now = second
+
+    def count(self, window=60, now=None):
+        """Returns the number of events in the last `window` seconds."""
+        self.advance(int(time() if now is None else now))
+        return self.sums[window]
+
+    def rate(self, window=60, now=None):
+        """Returns the average number of events per second
+        in the last `window` seconds."""
+        return self.count(window, now) / float(window)
+
+
+class Metrics(object):
+    """Aggregate task metrics, updated incrementally as events are
+    received by :class:`State`.
+
+    Keeps the number of tasks in each state by task name and by worker,
+    histograms of runtimes and of the time tasks spent waiting
+    to be started (from the time the task was sent, or received if
+    :event:`task-sent` events are not enabled), and the
+    throughput of each state over sliding windows.
+
+    All queries take constant time.
+
+    """
+    Histogram = Histogram
+    Throughput = Throughput
+
+    def __init__(self, windows=None):
+        self.windows = windows
+        self.clear()
+
+    def clear(self):
+        self.totals = {}
+        self.by_name = {}
+        self.by_worker = {}
+        self.runtimes = {}
+        self.latencies = {}
+        self.rates = {}
+
+    def _incr(self, counts, key, state, weight):
+        counts = counts.setdefault(key, {})
+        counts[state] = counts.get(state, 0) + weight
+
+    def _histogram(self, histograms, name):
+        try:
+            return histograms[name]
+        except KeyError:
+            histogram = histograms[name] = self.Histogram()
+            return histogram
+
+    def add(self, state, name=None, hostname=None, timestamp=None,
+            weight=1, runtime=None, latency=None):
+        """Record that a task entered `state`.
+
+        :keyword timestamp: Local time the event was received.
+        :keyword weight: Number of tasks this represents (see
+            :setting:`CELERY_EVENT_SAMPLING`).
+        :keyword runtime: Runtime of the task, in seconds.
+        :keyword latency: Time the task was waiting to be started,
+            in seconds.
+
+        """
+        self.totals[state] = self.totals.get(state, 0) + weight
+        if name is not None:
+            self._incr(self.by_name, name, state, weight)
+        if hostname is not None:
+            self._incr(self.by_worker, hostname, state, weight)
+        if runtime is not None:
+            self._histogram(self.runtimes, None).add(runtime, weight)
+            if name is not None:
+                self._histogram(self.runtimes, name).add(runtime, weight)
+        if latency is not None:
+            self._histogram(self.latencies, None).add(latency, weight)
+            if name is not None:
+                self._histogram(self.latencies, name).add(latency, weight)
+        try:
+            rate = self.rates[state]
+        except KeyError:
+            rate = self.rates[state] = self.Throughput(self.windows)
+        rate.add(time() if timestamp is None else timestamp, weight)
+
+    def counts(self, name=None, hostname=None):
+        """Returns a mapping of states to the number of tasks
+        in that state, for all tasks or for tasks with a given
+        name or executed by `hostname`."""
+        if name is not None:
+            return dict(self.by_name.get(name) or {})
+        if hostname is not None:
+            return dict(self.by_worker.get(hostname) or {})
+        return dict(self.totals)
+
+    def failure_rate(self, name=None, hostname=None):
+        """Returns the ratio of completed tasks that failed."""
+        counts = self.counts(name, hostname)
+        failed = counts.get(states.FAILURE, 0)
+        done = failed + counts.get(states.SUCCESS, 0)
+        return failed / float(done) if done else 0.0
+
+    def runtime(self, name=None):
+        """Returns the runtime :class:`Histogram` for all tasks,
+        or tasks with a given name (:const:`None` if no tasks)."""
+        return self.runtimes.get(name)
+
+    def latency(self, name=None):
+        """Returns the :class:`Histogram` of the time tasks waited
+        to be started (:const:`None` if no tasks)."""
+        return self.latencies.get(name)
+
+    def throughput(self, window=60, state=states.SUCCESS, now=None):
+        """Returns the number of tasks entering `state` per second
+        in the last `window` seconds (by default the last minute)."""
+        try:
+            return self.rates[state].rate(window, now)
+        except KeyError:
+            return 0.0
+
+
 class State(object):
     """Records clusters state."""
     event_count = 0
     task_count = 0
 
+    #: Changes are only tracked after :meth:`track_changes` is called.
+    _changed_tasks = None
+
     def __init__(self, callback=None,
                  workers=None, tasks=None, taskheap=None,
-                 max_workers_in_memory=5000, max_tasks_in_memory=10000):
+                 max_workers_in_memory=5000, max_tasks_in_memory=10000,
+                 metrics=None):
         self.event_callback = callback
+        #: Aggregate task metrics, see :class:`Metrics`.
+        self.metrics = Metrics() if metrics is None else metrics
         self.workers = (LRUCache(max_workers_in_memory)
                         if workers is None else workers)
         self.tasks = (LRUCache(max_tasks_in_memory)
@@ -325,11 +576,50 @@ class State(object):
                 if clear_after:
                     self._clear()
 
+    def track_changes(self):
+        """Start keeping track of the tasks and workers that changed,
+        so that :meth:`changes` can be used to process only the records
+        changed since it was last called."""
+        with self._mutex:
+            self._reset_changes()
+
+    def _reset_changes(self):
+        self._changed_tasks, self._changed_workers = {}, {}
+        self._removed_tasks, self._removed_workers = set(), set()
+
+    def changes(self):
+        """Returns the :class:`Changes` since this was last called
+        (or since :meth:`track_changes` was called)."""
+        with self._mutex:
+            return self._changes()
+
+    def _changes(self):
+        if self._changed_tasks is None:
+            raise RuntimeError('State does not track changes')
+        changes = Changes(self._changed_tasks, self._changed_workers,
+                          self._removed_tasks, self._removed_workers)
+        self._reset_changes()
+        return changes
+
+    def _mark_removed(self, removed, changed, keys):
+        removed.update(keys)
+        for key in keys:
+            changed.pop(key, None)
+
+    def _evicting(self, cache):
+        # returns the key that will be evicted from the LRU cache
+        # when a new key is added.
+        limit = getattr(cache, 'limit', None)
+        if limit and len(cache) >= limit:
+            return [next(iter(cache))]
+        return ()
+
     def clear_tasks(self, ready=True):
         with self._mutex:
             return self._clear_tasks(ready)
 
     def _clear_tasks(self, ready=True):
+        before = set(self.tasks) if self._changed_tasks is not None else None
         if ready:
             in_progress = dict(
                 (uuid, task) for uuid, task in self.itertasks()
@@ -339,10 +629,17 @@ class State(object):
         else:
             self.tasks.clear()
         self._taskheap[:] = []
+        if before is not None:
+            self._mark_removed(self._removed_tasks, self._changed_tasks,
+                               before.difference(self.tasks))
 
     def _clear(self, ready=True):
+        if self._changed_tasks is not None:
+            self._mark_removed(self._removed_workers, self._changed_workers,
+                               list(self.workers))
         self.workers.clear()
         self._clear_tasks(ready)
+        self.metrics.clear()
         self.event_count = 0
         self.task_count = 0
 
@@ -355,20 +652,31 @@ class State(object):
 
         Returns tuple of ``(worker, was_created)``.
         """
+        created = False
         try:
             worker = self.workers[hostname]
             worker.update(kwargs)
-            return worker, False
         except KeyError:
+            if self._changed_tasks is not None:
+                self._mark_removed(self._removed_workers,
+                                   self._changed_workers,
+                                   self._evicting(self.workers))
             worker = self.workers[hostname] = Worker(
                 hostname=hostname, **kwargs)
-            return worker, True
+            created = True
+        if self._changed_tasks is not None:
+            self._changed_workers[hostname] = worker
+            self._removed_workers.discard(hostname)
+        return worker, created
 
     def get_or_create_task(self, uuid):
         """Get or create task by uuid."""
         try:
             return self.tasks[uuid], False
         except KeyError:
+            if self._changed_tasks is not None:
+                self._mark_removed(self._removed_tasks, self._changed_tasks,
+                                   self._evicting(self.tasks))
             task = self.tasks[uuid] = Task(uuid=uuid)
             return task, True
 
@@ -392,6 +700,9 @@ class State(object):
         worker, _ = self.get_or_create_worker(hostname)
         task, created = self.get_or_create_task(uuid)
         task.worker = worker
+        if self._changed_tasks is not None:
+            self._changed_tasks[uuid] = task
+            self._removed_tasks.discard(uuid)
         maxtasks = self.max_tasks_in_memory * 2
 
         taskheap = self._taskheap
@@ -403,19 +714,47 @@ class State(object):
 
         handler = getattr(task, 'on_' + type, None)
         if type == 'received':
-            self.task_count += 1
+            self.task_count += fields.get('weight', 1)
         if handler:
             handler(**fields)
         else:
             task.on_unknown_event(type, **fields)
+        self._task_metrics(type, fields, task.name, task.sent or task.received)
         return created
 
+    def _task_metrics(self, type, fields, name, queued=None):
+        try:
+            state = EVENT_STATES[type]
+        except KeyError:
+            return
+        latency = None
+        if type == 'started' and queued:
+            latency = max((fields.get('timestamp') or queued) - queued, 0)
+        self.metrics.add(
+            state, name, fields.get('hostname'),
+            fields.get('local_received'), fields.get('weight', 1),
+            fields.get('runtime') if type == 'succeeded' else None,
+            latency,
+        )
+
     def event(self, event):
         with self._mutex:
             return self._dispatch_event(event)
 
+    def replay(self, events):
+        """Apply a stream of events, e.g. from
+        :meth:`celery.events.log.EventLog.events`, holding the
+        lock only once.  Returns the number of events applied."""
+        n = 0
+        with self._mutex:
+            dispatch = self._dispatch_event
+            for n, event in enumerate(events, 1):
+                dispatch(event)
+        return n
+
     def _dispatch_event(self, event, kwdict=kwdict):
-        self.event_count += 1
+        # sampled events are counted as the number of events they represent.
+        self.event_count += event.get('weight', 1)
         event = kwdict(event)
         group, _, subject = event['type'].partition('-')
         try:
@@ -479,4 +818,5 @@ class State(object):
         return self.__class__, (
             self.event_callback, self.workers, self.tasks, self._taskheap,
             self.max_workers_in_memory, self.max_tasks_in_memory,
+            self.metrics,
         )
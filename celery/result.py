@@ -544,11 +544,18 @@ class ResultSet(ResultBase):
         """
         results = self.results
         acc = [None for _ in range(len(self))]
+        if not results:
+            return acc
+        # decompresses results or reads them from the blob store,
+        # if supported by the backend.
+        load_result = getattr(results[0].backend, 'load_result', None)
         for task_id, meta in self.iter_native(timeout=timeout,
                                               interval=interval):
             if propagate and meta['status'] in states.PROPAGATE_STATES:
                 raise meta['result']
-            acc[results.index(task_id)] = meta['result']
+            acc[results.index(task_id)] = (
+                load_result(meta) if load_result else meta['result']
+            )
         return acc
 
     def _failed_join_report(self):
@@ -581,6 +588,84 @@ class ResultSet(ResultBase):
         return self.results[0].supports_native_join
 
 
+class ResultSequence(object):
+    """Compact sequence of results, for tasks having ids made from
+    a common prefix and a counter (``prefix-0``, ``prefix-1``, ...).
+
+    Used by streaming groups (see :meth:`celery.group.stream`),
+    so that millions of members can be kept and stored
+    without keeping a list of result instances.
+
+    :param prefix: The task id prefix.
+    :param count: Number of results in the sequence.
+
+    """
+    app = None
+
+    def __init__(self, prefix, count=0, app=None):
+        self.app = app_or_default(app or self.app)
+        self.prefix = prefix
+        self.count = count
+
+    def task_id(self, index):
+        """Return the task id for the result at `index`."""
+        return '{0}-{1}'.format(self.prefix, index)
+
+    def index(self, task_id):
+        task_id = getattr(task_id, 'id', task_id)
+        prefix, _, index = task_id.rpartition('-')
+        try:
+            index = int(index)
+        except ValueError:
+            index = -1
+        if prefix != self.prefix or not 0 <= index < self.count:
+            raise ValueError('{0!r} is not in sequence'.format(task_id))
+        return index
+
+    def serializable(self):
+        return {'prefix': self.prefix, 'count': self.count}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('result index out of range')
+        return self.app.AsyncResult(self.task_id(index))
+
+    def __contains__(self, result):
+        try:
+            self.index(result)
+        except ValueError:
+            return False
+        return True
+
+    def __iter__(self):
+        AsyncResult, task_id = self.app.AsyncResult, self.task_id
+        for i in range(self.count):
+            yield AsyncResult(task_id(i))
+
+    def __len__(self):
+        return self.count
+
+    def __eq__(self, other):
+        if isinstance(other, ResultSequence):
+            return (other.prefix, other.count) == (self.prefix, self.count)
+        try:
+            return len(other) == self.count and list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '<{0}: {1}-[0..{2}]>'.format(
+            type(self).__name__, self.prefix, self.count,
+        )
+
+
 class GroupResult(ResultSet):
     """Like :class:`ResultSet`, but with an associated id.
 
@@ -639,6 +724,8 @@ class GroupResult(ResultSet):
                                          ', '.join(r.id for r in self.results))
 
     def serializable(self):
+        if isinstance(self.results, ResultSequence):
+            return self.id, self.results.serializable()
         return self.id, [r.serializable() for r in self.results]
 
     @property
@@ -749,6 +836,11 @@ def from_serializable(r, app=None):
     Result = app.AsyncResult
     if not isinstance(r, ResultBase):
         res, nodes = r
+        if isinstance(nodes, dict):
+            # compact form used by streaming groups.
+            return app.GroupResult(
+                res, ResultSequence(nodes['prefix'], nodes['count'], app=app),
+            )
         if nodes:
             return app.GroupResult(
                 res, [from_serializable(child, app) for child in nodes],
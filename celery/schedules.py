@@ -44,6 +44,27 @@ def cronfield(s):
     return '*' if s is None else s
 
 
+def _bitmask(values):
+    mask = 0
+    for value in values:
+        mask |= 1 << value
+    return mask
+
+
+def _first_bit(mask):
+    """Returns the lowest value in bitmask."""
+    # int.bit_length is not available in Python 2.6.
+    return len(bin(mask & -mask)) - 3
+
+
+def _next_bit(mask, after):
+    """Returns the lowest value in bitmask greater than `after`,
+    or :const:`None` if there is no such value."""
+    higher = mask >> (after + 1)
+    if higher:
+        return after + 1 + _first_bit(higher)
+
+
 class ParseException(Exception):
     """Raised by crontab_parser when the input can't be parsed."""
 
@@ -321,7 +342,13 @@ class crontab(schedule):
     `day_of_week` is 1 and `day_of_month` is '1-7,15-21' means every
     first and third monday of every month present in `month_of_year`.
 
+    The expanded sets are compiled into bitmasks when the crontab
+    is created, and the next time to run is cached for the last
+    `last_run_at` value, so checking if the crontab is due does not
+    recompute it on every tick.
+
     """
+    _next_run = None
 
     @staticmethod
     def _expand_cronspec(cronspec, max_, min_=0):
@@ -445,6 +472,11 @@ class crontab(schedule):
         self.day_of_month = self._expand_cronspec(day_of_month, 31, 1)
         self.month_of_year = self._expand_cronspec(month_of_year, 12, 1)
         self.nowfun = nowfun
+        self._minutes = _bitmask(self.minute)
+        self._hours = _bitmask(self.hour)
+        self._days_of_week = _bitmask(self.day_of_week)
+        self._days_of_month = _bitmask(self.day_of_month)
+        self._months_of_year = _bitmask(self.month_of_year)
 
     def now(self):
         return (self.nowfun or self.app.now)()
@@ -459,43 +491,44 @@ class crontab(schedule):
                                  self._orig_day_of_month,
                                  self._orig_month_of_year), None)
 
-    def remaining_delta(self, last_run_at, ffwd=ffwd):
+    def remaining_delta(self, last_run_at, ffwd=ffwd, now=None):
         last_run_at = self.maybe_make_aware(last_run_at)
-        now = self.maybe_make_aware(self.now())
+        now = self.maybe_make_aware(self.now() if now is None else now)
         dow_num = last_run_at.isoweekday() % 7  # Sunday is day 0, not day 7
 
-        execute_this_date = (last_run_at.month in self.month_of_year and
-                             last_run_at.day in self.day_of_month and
-                             dow_num in self.day_of_week)
+        execute_this_date = (
+            (self._months_of_year >> last_run_at.month) & 1 and
+            (self._days_of_month >> last_run_at.day) & 1 and
+            (self._days_of_week >> dow_num) & 1
+        )
 
-        execute_this_hour = (execute_this_date and
-                             last_run_at.day == now.day and
-                             last_run_at.month == now.month and
-                             last_run_at.year == now.year and
-                             last_run_at.hour in self.hour and
-                             last_run_at.minute < max(self.minute))
+        next_minute = None
+        if (execute_this_date and
+                last_run_at.day == now.day and
+                last_run_at.month == now.month and
+                last_run_at.year == now.year and
+                (self._hours >> last_run_at.hour) & 1):
+            next_minute = _next_bit(self._minutes, last_run_at.minute)
 
-        if execute_this_hour:
-            next_minute = min(minute for minute in self.minute
-                              if minute > last_run_at.minute)
+        if next_minute is not None:  # execute this hour
             delta = ffwd(minute=next_minute, second=0, microsecond=0)
         else:
-            next_minute = min(self.minute)
-            execute_today = (execute_this_date and
-                             last_run_at.hour < max(self.hour))
+            next_minute = _first_bit(self._minutes)
+            next_hour = None
+            if execute_this_date:
+                next_hour = _next_bit(self._hours, last_run_at.hour)
 
-            if execute_today:
-                next_hour = min(hour for hour in self.hour
-                                if hour > last_run_at.hour)
+            if next_hour is not None:  # execute today
                 delta = ffwd(hour=next_hour, minute=next_minute,
                              second=0, microsecond=0)
             else:
-                next_hour = min(self.hour)
+                next_hour = _first_bit(self._hours)
                 all_dom_moy = (self._orig_day_of_month == '*' and
                                self._orig_month_of_year == '*')
                 if all_dom_moy:
-                    next_day = min([day for day in self.day_of_week
-                                    if day > dow_num] or self.day_of_week)
+                    next_day = _next_bit(self._days_of_week, dow_num)
+                    if next_day is None:
+                        next_day = _first_bit(self._days_of_week)
                     add_week = next_day == dow_num
 
                     delta = ffwd(weeks=add_week and 1 or 0,
@@ -512,7 +545,21 @@ class crontab(schedule):
 
     def remaining_estimate(self, last_run_at, ffwd=ffwd):
         """Returns when the periodic task should run next as a timedelta."""
-        return remaining(*self.remaining_delta(last_run_at, ffwd=ffwd))
+        last_run_at = self.maybe_make_aware(last_run_at)
+        now = self.maybe_make_aware(self.now())
+        # The next time to run only depends on the current date, so it's
+        # cached until last_run_at or the date changes.  The tzinfo
+        # and utcoffset are part of the key, so a change of timezone
+        # or daylight saving time also invalidates the cache.
+        key = (last_run_at.tzinfo, last_run_at, now.tzinfo, now.date(),
+               now.utcoffset(), ffwd)
+        cached = self._next_run
+        if cached is not None and cached[0] == key:
+            return cached[1] - self.to_local(now)
+        start, delta, now = self.remaining_delta(last_run_at, ffwd, now)
+        next_run = start + delta
+        self._next_run = (key, next_run)
+        return next_run - now
 
     def is_due(self, last_run_at):
         """Returns tuple of two items `(is_due, next_time_to_run)`,
@@ -1,15 +1,20 @@
 from __future__ import absolute_import
 
 import errno
+import os
+import shutil
+import socket
+import time
 
 from datetime import datetime, timedelta
 from mock import Mock, call, patch
 from nose import SkipTest
 from pickle import dumps, loads
+from tempfile import mkdtemp
 
 from celery import beat
 from celery import task
-from celery.five import keys, string_t
+from celery.five import keys, string_t, values
 from celery.result import AsyncResult
 from celery.schedules import schedule
 from celery.utils import uuid
@@ -237,8 +242,17 @@ class test_Scheduler(AppCase):
                 s = mScheduler(app=self.app)
                 s.install_default_entries({})
                 self.assertNotIn('celery.backend_cleanup', s.data)
+            # blobs of expired results still need to be deleted.
+            self.app.backend.blob_store = 'file:///tmp/blobs'
+            with patch_settings(self.app,
+                                CELERY_TASK_RESULT_EXPIRES=31,
+                                CELERYBEAT_SCHEDULE={}):
+                s = mScheduler(app=self.app)
+                s.install_default_entries({})
+                self.assertIn('celery.backend_cleanup', s.data)
         finally:
             self.app.backend.supports_autoexpire = False
+            self.app.backend.blob_store = None
 
     def test_due_tick(self):
         scheduler = mScheduler(app=self.app)
@@ -290,6 +304,83 @@ class test_Scheduler(AppCase):
                       schedule=mocked_schedule(False, None))
         self.assertEqual(scheduler.tick(), scheduler.max_interval)
 
+    def test_heap_tick(self):
+        scheduler = mScheduler(app=self.app, use_heap=True)
+        nums = [600, 300, 650, 120, 250, 36]
+        scheduler.update_from_dict(dict(
+            ('test_heap_tick%s' % i, {'schedule': mocked_schedule(False, j)})
+            for i, j in enumerate(nums)))
+        with patch('celery.beat.Scheduler.maybe_due') as maybe_due:
+            maybe_due.side_effect = (
+                lambda entry, publisher: entry.schedule.is_due(0)[1])
+            self.assertAlmostEqual(scheduler.tick(), min(nums), 0)
+            self.assertEqual(maybe_due.call_count, len(nums))
+            maybe_due.reset_mock()
+            # nothing is due, so no entries are checked.
+            self.assertAlmostEqual(scheduler.tick(), min(nums), 0)
+            self.assertFalse(maybe_due.called)
+
+            H = scheduler._heap
+            H[:] = [(t - 40, name) for t, name in H]
+            scheduler.tick()
+            self.assertEqual(maybe_due.call_count, 1)
+            self.assertEqual(maybe_due.call_args[0][0].name,
+                             'test_heap_tick5')
+
+    def test_heap_tick_changes(self):
+        scheduler = mScheduler(app=self.app, use_heap=True)
+        scheduler.add(name='a', schedule=mocked_schedule(False, 600))
+        self.assertAlmostEqual(scheduler.tick(), scheduler.max_interval, 0)
+        scheduler.add(name='b', schedule=always_due)
+        self.assertAlmostEqual(scheduler.tick(), 1, 0)
+        self.assertEqual(len(scheduler._heap), 2)
+        scheduler.schedule.pop('b')
+        scheduler._heap = [(0, 'b')]  # entry no longer in schedule
+        self.assertEqual(scheduler.tick(), scheduler.max_interval)
+        scheduler.set_schedule({})
+        self.assertEqual(scheduler.tick(), scheduler.max_interval)
+
+    def test_heap_schedule_no_remain(self):
+        scheduler = mScheduler(app=self.app, use_heap=True)
+        scheduler.add(name='test_schedule_no_remain',
+                      schedule=mocked_schedule(False, None))
+        self.assertAlmostEqual(scheduler.tick(), scheduler.max_interval, 0)
+
+    def test_tick_lateness(self):
+        scheduler = mScheduler(app=self.app)
+        scheduler._due_since = Mock()
+        scheduler._due_since.side_effect = [3.0, 5.0, 1.0]
+        for i in range(3):
+            scheduler.add(name='test_tick_lateness%s' % i,
+                          schedule=always_due)
+        scheduler.add(name='test_tick_pending', schedule=always_pending)
+        self.assertEqual(scheduler.tick(), 1)
+        self.assertEqual(len(scheduler.sent), 3)
+        self.assertEqual(scheduler.last_tick_lateness, 5.0)
+        self.assertIsNone(scheduler._lateness)
+
+    def test_tick_lateness_nothing_due(self):
+        scheduler = mScheduler(app=self.app)
+        scheduler.last_tick_lateness = 3.0
+        scheduler.add(name='a', schedule=always_pending)
+        self.assertEqual(scheduler.tick(), 1)
+        self.assertEqual(scheduler.last_tick_lateness, 3.0)
+
+    def test_due_since(self):
+        scheduler = mScheduler(app=self.app)
+        entry = scheduler.Entry(
+            name='a', schedule=timedelta(seconds=10),
+            last_run_at=self.app.now() - timedelta(seconds=70),
+        )
+        self.assertAlmostEqual(scheduler._due_since(entry), 60, 0)
+        entry.last_run_at = self.app.now()
+        self.assertEqual(scheduler._due_since(entry), 0)
+        entry.schedule = Mock()
+        entry.schedule.remaining_estimate.side_effect = NotImplementedError()
+        self.assertEqual(scheduler._due_since(entry), 0)
+        entry.schedule.remaining_estimate.side_effect = TypeError()
+        self.assertEqual(scheduler._due_since(entry), 0)
+
     def test_interface(self):
         scheduler = mScheduler(app=self.app)
         scheduler.sync()
@@ -388,6 +479,335 @@ class test_PersistentScheduler(AppCase):
         self.assertDictEqual(s._store['entries'], s.schedule)
 
 
+class test_JournalStore(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, 'schedule')
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def Entry(self, name):
+        return beat.ScheduleEntry(name=name, task='t.' + name,
+                                  schedule=timedelta(seconds=10),
+                                  last_run_at=datetime(2013, 1, 1))
+
+    def test_journal(self):
+        store = beat.JournalStore(self.filename)
+        store.update(tz='UTC')
+        entries = store.setdefault('entries', {})
+        entries['a'] = self.Entry('a')
+        entries['b'] = self.Entry('b')
+        store.sync()
+        entries.ran('a', next(entries['a']))
+        del entries['b']
+        store.close()
+
+        store = beat.JournalStore(self.filename)
+        self.assertEqual(store.get('tz'), 'UTC')
+        self.assertIn('entries', store)
+        entries = store['entries']
+        self.assertEqual(list(entries), ['a'])
+        self.assertIsInstance(entries._data['a'], bytes)  # not loaded yet
+        self.assertEqual(entries['a'].total_run_count, 1)
+        self.assertEqual(entries['a'].task, 't.a')
+        self.assertFalse(store._meta_changed)
+        store.close()
+
+    def test_only_run_is_journaled(self):
+        store = beat.JournalStore(self.filename)
+        store['entries']['a'] = self.Entry('a')
+        store.sync()
+        entry = next(store['entries']['a'])
+        store['entries'].ran('a', entry)
+        records = list(store._records_to_write())
+        self.assertEqual(records, [
+            ('run', 'a', entry.last_run_at, entry.total_run_count),
+        ])
+        store.close()
+
+    def test_compact(self):
+        store = beat.JournalStore(self.filename, compact_after=3)
+        for name in 'abc':
+            store['entries'][name] = self.Entry(name)
+        store.sync()
+        store.close()
+        self.assertTrue(os.path.exists(self.filename))
+        self.assertFalse(os.path.exists(store.compacting_filename))
+        self.assertFalse(os.path.getsize(store.journal_filename))
+
+        store['entries'].ran('a', next(store['entries']['a']))
+        store.compact(wait=True)
+        store.close()
+        store = beat.JournalStore(self.filename)
+        self.assertEqual(sorted(store['entries']), ['a', 'b', 'c'])
+        self.assertEqual(store['entries']['a'].total_run_count, 1)
+        store.close()
+
+    def test_interrupted_compaction(self):
+        store = beat.JournalStore(self.filename)
+        store['entries']['a'] = self.Entry('a')
+        store.close()
+        os.rename(store.journal_filename, store.compacting_filename)
+        store = beat.JournalStore(self.filename)
+        self.assertEqual(list(store['entries']), ['a'])
+        store.compact()
+        store.close()
+        self.assertFalse(os.path.exists(store.compacting_filename))
+        self.assertEqual(list(beat.JournalStore(self.filename)['entries']),
+                         ['a'])
+
+    @patch('celery.beat.error')
+    def test_incomplete_record(self, error):
+        store = beat.JournalStore(self.filename)
+        store['entries']['a'] = self.Entry('a')
+        store.close()
+        size = os.path.getsize(store.journal_filename)
+        with open(store.journal_filename, 'ab') as fh:
+            fh.write(dumps(('set', 'b', b'x'))[:-2])
+        store = beat.JournalStore(self.filename)
+        self.assertTrue(error.called)
+        self.assertEqual(list(store['entries']), ['a'])
+        self.assertEqual(os.path.getsize(store.journal_filename), size)
+
+    def test_clear(self):
+        store = beat.JournalStore(self.filename)
+        store.update(tz='UTC')
+        store['entries']['a'] = self.Entry('a')
+        store.close()
+        store = beat.JournalStore(self.filename)
+        store.clear()
+        store['entries'] = {'b': self.Entry('b')}
+        store.close()
+        store = beat.JournalStore(self.filename)
+        self.assertNotIn('tz', store)
+        self.assertEqual(list(store['entries']), ['b'])
+
+
+class test_JournalScheduler(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, 'schedule')
+        self.app.conf.CELERYBEAT_SCHEDULE = {
+            'add': {'task': 'add', 'schedule': timedelta(seconds=10)},
+        }
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def Scheduler(self):
+        return beat.JournalScheduler(app=self.app,
+                                     schedule_filename=self.filename)
+
+    def test_reserve(self):
+        s = self.Scheduler()
+        s.reserve(s.schedule['add'])
+        self.assertEqual(s.schedule.changed, {'add': True})
+        s.close()
+        s = self.Scheduler()
+        self.assertEqual(s.schedule['add'].total_run_count, 1)
+        s.close()
+
+    def test_merge_inplace(self):
+        self.Scheduler().close()
+        self.app.conf.CELERYBEAT_SCHEDULE['add']['schedule'] = 20
+        s = self.Scheduler()
+        s.close()
+        s = self.Scheduler()
+        self.assertEqual(s.schedule['add'].schedule.run_every,
+                         timedelta(seconds=20))
+        s.close()
+
+
+class test_shard_owner(AppCase):
+
+    def test_moves_only_to_new_shard(self):
+        names = ['entry{0}'.format(i) for i in range(100)]
+        before = dict((n, beat.shard_owner(n, ['a', 'b'])) for n in names)
+        self.assertEqual(set(before.values()), set(['a', 'b']))
+        after = dict((n, beat.shard_owner(n, ['a', 'b', 'c'])) for n in names)
+        for name in names:
+            if after[name] != before[name]:
+                self.assertEqual(after[name], 'c')
+        self.assertIn('c', after.values())
+
+    def test_order_independent(self):
+        self.assertEqual(beat.shard_owner('x', ['a', 'b', 'c']),
+                         beat.shard_owner('x', ['c', 'a', 'b']))
+
+
+class test_FileShardMembership(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+        self.path = os.path.join(self.dir, 'shards')
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def test_members(self):
+        a = beat.FileShardMembership(self.path, 'a', interval=1)
+        b = beat.FileShardMembership(self.path, 'b', interval=1)
+        self.assertEqual(a.expires, 3)
+        self.assertEqual(a.members(), ('a', ))
+        self.assertEqual(b.members(), ('a', 'b'))
+        self.assertEqual(a.alive(time.time()), set(['a', 'b']))
+        self.assertEqual(a.alive(time.time() + 10), set())
+        b.leave()
+        b.leave()
+        self.assertEqual(a.members(), ('a', ))
+
+
+class test_BrokerShardMembership(AppCase):
+
+    def test_on_message(self):
+        m = beat.BrokerShardMembership(Mock(), 'a', interval=1)
+        m.on_message({'shard': 'b'}, Mock(), now=lambda: 100)
+        self.assertEqual(m.seen, {'b': 100})
+        m.on_message({'shard': 'b', 'leaving': True}, Mock())
+        self.assertEqual(m.seen, {})
+
+    def Connection(self):
+        connection = Mock()
+        connection.connection_errors = (KeyError, )
+        connection.channel_errors = (ValueError, )
+        return connection
+
+    def test_alive(self):
+        connection = self.Connection()
+        connection.drain_events.side_effect = socket.timeout()
+        m = beat.BrokerShardMembership(connection, 'a', interval=1)
+        m.seen = {'b': 100, 'c': 90}
+        self.assertEqual(m.alive(101), set(['b']))
+        connection.drain_events.assert_called_with(timeout=m.drain_timeout)
+        self.assertGreater(m.drain_timeout, 0)
+
+    @patch('celery.beat.error')
+    def test_alive_connection_error(self, error):
+        connection = self.Connection()
+        connection.drain_events.side_effect = socket.timeout()
+        m = beat.BrokerShardMembership(connection, 'a', interval=1)
+        m.seen = {'b': 100}
+        self.assertEqual(m.alive(101), set(['b']))
+
+        # the last known membership is kept while disconnected.
+        connection.drain_events.side_effect = KeyError('lost')
+        self.assertEqual(m.alive(200), set(['b']))
+        self.assertTrue(error.called)
+        connection.collect.assert_called_with()
+        self.assertIsNone(m._consumer)
+
+        # and reconnects on the next check.
+        connection.drain_events.side_effect = socket.timeout()
+        self.assertEqual(m.alive(200), set())
+        self.assertTrue(connection.ensure_connection.called)
+
+    @patch('celery.beat.error')
+    def test_send_connection_error(self, error):
+        connection = self.Connection()
+        connection.ensure_connection.side_effect = ValueError('down')
+        m = beat.BrokerShardMembership(connection, 'a', interval=1)
+        m.heartbeat()
+        self.assertTrue(error.called)
+        self.assertIsNone(m.producer)
+
+    def test_leave(self):
+        connection = Mock()
+        m = beat.BrokerShardMembership(connection, 'a')
+        m.leave()
+        self.assertFalse(connection.release.called)
+        m._consumer = Mock()
+        m.producer = Mock()
+        m.leave()
+        self.assertTrue(m.producer.publish.call_args[0][0]['leaving'])
+        connection.release.assert_called_with()
+
+
+class test_ShardedScheduler(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, 'schedule')
+        self.app.conf.CELERYBEAT_SCHEDULE = dict(
+            ('entry{0}'.format(i), {
+                'task': 'add', 'schedule': timedelta(seconds=10),
+            }) for i in range(20)
+        )
+        self.membership = Mock(interval=1.0, expires=3.0)
+        self.membership.members.return_value = ('a', )
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def Scheduler(self, shard_id='a'):
+        s = beat.ShardedScheduler(
+            app=self.app, schedule_filename=self.filename,
+            shard_id=shard_id, membership=self.membership,
+        )
+        s.apply_async = Mock()
+        return s
+
+    def owned(self, s, shard_id):
+        return [e for e in values(s.schedule) if s.owner(e.name) == shard_id]
+
+    def test_waits_until_settled(self):
+        s = self.Scheduler()
+        s.update_members()
+        self.assertEqual(s.members, ('a', ))
+        entry = s.schedule['entry1']
+        self.assertEqual(s.maybe_due(entry), 1.0)
+        self.assertNotIn('entry1', s._adopted)
+        s._changed_at = time.time() - 3.0
+        s.maybe_due(entry)
+        self.assertIn('entry1', s._adopted)
+        self.assertEqual(entry.last_run_at, s._changed_at_dt)
+        s.close()
+        self.membership.leave.assert_called_with()
+
+    def test_skips_entries_owned_by_others(self):
+        s = self.Scheduler()
+        s.update_members()
+        s._changed_at = 0
+        self.membership.members.return_value = ('a', 'b')
+        s.update_members()
+        self.assertEqual(s._previous, ('a', ))
+        theirs = self.owned(s, 'b')
+        ours = self.owned(s, 'a')
+        self.assertTrue(theirs)
+        self.assertTrue(ours)
+        for entry in theirs:
+            self.assertIsNone(s.maybe_due(entry))
+        # entries that did not move are not delayed
+        s._adopted.clear()
+        for entry in ours:
+            s.maybe_due(entry)
+        self.assertFalse(s._adopted)
+        s.close()
+
+    def test_owner_without_members(self):
+        s = self.Scheduler()
+        self.assertIsNone(s.owner('entry1'))
+        self.assertIsNone(s.maybe_due(s.schedule['entry1']))
+        s.close()
+
+    def test_tick(self):
+        s = self.Scheduler()
+        self.assertLessEqual(s.tick(), 1.0)
+        self.assertTrue(self.membership.members.called)
+        self.assertIn('shard -> a', s.info)
+        s.close()
+
+    def test_get_membership(self):
+        with patch_settings(self.app, CELERYBEAT_SHARD_DIR=self.dir):
+            s = self.Scheduler()
+            m = s.get_membership()
+            self.assertIsInstance(m, beat.FileShardMembership)
+            self.assertEqual(m.interval, 10.0)
+            s.close()
+
+
 class test_Service(AppCase):
 
     def get_service(self):
@@ -26,10 +26,12 @@ class test_backend_cleanup(AppCase):
         prev = self.app.backend
         self.app.backend.cleanup = Mock()
         self.app.backend.cleanup.__name__ = 'cleanup'
+        self.app.backend.cleanup_blobs = Mock()
         try:
             cleanup_task = builtins.add_backend_cleanup_task(self.app)
             cleanup_task()
             self.assertTrue(self.app.backend.cleanup.called)
+            self.assertTrue(self.app.backend.cleanup_blobs.called)
         finally:
             self.app.backend = prev
 
@@ -128,6 +130,45 @@ class test_group(AppCase):
         finally:
             _task_stack.pop()
 
+    def test_stream(self):
+        x = group(add.s(i, i) for i in range(5))
+        with patch('celery.canvas.Signature.apply_async') as apply_async:
+            res = self.task.stream(x.tasks.consume(), window=2)
+            self.assertEqual(apply_async.call_count, 5)
+            self.assertEqual(
+                [c[1]['task_id'] for c in apply_async.call_args_list],
+                [r.id for r in res.results],
+            )
+        self.assertEqual(len(res), 5)
+        self.assertEqual(res.serializable(),
+                         (res.id, {'prefix': res.id, 'count': 5}))
+
+    def test_stream_save(self):
+        with patch('celery.canvas.Signature.apply_async'):
+            with patch('celery.result.GroupResult.save') as save:
+                res = self.task.stream(
+                    (add.s(i, i) for i in range(5)), window=2, save=True,
+                )
+                self.assertEqual(save.call_count, 3)
+                self.assertEqual(len(res), 5)
+
+    def test_stream_eager(self):
+        self.app.conf.CELERY_ALWAYS_EAGER = True
+        try:
+            res = self.task.stream(add.s(i, i) for i in range(3))
+            self.assertEqual(res.get(), [0, 2, 4])
+        finally:
+            self.app.conf.CELERY_ALWAYS_EAGER = False
+
+    def test_group_stream(self):
+        x = group(add.s(i, i) for i in range(3))
+        x._type = Mock()
+        x.stream(2, window=10)
+        args, kwargs = x._type.stream.call_args
+        self.assertEqual(list(args[0]), list(add.s(i, i) for i in range(3)))
+        self.assertEqual(args[1], (2, ))
+        self.assertEqual(kwargs, {'window': 10})
+
 
 class test_chain(AppCase):
 
@@ -9,7 +9,7 @@ from kombu.pidbox import Mailbox
 from celery.app import control
 from celery.task import task
 from celery.utils import uuid
-from celery.tests.case import AppCase, Case
+from celery.tests.case import AppCase, Case, patch
 
 
 @task()
@@ -103,6 +103,13 @@ class test_inspect(AppCase):
         self.i.hello()
         self.assertIn('hello', MockMailbox.sent)
 
+    def test_hello_arguments(self):
+        with patch.object(self.c, 'broadcast') as broadcast:
+            self.i.hello(digest='abc')
+            self.assertEqual(
+                broadcast.call_args[1]['arguments'], {'digest': 'abc'},
+            )
+
     @with_mock_broadcast
     def test_memsample(self):
         self.i.memsample()
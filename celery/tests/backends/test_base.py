@@ -1,15 +1,18 @@
 from __future__ import absolute_import
 
+import os
+import shutil
 import sys
 import types
 
 from contextlib import contextmanager
 from mock import Mock, patch
 from nose import SkipTest
+from tempfile import mkdtemp
 
-from celery.exceptions import ChordError
+from celery.exceptions import ChordError, ImproperlyConfigured
 from celery.five import items, range
-from celery.result import AsyncResult, GroupResult
+from celery.result import AsyncResult, GroupResult, ResultSet
 from celery.utils import serialization
 from celery.utils.serialization import subclass_exception
 from celery.utils.serialization import find_pickleable_exception as fnpe
@@ -130,7 +133,7 @@ class KVBackend(KeyValueStoreBackend):
 
     def __init__(self, app, *args, **kwargs):
         self.db = {}
-        super(KVBackend, self).__init__(app)
+        super(KVBackend, self).__init__(app, **kwargs)
 
     def get(self, key):
         return self.db.get(key)
@@ -267,6 +270,26 @@ class test_KeyValueStoreBackend(AppCase):
             self.assertEqual(i, 9)
             self.assertTrue(list(self.b.get_many(list(ids))))
 
+    def test_get_many_meta(self):
+        self.b.supports_native_join = True
+        for is_dict in True, False:
+            self.b.mget_returns_dict = is_dict
+            done, pending = uuid(), uuid()
+            self.b.mark_as_done(done, 42)
+            metas = self.b.get_many_meta([done, pending])
+            self.assertEqual(metas[done]['result'], 42)
+            self.assertEqual(metas[pending]['status'], states.PENDING)
+            self.assertIn(done, self.b._cache)
+            self.assertNotIn(pending, self.b._cache)
+
+    def test_get_many_meta_no_mget(self):
+        tid = uuid()
+        self.b.mark_as_done(tid, 42)
+        self.b.mget = Mock()
+        metas = self.b.get_many_meta([tid])
+        self.assertEqual(metas[tid]['result'], 42)
+        self.assertFalse(self.b.mget.called)
+
     def test_get_many_times_out(self):
         tasks = [uuid() for _ in range(4)]
         self.b._cache[tasks[1]] = {'status': 'PENDING'}
@@ -394,6 +417,175 @@ class test_KeyValueStoreBackend(AppCase):
         self.assertIsNone(self.b.restore_group('xxx-nonexistant'))
 
 
+class test_KeyValueStoreBackend_blobs(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+        self.b = KVBackend(app=self.app, blob_threshold=100,
+                           blob_store='file://' + self.dir)
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def test_small_result_inline(self):
+        tid = uuid()
+        self.b.mark_as_done(tid, 'small')
+        self.assertEqual(self.b.get_task_meta(tid)['result'], 'small')
+        self.assertFalse(os.listdir(self.dir))
+
+    def test_large_result_moved_to_blob(self):
+        tid, value = uuid(), 'x' * 1000
+        self.assertEqual(self.b.mark_as_done(tid, value), value)
+        meta = self.b.get_task_meta(tid)
+        self.assertEqual(meta['status'], states.SUCCESS)
+        self.assertEqual(meta['blob'], tid)
+        self.assertIsNone(meta['result'])
+        self.assertTrue(self.b.blobs.get(tid))
+        self.assertLess(len(self.b.db[self.b.get_key_for_task(tid)]), 200)
+        self.assertEqual(self.b.get_result(tid), value)
+        self.assertEqual(AsyncResult(tid, backend=self.b).get(), value)
+        self.b.forget(tid)
+        self.assertFalse(os.listdir(self.dir))
+
+    def test_join_native(self):
+        self.b.supports_native_join = True
+        small, large = uuid(), uuid()
+        self.b.mark_as_done(small, 'small')
+        self.b.mark_as_done(large, 'x' * 1000)
+        rs = ResultSet([AsyncResult(small, backend=self.b),
+                        AsyncResult(large, backend=self.b)])
+        self.assertEqual(rs.join_native(), ['small', 'x' * 1000])
+        self.assertEqual(rs.join(), ['small', 'x' * 1000])
+
+    def test_exception_not_moved(self):
+        tid = uuid()
+        self.b.mark_as_failure(tid, KeyError('x' * 1000))
+        self.assertFalse(os.listdir(self.dir))
+        self.assertIsInstance(self.b.get_result(tid), KeyError)
+
+    def test_requires_blob_store(self):
+        with self.assertRaises(ImproperlyConfigured):
+            KVBackend(app=self.app, blob_threshold=100)
+
+    def test_result_like_blob_ref(self):
+        # only the metadata marks a result as moved to the blob store.
+        tid, value = uuid(), {'__celery_blob__': '/etc/passwd', 'size': 1}
+        self.b.mark_as_done(tid, value)
+        self.assertEqual(self.b.get_result(tid), value)
+
+    def test_client_without_blob_store(self):
+        tid = uuid()
+        self.b.mark_as_done(tid, 'x' * 1000)
+        client = KVBackend(app=self.app)
+        client.db = self.b.db
+        with self.assertRaises(ImproperlyConfigured):
+            client.get_result(tid)
+
+    def test_cleanup_blobs(self):
+        self.b.blobs.cleanup = Mock()
+        self.b.expires = 3600
+        self.b.cleanup_blobs()
+        self.b.blobs.cleanup.assert_called_with(3600.0)
+
+
+class test_KeyValueStoreBackend_compression(AppCase):
+
+    def setup(self):
+        self.b = KVBackend(app=self.app, result_compression='zlib',
+                           compression_threshold=100)
+        self.value = 'the quick brown fox ' * 100
+
+    def stored(self, task_id):
+        return self.b.decode(self.b.db[self.b.get_key_for_task(task_id)])
+
+    def test_small_result_not_compressed(self):
+        tid = uuid()
+        self.b.mark_as_done(tid, 'small')
+        self.assertEqual(self.stored(tid)['result'], 'small')
+
+    def test_large_result_compressed(self):
+        tid = uuid()
+        self.assertEqual(self.b.mark_as_done(tid, self.value), self.value)
+        stored = self.stored(tid)
+        self.assertTrue(stored['compression'])
+        self.assertLess(len(stored['result']), len(self.value))
+        self.assertEqual(self.b.get_result(tid), self.value)
+
+        self.b.supports_native_join = True
+        rs = ResultSet([AsyncResult(tid, backend=self.b)])
+        self.assertEqual(rs.join_native(), [self.value])
+
+    def test_uncompressed_result(self):
+        tid = uuid()
+        KVBackend.set(self.b, self.b.get_key_for_task(tid), self.b.encode({
+            'status': states.SUCCESS, 'result': self.value,
+            'traceback': None, 'children': None,
+        }))
+        self.assertEqual(self.b.get_result(tid), self.value)
+
+    def test_result_like_compressed(self):
+        # only the metadata marks a result as compressed.
+        b = KVBackend(app=self.app)
+        tid, value = uuid(), {'__celery_compressed__': 'x', 'data': 'y'}
+        b.mark_as_done(tid, value)
+        self.assertEqual(b.get_result(tid), value)
+
+    def test_not_smaller_when_encoded(self):
+        # base64 makes the data a third larger when stored inline.
+        tid = uuid()
+        with patch('celery.backends.base.compress') as compress:
+            compress.side_effect = lambda data, method: (
+                data[:int(len(data) * 0.8)], 'application/x-gzip',
+            )
+            self.b.mark_as_done(tid, self.value)
+        stored = self.stored(tid)
+        self.assertNotIn('compression', stored)
+        self.assertEqual(stored['result'], self.value)
+
+    def test_override(self):
+        tid = uuid()
+        self.b.store_result(tid, self.value, states.SUCCESS,
+                            compression=False)
+        self.assertEqual(self.stored(tid)['result'], self.value)
+
+        b = KVBackend(app=self.app)
+        b.store_result(tid, self.value, states.SUCCESS, compression='bzip2')
+        stored = b.decode(b.db[b.get_key_for_task(tid)])
+        self.assertTrue(stored['compression'])
+        self.assertEqual(b.get_result(tid), self.value)
+
+    def test_store_results(self):
+        tid = uuid()
+        self.b.store_results([(tid, self.value, states.SUCCESS, None)])
+        self.assertTrue(self.stored(tid)['compression'])
+        self.assertEqual(self.b.get_result(tid), self.value)
+
+    def test_unsupported_backend(self):
+        with self.assertRaises(ImproperlyConfigured):
+            BaseBackend(self.app, result_compression='zlib')
+
+    def test_exception_not_compressed(self):
+        tid = uuid()
+        self.b.mark_as_failure(tid, KeyError(self.value))
+        self.assertIsInstance(self.b.get_result(tid), KeyError)
+
+    def test_compressed_blob(self):
+        tmp = mkdtemp()
+        try:
+            b = KVBackend(app=self.app, result_compression='zlib',
+                          compression_threshold=100, blob_threshold=100,
+                          blob_store='file://' + tmp)
+            tid, value = uuid(), [uuid() for _ in range(100)]
+            b.mark_as_done(tid, value)
+            meta = b.decode(b.db[b.get_key_for_task(tid)])
+            self.assertTrue(meta['compression'])
+            self.assertEqual(meta['blob'], tid)
+            self.assertLess(len(b.blobs.get(tid)), len(b.encode(value)))
+            self.assertEqual(b.get_result(tid), value)
+        finally:
+            shutil.rmtree(tmp)
+
+
 class test_KeyValueStoreBackend_interface(AppCase):
 
     def test_get(self):
@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+
+from tempfile import mkdtemp
+
+from celery.backends import blob
+from celery.exceptions import ImproperlyConfigured
+
+from celery.tests.case import AppCase
+
+
+class test_get_blob_store(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def test_alias(self):
+        store = blob.get_blob_store('file://' + self.dir, app=self.app)
+        self.assertIsInstance(store, blob.FileSystemBlobStore)
+        self.assertEqual(store.path, self.dir)
+        self.assertIs(store.app, self.app)
+
+    def test_class_name(self):
+        store = blob.get_blob_store(
+            'celery.backends.blob:FileSystemBlobStore://' + self.dir,
+        )
+        self.assertEqual(store.path, self.dir)
+
+    def test_unknown(self):
+        with self.assertRaises(ImproperlyConfigured):
+            blob.get_blob_store('xyzzy://foo')
+
+
+class test_BlobStore(AppCase):
+
+    def test_interface(self):
+        store = blob.BlobStore()
+        with self.assertRaises(NotImplementedError):
+            store.put('a', b'x')
+        with self.assertRaises(NotImplementedError):
+            store.get('a')
+        with self.assertRaises(NotImplementedError):
+            store.delete('a')
+        store.cleanup(10)
+
+
+class test_FileSystemBlobStore(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+        self.path = os.path.join(self.dir, 'blobs')
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def test_put_get_delete(self):
+        store = blob.FileSystemBlobStore(path=self.path)
+        self.assertTrue(os.path.isdir(self.path))
+        store.put('a', b'x' * 100)
+        self.assertEqual(store.get('a'), b'x' * 100)
+        self.assertEqual(len(os.listdir(self.path)), 1)
+        store.delete('a')
+        store.delete('a')
+        with self.assertRaises(IOError):
+            store.get('a')
+
+    def test_missing_path(self):
+        with self.assertRaises(ImproperlyConfigured):
+            blob.FileSystemBlobStore('file://')
+
+    def test_key_stays_in_directory(self):
+        store = blob.FileSystemBlobStore(path=self.path)
+        for key in ('../escaped', '/abs/path', 'a/b'):
+            store.put(key, b'x')
+            self.assertEqual(store.get(key), b'x')
+        self.assertEqual(len(os.listdir(self.path)), 3)
+        self.assertEqual(sorted(os.listdir(self.dir)), ['blobs'])
+
+    def test_cleanup(self):
+        store = blob.FileSystemBlobStore(path=self.path)
+        store.put('old', b'x')
+        store.put('new', b'y')
+        os.utime(store._filename('old'), (1000.0, 1000.0))
+        os.utime(store._filename('new'), (1900.0, 1900.0))
+        store.cleanup(500, now=lambda: 2000.0)
+        self.assertEqual(store.get('new'), b'y')
+        with self.assertRaises(IOError):
+            store.get('old')
@@ -7,11 +7,12 @@ from pickle import loads, dumps
 
 from celery import states
 from celery.exceptions import ImproperlyConfigured
-from celery.result import AsyncResult
+from celery.result import AsyncResult, GroupResult
 from celery.utils import uuid
 
 from celery.tests.case import (
     AppCase,
+    Mock,
     mask_modules,
     skip_if_pypy,
     skip_if_jython,
@@ -20,10 +21,10 @@ from celery.tests.case import (
 try:
     import sqlalchemy  # noqa
 except ImportError:
-    DatabaseBackend = Task = TaskSet = retry = None  # noqa
+    DatabaseBackend = Task = TaskSet = ChordCounter = retry = None  # noqa
 else:
     from celery.backends.database import DatabaseBackend, retry
-    from celery.backends.database.models import Task, TaskSet
+    from celery.backends.database.models import ChordCounter, Task, TaskSet
 
 
 class SomeClass(object):
@@ -191,8 +192,100 @@ class test_DatabaseBackend(AppCase):
 
         tb.cleanup()
 
+    def test_cleanup_batches(self):
+        tb = DatabaseBackend(app=self.app)
+        tb.cleanup_batch_size = 3
+        ids = [uuid() for i in range(7)]
+        for tid in ids:
+            tb.mark_as_done(tid, 42)
+        s = tb.ResultSession()
+        for t in s.query(Task).filter(Task.task_id.in_(ids[:5])):
+            t.date_done = datetime.now() - tb.expires * 2
+        s.commit()
+        s.close()
+
+        tb.cleanup()
+        metas = tb.get_many_meta(ids, cache=False)
+        self.assertEqual(
+            [metas[tid]['status'] for tid in ids],
+            [states.PENDING] * 5 + [states.SUCCESS] * 2,
+        )
+
+    def test_get_many_meta(self):
+        tb = DatabaseBackend(app=self.app)
+        tb.max_query_ids = 2
+        ids = [uuid() for i in range(5)]
+        for i, tid in enumerate(ids[:4]):
+            tb.mark_as_done(tid, i)
+        metas = tb.get_many_meta(ids)
+        self.assertEqual([metas[tid]['result'] for tid in ids[:4]],
+                         [0, 1, 2, 3])
+        self.assertEqual(metas[ids[4]]['status'], states.PENDING)
+        self.assertIn(ids[0], tb._cache)
+        self.assertNotIn(ids[4], tb._cache)
+
+    def test_get_many(self):
+        tb = DatabaseBackend(app=self.app)
+        ids = [uuid() for i in range(3)]
+        for i, tid in enumerate(ids):
+            tb.mark_as_done(tid, i)
+        self.assertEqual(
+            dict((tid, meta['result']) for tid, meta in tb.get_many(ids)),
+            dict((tid, i) for i, tid in enumerate(ids)),
+        )
+        res = GroupResult(uuid(), [AsyncResult(tid, backend=tb)
+                                   for tid in ids])
+        self.assertEqual(res.join_native(), [0, 1, 2])
+
+    def test_get_many_timeout(self):
+        tb = DatabaseBackend(app=self.app)
+        with self.assertRaises(tb.TimeoutError):
+            list(tb.get_many([uuid()], timeout=0.01, interval=0.01))
+
+    def test_store_results(self):
+        tb = DatabaseBackend(app=self.app)
+        tb.max_query_ids = 2
+        ids = [uuid() for i in range(5)]
+        tb.mark_as_started(ids[0])
+        tb.store_results([(tid, i, states.SUCCESS, None)
+                          for i, tid in enumerate(ids)])
+        for i, tid in enumerate(ids):
+            self.assertEqual(tb.get_status(tid), states.SUCCESS)
+            self.assertEqual(tb.get_result(tid), i)
+        s = tb.ResultSession()
+        try:
+            self.assertEqual(
+                s.query(Task).filter(Task.task_id.in_(ids)).count(), 5,
+            )
+        finally:
+            s.close()
+
+    def test_on_chord_part_return(self):
+        tb = DatabaseBackend(app=self.app)
+        tb.on_chord_ready = Mock()
+        gid, ids = uuid(), [uuid(), uuid()]
+        tb.on_chord_apply(gid, None, result=[
+            AsyncResult(tid, backend=tb) for tid in ids])
+        task = Mock()
+        task.request.group = gid
+        task.request.chord = {}
+        task.backend = tb
+        tb.on_chord_part_return(task)
+        self.assertFalse(tb.on_chord_ready.called)
+        tb.on_chord_part_return(task)
+        self.assertTrue(tb.on_chord_ready.called)
+        self.assertIsNone(tb._incr_chord_counter(gid))
+        self.assertIsNone(tb.restore_group(gid, cache=False))
+
+        tb.on_chord_ready.reset_mock()
+        tb.on_chord_part_return(task)
+        self.assertFalse(tb.on_chord_ready.called)
+
     def test_Task__repr__(self):
         self.assertIn('foo', repr(Task('foo')))
 
     def test_TaskSet__repr__(self):
         self.assertIn('foo', repr(TaskSet('foo', None)))
+
+    def test_ChordCounter__repr__(self):
+        self.assertIn('foo', repr(ChordCounter('foo', 3)))
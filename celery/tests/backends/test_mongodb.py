@@ -310,6 +310,199 @@ class test_MongoBackend(AppCase):
             MONGODB_COLLECTION)
         mock_collection.assert_called_once()
 
+    def test_init_expires(self):
+        x = MongoBackend(app=self.app, expires=60)
+        self.assertEqual(x.expires, datetime.timedelta(seconds=60))
+        self.assertEqual(loads(dumps(x)).expires, x.expires)
+
+    def test_collection_ttl_index(self):
+        x = MongoBackend(app=self.app, expires=60)
+        x.database = MagicMock()
+        collection = x.database.__getitem__.return_value
+        collection.index_information.return_value = {}
+        self.assertIs(x.collection, collection)
+        self.assertFalse(collection.drop_index.called)
+        collection.ensure_index.assert_called_with(
+            'date_done', background=True, expireAfterSeconds=60,
+        )
+
+    def test_collection_ttl_index_changed(self):
+        x = MongoBackend(app=self.app, expires=60)
+        x.database = MagicMock()
+        collection = x.database.__getitem__.return_value
+        collection.index_information.return_value = {
+            'date_done_1': {'key': [('date_done', 1)]},
+        }
+        x.collection
+        collection.drop_index.assert_called_with('date_done_1')
+
+        collection.index_information.return_value = {
+            'date_done_1': {'expireAfterSeconds': 60},
+        }
+        collection.drop_index.reset_mock()
+        del x.collection
+        x.collection
+        self.assertFalse(collection.drop_index.called)
+
+    def test_collection_ttl_index_dropped_concurrently(self):
+        from pymongo.errors import OperationFailure
+        x = MongoBackend(app=self.app, expires=60)
+        x.database = MagicMock()
+        collection = x.database.__getitem__.return_value
+        collection.index_information.return_value = {
+            'date_done_1': {'key': [('date_done', 1)]},
+        }
+        collection.drop_index.side_effect = OperationFailure('index not found')
+        self.assertIs(x.collection, collection)
+        collection.ensure_index.assert_called_with(
+            'date_done', background=True, expireAfterSeconds=60,
+        )
+
+    def test_collection_ttl_expiry_changed(self):
+        from pymongo.errors import OperationFailure
+        x = MongoBackend(app=self.app, expires=60)
+        x.database = MagicMock()
+        collection = x.database.__getitem__.return_value
+        collection.index_information.return_value = {
+            'date_done_1': {'expireAfterSeconds': 30},
+        }
+        x.collection
+        collection.database.command.assert_called_with(
+            'collMod', collection.name,
+            index={'keyPattern': {'date_done': 1}, 'expireAfterSeconds': 60},
+        )
+        self.assertFalse(collection.drop_index.called)
+
+        # servers without collMod for indexes replace the index.
+        collection.database.command.side_effect = OperationFailure('no')
+        del x.collection
+        x.collection
+        collection.drop_index.assert_called_with('date_done_1')
+
+    def test_get_many_meta(self):
+        x = MongoBackend(app=self.app)
+        x.max_query_ids = 2
+        x._task_meta = lambda obj: dict(obj, task_id=obj['_id'])
+        x.collection = Mock()
+        x.collection.find.side_effect = lambda spec, fields: [
+            {'_id': task_id, 'status': states.SUCCESS}
+            for task_id in spec['_id']['$in'] if task_id != 'c'
+        ]
+        metas = x.get_many_meta(['a', 'b', 'c'])
+        self.assertEqual(x.collection.find.call_count, 2)
+        self.assertEqual(x.collection.find.call_args[0][1], x.task_fields)
+        self.assertEqual(metas['a']['status'], states.SUCCESS)
+        self.assertEqual(metas['c']['status'], states.PENDING)
+        self.assertIn('a', x._cache)
+        self.assertNotIn('c', x._cache)
+
+    def test_get_many(self):
+        x = MongoBackend(app=self.app)
+        x._task_meta = lambda obj: dict(obj, task_id=obj['_id'])
+        x._cache['a'] = {'status': states.SUCCESS}
+        x.collection = Mock()
+        x.collection.find.side_effect = [
+            [],
+            [{'_id': 'b', 'status': states.FAILURE}],
+        ]
+        with patch('celery.backends.mongodb.time') as time:
+            got = dict(x.get_many(['a', 'b'], interval=0.3))
+            time.sleep.assert_called_once_with(0.3)
+        self.assertEqual(set(got), set(['a', 'b']))
+        spec = x.collection.find.call_args[0][0]
+        self.assertEqual(spec['_id'], {'$in': ['b']})
+        self.assertEqual(set(spec['status']['$in']), states.READY_STATES)
+
+    def test_get_many_timeout(self):
+        x = MongoBackend(app=self.app)
+        x.collection = Mock()
+        x.collection.find.return_value = []
+        with patch('celery.backends.mongodb.time'):
+            with self.assertRaises(x.TimeoutError):
+                list(x.get_many(['a'], timeout=1.0, interval=0.5))
+
+    def test_store_results_bulk(self):
+        x = MongoBackend(app=self.app)
+        x.collection = Mock()
+        op = x.collection.initialize_unordered_bulk_op.return_value
+        x.store_results([('a', 1, states.SUCCESS, None),
+                         ('b', 2, states.SUCCESS, None)])
+        self.assertEqual(op.find.call_count, 2)
+        op.find.assert_called_with({'_id': 'b'})
+        op.execute.assert_called_once_with()
+        self.assertFalse(x.collection.save.called)
+
+    def test_store_results_no_bulk(self):
+        x = MongoBackend(app=self.app)
+        x.mongodb_bulk_writes = False
+        x.collection = Mock()
+        x.store_results([('a', 1, states.SUCCESS, None),
+                         ('b', 2, states.SUCCESS, None)])
+        self.assertFalse(x.collection.initialize_unordered_bulk_op.called)
+        self.assertEqual(x.collection.save.call_count, 2)
+
+    def test_compressed_result(self):
+        # needs the real serializer, teardown mocks them again.
+        MongoBackend.encode = self._reset['encode']
+        MongoBackend.decode = self._reset['decode']
+        module.Binary = self._reset['Binary']
+        x = MongoBackend(app=self.app, result_compression='zlib',
+                         compression_threshold=10)
+        x.collection = Mock()
+        value = 'the quick brown fox ' * 100
+        x.store_result('a', value, states.SUCCESS)
+        doc = x.collection.save.call_args[0][0]
+        self.assertTrue(doc['compression'])
+        x.collection.find_one.return_value = doc
+        meta = x.get_task_meta('a')
+        self.assertEqual(meta['compression'], doc['compression'])
+        self.assertEqual(x.get_result('a'), value)
+
+    def test_on_chord_apply(self):
+        x = MongoBackend(app=self.app)
+        x.save_group = Mock()
+        x.collection = Mock()
+        x.on_chord_apply('gid', None, result=[Mock(), Mock()])
+        self.assertTrue(x.save_group.called)
+        doc = x.collection.save.call_args[0][0]
+        self.assertEqual(doc['_id'], 'chord-unlock-gid')
+        self.assertEqual(doc['count'], 0)
+        self.assertEqual(doc['total'], 2)
+
+    @patch('celery.result.GroupResult')
+    def test_on_chord_part_return(self, GroupResult):
+        x = MongoBackend(app=self.app)
+        x.on_chord_ready = Mock()
+        x.collection = Mock()
+        task = Mock()
+        task.request.group = 'gid'
+        task.request.chord = {}
+        deps = GroupResult.restore.return_value
+
+        x.collection.find_and_modify.return_value = {'count': 1, 'total': 2}
+        x.on_chord_part_return(task)
+        x.collection.find_and_modify.assert_called_with(
+            {'_id': 'chord-unlock-gid'}, {'$inc': {'count': 1}}, new=True,
+        )
+        self.assertFalse(x.on_chord_ready.called)
+
+        x.collection.find_and_modify.return_value = {'count': 2, 'total': 2}
+        x.on_chord_part_return(task)
+        self.assertTrue(x.on_chord_ready.called)
+        self.assertFalse(deps.delete.called)
+        x.collection.remove.assert_any_call({'_id': 'gid'})
+        x.collection.remove.assert_called_with({'_id': 'chord-unlock-gid'})
+
+        x.on_chord_ready.reset_mock()
+        x.collection.find_and_modify.return_value = None
+        x.on_chord_part_return(task)
+        self.assertFalse(x.on_chord_ready.called)
+
+        task.request.group = None
+        x.collection.find_and_modify.reset_mock()
+        x.on_chord_part_return(task)
+        self.assertFalse(x.collection.find_and_modify.called)
+
     def test_get_database_authfailure(self):
         x = MongoBackend(app=self.app)
         x._get_connection = Mock()
@@ -0,0 +1,146 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+
+from mock import Mock, patch
+from pickle import dumps, loads
+from tempfile import mkdtemp
+
+from celery import states
+from celery.backends import get_backend_by_url
+from celery.backends.sqlite import SQLiteBackend
+from celery.result import AsyncResult, GroupResult
+from celery.utils import uuid
+
+from celery.tests.case import AppCase, patch_settings
+
+
+class test_SQLiteBackend(AppCase):
+
+    def setup(self):
+        self.dir = mkdtemp()
+        self.filename = os.path.join(self.dir, 'results.sqlite')
+        self.b = SQLiteBackend(app=self.app, filename=self.filename)
+
+    def teardown(self):
+        shutil.rmtree(self.dir)
+
+    def test_url(self):
+        backend, url = get_backend_by_url('sqlite:///' + self.filename)
+        self.assertIs(backend, SQLiteBackend)
+        b = backend(app=self.app, url=url)
+        self.assertEqual(b.filename, self.filename)
+        b = backend(app=self.app, url='sqlite:///results.sqlite')
+        self.assertEqual(b.filename, 'results.sqlite')
+        b = backend(app=self.app, url='sqlite://')
+        self.assertEqual(b.filename, SQLiteBackend.filename)
+
+    def test_journal_mode(self):
+        self.assertEqual(
+            self.b.conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal',
+        )
+
+    def test_mark_as_done(self):
+        tid = uuid()
+        self.assertEqual(self.b.get_status(tid), states.PENDING)
+        self.b.mark_as_done(tid, {'foo': 'bar'})
+        self.assertEqual(self.b.get_status(tid), states.SUCCESS)
+        self.assertEqual(self.b.get_result(tid), {'foo': 'bar'})
+        self.b.forget(tid)
+        self.assertEqual(self.b.get_status(tid), states.PENDING)
+
+    def test_mark_as_failure(self):
+        tid = uuid()
+        self.b.mark_as_failure(tid, KeyError('foo'))
+        self.assertEqual(self.b.get_status(tid), states.FAILURE)
+        self.assertIsInstance(self.b.get_result(tid), KeyError)
+
+    def test_get_many(self):
+        ids = dict((uuid(), i) for i in range(10))
+        for task_id, i in ids.items():
+            self.b.mark_as_done(task_id, i)
+        self.b.mget_batch_size = 3
+        got = dict((task_id, meta['result'])
+                   for task_id, meta in self.b.get_many(list(ids)))
+        self.assertEqual(got, ids)
+
+    def test_join_native(self):
+        ids = [uuid() for _ in range(5)]
+        for i, task_id in enumerate(ids):
+            self.b.mark_as_done(task_id, i)
+        res = GroupResult(uuid(), [AsyncResult(task_id, backend=self.b)
+                                   for task_id in ids])
+        self.assertEqual(res.join_native(), list(range(5)))
+
+    def test_expires(self):
+        b = SQLiteBackend(app=self.app, filename=self.filename, expires=60)
+        tid = uuid()
+        with patch('celery.backends.sqlite.time') as time_:
+            time_.time.return_value = 1000.0
+            b.mark_as_done(tid, 42)
+            time_.time.return_value = 1059.0
+            self.assertEqual(b.get_result(tid), 42)
+            self.assertTrue(b.mget([b.get_key_for_task(tid)]))
+            time_.time.return_value = 1061.0
+            self.assertEqual(b.get_status(tid), states.PENDING)
+            self.assertEqual(b.get_many_meta([tid])[tid]['status'],
+                             states.PENDING)
+            self.assertFalse(b.mget([b.get_key_for_task(tid)]))
+            b.cleanup()
+        self.assertFalse(b.conn.execute(
+            'SELECT COUNT(*) FROM celery_results').fetchone()[0])
+
+    def test_no_expires_caches_results(self):
+        with patch_settings(self.app, CELERY_TASK_RESULT_EXPIRES=None):
+            b = SQLiteBackend(app=self.app, filename=self.filename)
+        tid = uuid()
+        b.mark_as_done(tid, 42)
+        self.assertEqual(b.get_result(tid), 42)
+        self.assertIn(tid, b._cache)
+
+    def test_incr(self):
+        self.assertEqual(self.b.incr('counter'), 1)
+        self.assertEqual(self.b.incr('counter'), 2)
+        self.b.expire('counter', 86400)
+        self.assertEqual(self.b.incr('counter'), 3)
+        self.b.delete('counter')
+        self.assertEqual(self.b.incr('counter'), 1)
+
+    def test_transaction_rollback(self):
+        with self.assertRaises(KeyError):
+            with self.b._transaction() as conn:
+                conn.execute('INSERT INTO celery_results (key, value) '
+                             'VALUES (?, ?)', ('x', 1))
+                raise KeyError('x')
+        self.assertIsNone(self.b.get('x'))
+
+    def test_on_chord_part_return(self):
+        self.assertTrue(self.b.implements_incr)
+        self.b.on_chord_ready = Mock()
+        gid, ids = uuid(), [uuid(), uuid()]
+        deps = GroupResult(gid, [AsyncResult(i, backend=self.b)
+                                 for i in ids])
+        self.b.on_chord_apply(gid, None, result=deps.results)
+        task = Mock()
+        task.request.group = gid
+        task.request.chord = {}
+        task.backend = self.b
+        self.b.on_chord_part_return(task)
+        self.assertFalse(self.b.on_chord_ready.called)
+        self.b.on_chord_part_return(task)
+        self.assertTrue(self.b.on_chord_ready.called)
+        self.assertIsNone(self.b.get(self.b.get_key_for_chord(gid)))
+
+    def test_connection_per_process(self):
+        conn = self.b.conn
+        self.assertIs(self.b.conn, conn)
+        with patch('os.getpid') as getpid:
+            getpid.return_value = -1
+            self.assertIsNot(self.b.conn, conn)
+
+    def test_reduce(self):
+        b = SQLiteBackend(app=self.app, filename=self.filename, expires=10)
+        x = loads(dumps(b))
+        self.assertEqual(x.filename, self.filename)
+        self.assertEqual(x.expires, 10)
@@ -5,8 +5,10 @@ import socket
 from mock import Mock
 
 from celery import Celery
-from celery.events import Event
-from celery.tests.case import AppCase
+from celery.events import Decoder, Event
+from celery.five import range
+from celery.utils import uuid
+from celery.tests.case import AppCase, patch_settings
 
 
 class MockProducer(object):
@@ -100,6 +102,137 @@ class test_EventDispatcher(AppCase):
         buf.popleft.side_effect = IndexError()
         eventer.flush()
 
+    def Batched(self, **kwargs):
+        connection = Mock()
+        connection.transport.driver_type = 'amqp'
+        eventer = self.app.events.Dispatcher(
+            connection, enabled=False, batch_size=3, **kwargs
+        )
+        eventer.producer = MockProducer()
+        eventer.enabled = True
+        return eventer
+
+    def test_send_batched(self):
+        eventer = self.Batched(batch_interval=60.0)
+        eventer.send('task-received', uuid='a')
+        eventer.send('task-started', uuid='a')
+        self.assertFalse(eventer.producer.sent)
+        eventer.send('worker-heartbeat')
+        self.assertTrue(eventer.producer.has_event('worker-heartbeat'))
+        eventer.send('task-succeeded', uuid='a')
+        batch = eventer.producer.sent[-1]
+        self.assertEqual(
+            [ev['type'] for ev in batch],
+            ['task-received', 'task-started', 'task-succeeded'],
+        )
+        self.assertTrue(all(ev['hostname'] == eventer.hostname
+                            for ev in batch))
+
+        eventer.send('task-received', uuid='b')
+        producer = eventer.producer
+        eventer.close()
+        self.assertEqual(producer.sent[-1][0]['uuid'], 'b')
+
+    def test_send_batched_interval(self):
+        eventer = self.Batched(batch_interval=0.0)
+        eventer.send('task-received', uuid='a')
+        self.assertEqual(len(eventer.producer.sent), 1)
+        self.assertIsNone(eventer._batch_started)
+
+    def test_send_batched_offline(self):
+        eventer = self.Batched(batch_interval=60.0)
+        eventer.producer.raise_on_publish = True
+        for i in range(3):
+            eventer.send('task-received', uuid=str(i))
+        self.assertEqual(len(eventer._batches['task']), 3)
+        eventer.producer.raise_on_publish = False
+        eventer.flush()
+        self.assertEqual(len(eventer.producer.sent[-1]), 3)
+        self.assertFalse(eventer._batches['task'])
+
+        eventer.buffer_while_offline = False
+        eventer.producer.raise_on_publish = True
+        eventer.send('task-received', uuid='x')
+        with self.assertRaises(KeyError):
+            eventer.flush_batches()
+        self.assertFalse(eventer._batches['task'])
+
+    def Sampled(self, **kwargs):
+        connection = Mock()
+        connection.transport.driver_type = 'amqp'
+        return self.app.events.Dispatcher(connection, enabled=False,
+                                          **kwargs)
+
+    def test_sample_ratio(self):
+        d = self.Sampled(sampling={'task-received': 0.5, 'tasks.add': 0.5})
+        self.assertTrue(d.sampled)
+        self.assertEqual(d.sample('task-failed'), 1)
+        self.assertEqual(d.sample('task-received', random=lambda: 0.4), 2)
+        self.assertEqual(d.sample('task-received', random=lambda: 0.6), 0)
+        self.assertEqual(
+            d.sample('task-received', 'tasks.add', random=lambda: 0.2), 4,
+        )
+        self.assertEqual(
+            d.sample('task-received', 'tasks.add', random=lambda: 0.3), 0,
+        )
+
+    def test_sample_by_uuid(self):
+        d = self.Sampled(sampling={'task-received': 0.5,
+                                   'task-started': 0.5,
+                                   'task-failed': 0})
+        ids = [uuid() for i in range(100)]
+        received = [d.sample('task-received', uuid=id) for id in ids]
+        started = [d.sample('task-started', uuid=id) for id in ids]
+        self.assertEqual(received, started)
+        self.assertTrue(0 < len([w for w in received if w]) < 100)
+        self.assertFalse(d.sample('task-failed', uuid=ids[0]))
+
+    def test_sample_rate_limit(self):
+        d = self.Sampled(rate_limits={'task-started': '1/s'})
+        self.assertTrue(d.sampled)
+        self.assertEqual(d.sample('task-started'), 1)
+        self.assertEqual(d.sample('task-started'), 0)
+        self.assertEqual(d.sample('task-started'), 0)
+        d._buckets['task-started'].can_consume = Mock(return_value=True)
+        self.assertEqual(d.sample('task-started'), 3)
+        self.assertEqual(d.sample('task-started'), 1)
+
+    def test_not_sampled(self):
+        self.assertFalse(self.Sampled().sampled)
+
+    def test_send_weight(self):
+        eventer = self.Sampled()
+        eventer.producer = MockProducer()
+        eventer.enabled = True
+        eventer.send('task-received', weight=4.0)
+        self.assertEqual(
+            eventer.producer.has_event('task-received')['weight'], 4.0,
+        )
+        eventer.send('task-started')
+        self.assertNotIn('weight', eventer.producer.has_event('task-started'))
+
+    def test_heartbeat_routing_key(self):
+        eventer = self.Batched(hostname='w1@x.com')
+        eventer.producer = Mock()
+        eventer.send('worker-heartbeat')
+        self.assertEqual(
+            eventer.producer.publish.call_args[1]['routing_key'],
+            'worker.heartbeat',
+        )
+        with patch_settings(self.app, CELERYD_GOSSIP_PEERS=3):
+            eventer = self.Batched(hostname='w1@x.com')
+        eventer.producer = Mock()
+        eventer.send('worker-heartbeat')
+        self.assertEqual(
+            eventer.producer.publish.call_args[1]['routing_key'],
+            'worker.heartbeat.w1@x.com',
+        )
+        eventer.send('worker-online')
+        self.assertEqual(
+            eventer.producer.publish.call_args[1]['routing_key'],
+            'worker.online',
+        )
+
     def test_enter_exit(self):
         with self.app.connection() as conn:
             d = self.app.events.Dispatcher(conn)
@@ -181,6 +314,19 @@ class test_EventReceiver(AppCase):
         r._receive(message, object())
         self.assertTrue(got_event[0])
 
+    def test_process_batch(self):
+        got = []
+        connection = Mock()
+        connection.transport_cls = 'memory'
+        r = self.app.events.Receiver(
+            connection,
+            handlers={'task-received': got.append},
+            node_id='celery.tests',
+        )
+        r._receive([{'type': 'task-received', 'uuid': 'a'},
+                    {'type': 'task-received', 'uuid': 'b'}], object())
+        self.assertEqual([ev['uuid'] for ev in got], ['a', 'b'])
+
     def test_catch_all_event(self):
 
         message = {'type': 'world-war'}
@@ -224,6 +370,61 @@ class test_EventReceiver(AppCase):
         self.assertFalse(ts_adjust.called)
         r.adjust_clock.assert_called_with(313)
 
+    def test_process_events(self):
+        got = []
+        r = self.app.events.Receiver(Mock(), node_id='celery.tests',
+                                     handlers={'*': got.append})
+        r.adjust_clock = Mock()
+        events = [
+            {'type': 'Task-Received', 'clock': 3,
+             'utcoffset': 2, 'timestamp': 10000.0},
+            {'type': 'task-started', 'clock': 7},
+        ]
+        r.process_events(events, now=lambda: 3.3, utcoffset=lambda: 1)
+        r.adjust_clock.assert_called_once_with(7)
+        self.assertIs(got[0], events[0])
+        self.assertEqual(got[0]['type'], 'task-received')
+        self.assertEqual(got[0]['timestamp'], 10000.0 - 3600)
+        self.assertEqual([ev['local_received'] for ev in got], [3.3, 3.3])
+
+    def test_process_events_localize_disabled(self):
+        got = []
+        r = self.app.events.Receiver(Mock(), node_id='celery.tests',
+                                     handlers={'*': got.append},
+                                     localize=False)
+        r.adjust_clock = Mock()
+        r.process_events([{'type': 'task-received',
+                           'utcoffset': 2, 'timestamp': 10000.0}])
+        self.assertEqual(got[0]['timestamp'], 10000.0)
+        self.assertFalse(r.adjust_clock.called)
+
+    def test_process_events_empty(self):
+        got = []
+        r = self.app.events.Receiver(Mock(), node_id='celery.tests',
+                                     handlers={'*': got.append})
+        r.adjust_clock = Mock()
+        r._receive([], Mock())
+        self.assertFalse(got)
+        self.assertFalse(r.adjust_clock.called)
+
+    def test_threaded(self):
+        got = []
+        r = self.app.events.Receiver(Mock(), node_id='celery.tests',
+                                     handlers={'*': got.append},
+                                     threaded=True)
+        Consumer = Mock()
+        r.get_consumers(Consumer, Mock())
+        self.assertEqual(Consumer.call_args[1]['on_message'],
+                         r._put_message)
+        r.on_consume_ready(Mock(), Mock(), [], wakeup=False)
+        self.assertTrue(r._decoder.is_alive())
+        message = Mock()
+        message.decode.return_value = [{'type': 'task-received'}]
+        r._put_message(message)
+        r.on_consume_end(Mock(), Mock())
+        self.assertIsNone(r._decoder)
+        self.assertEqual(got[0]['type'], 'task-received')
+
     def test_itercapture_limit(self):
         connection = self.app.connection()
         channel = connection.channel()
@@ -253,6 +454,26 @@ class test_EventReceiver(AppCase):
             connection.close()
 
 
+class test_Decoder(AppCase):
+
+    def test_reraises_errors(self):
+        receive = Mock()
+        receive.side_effect = KeyError()
+        decoder = Decoder(receive)
+        decoder.start()
+        decoder.put(Mock())
+        with self.assertRaises(KeyError):
+            decoder.stop()
+        self.assertEqual(receive.call_count, 1)
+
+    def test_put_reraises(self):
+        decoder = Decoder(Mock())
+        decoder.exc_info = (KeyError, KeyError(), None)
+        with self.assertRaises(KeyError):
+            decoder.put(Mock())
+        self.assertIsNone(decoder.exc_info)
+
+
 class test_misc(AppCase):
 
     def test_State(self):
@@ -0,0 +1,240 @@
+from __future__ import absolute_import
+
+import pickle
+
+from celery import Celery, states
+from celery.events import Event
+from celery.events.indexed import IndexedState, TaskTable
+from celery.five import range
+from celery.tests.case import AppCase, Case
+
+
+def task_event(type, uuid, hostname='w1', local_received=None, **fields):
+    return Event('task-' + type, uuid=uuid, hostname=hostname,
+                 local_received=local_received, **fields)
+
+
+class test_TaskTable(Case):
+
+    def setUp(self):
+        self.table = TaskTable(max_tasks=4, max_task_details=2)
+
+    def update(self, type, uuid, **fields):
+        fields.setdefault('hostname', 'w1')
+        fields.setdefault('timestamp', 1.0)
+        return self.table.update(type, dict(fields, uuid=uuid))
+
+    def test_update(self):
+        self.assertTrue(self.update('received', 'a', name='add',
+                                    args='(2, 2)', local_received=10.0))
+        self.assertFalse(self.update('started', 'a', timestamp=2.0))
+        self.assertFalse(self.update('succeeded', 'a', timestamp=3.0,
+                                     result='4', runtime=0.5))
+        task = self.table['a']
+        self.assertEqual(task.uuid, 'a')
+        self.assertEqual(task.name, 'add')
+        self.assertEqual(task.state, states.SUCCESS)
+        self.assertEqual(task.received, 1.0)
+        self.assertEqual(task.started, 2.0)
+        self.assertEqual(task.succeeded, 3.0)
+        self.assertEqual(task.timestamp, 3.0)
+        self.assertEqual(task.runtime, 0.5)
+        self.assertEqual(task.args, '(2, 2)')
+        self.assertEqual(task.result, '4')
+        self.assertEqual(task.worker.hostname, 'w1')
+        self.assertIn('a', self.table)
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(list(self.table), ['a'])
+
+    def test_out_of_order(self):
+        self.update('succeeded', 'a', timestamp=3.0)
+        self.update('started', 'a', timestamp=2.0)
+        self.update('received', 'a', timestamp=1.0, name='add', retries=1)
+        task = self.table['a']
+        self.assertEqual(task.state, states.SUCCESS)
+        self.assertEqual(task.timestamp, 3.0)
+        self.assertEqual(task.name, 'add')
+        self.assertEqual(task.retries, 1)
+        self.assertEqual(task.started, 2.0)
+
+    def test_eviction(self):
+        for i in range(6):
+            self.update('received', str(i), name='add' if i % 2 else 'mul',
+                        hostname='w{0}'.format(i % 2))
+        self.assertEqual(len(self.table), 4)
+        self.assertNotIn('0', self.table)
+        self.assertNotIn('1', self.table)
+        self.assertEqual(list(self.table), ['2', '3', '4', '5'])
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.by_name('add')], ['5', '3'],
+        )
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.by_worker('w0')], ['4', '2'],
+        )
+        self.assertEqual(self.table.count(states.RECEIVED), 4)
+        # the indexes were trimmed when evicting
+        self.assertEqual(list(self.table._by_name[1]), [2, 4])
+
+    def test_worker_assigned_out_of_order(self):
+        table = self.table = TaskTable(max_tasks=8)
+        for i in range(8):
+            self.update('sent', str(i), hostname=None)
+        for i in [0, 5, 1, 6, 2, 7, 3, 4]:
+            self.update('received', str(i))
+        self.assertEqual(list(table._by_worker[1]), list(range(8)))
+        self.update('received', '8', hostname='w2')
+        self.update('received', '9', hostname='w2')
+        self.assertEqual(
+            [uuid for uuid, _ in table.by_worker('w1')],
+            ['7', '6', '5', '4', '3', '2'],
+        )
+
+    def test_worker_reassigned(self):
+        self.update('received', 'a', hostname='w1')
+        self.update('started', 'a', hostname='w2')
+        self.update('succeeded', 'a', hostname='w1')
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.by_worker('w1')], ['a'],
+        )
+
+    def test_details_limit(self):
+        for i in range(3):
+            self.update('received', str(i), args='({0}, )'.format(i))
+        self.assertIsNone(self.table['0'].args)
+        self.assertEqual(self.table['2'].args, '(2, )')
+
+    def test_by_time(self):
+        for i in range(3):
+            self.update('received', str(i))
+        self.assertEqual([uuid for uuid, _ in self.table.by_time()],
+                         ['2', '1', '0'])
+        self.assertEqual([uuid for uuid, _ in self.table.by_time(limit=2)],
+                         ['2', '1'])
+
+    def test_by_state(self):
+        self.update('received', 'a')
+        self.update('received', 'b')
+        self.update('started', 'b')
+        self.update('received', 'c')
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.by_state(states.RECEIVED)],
+            ['c', 'a'],
+        )
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.by_state(states.RECEIVED, 1)],
+            ['c'],
+        )
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.by_state(states.STARTED)], ['b'],
+        )
+        self.assertFalse(list(self.table.by_state('UNKNOWN')))
+
+    def test_between(self):
+        for i in range(6):
+            self.update('received', str(i), local_received=float(i))
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.between(3.0, 4.0)], ['3', '4'],
+        )
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.between(0.0)],
+            ['2', '3', '4', '5'],
+        )
+        self.assertEqual(
+            [uuid for uuid, _ in self.table.between(3.0, limit=1)], ['3'],
+        )
+
+    def test_names(self):
+        self.update('received', 'a', name='add')
+        self.update('received', 'b', name='mul')
+        self.assertEqual(self.table.names(), set(['add', 'mul']))
+
+    def test_clear(self):
+        self.update('received', 'a')
+        self.update('received', 'b', args='(1, )')
+        self.update('succeeded', 'a')
+        self.table.clear()
+        self.assertEqual(list(self.table), ['b'])
+        self.assertEqual(self.table['b'].state, states.RECEIVED)
+        self.assertEqual(self.table['b'].args, '(1, )')
+        self.table.clear(ready=False)
+        self.assertFalse(self.table)
+
+    def test_pickle(self):
+        self.update('received', 'a', name='add')
+        table = pickle.loads(pickle.dumps(self.table))
+        self.assertEqual(table['a'].name, 'add')
+
+
+class test_IndexedState(AppCase):
+
+    def setup(self):
+        self.state = IndexedState(max_tasks_in_memory=100)
+
+    def test_events(self):
+        s = self.state
+        s.event(task_event('received', 'a', name='add', local_received=1.0,
+                           timestamp=1.0))
+        s.event(task_event('started', 'a', timestamp=2.0))
+        s.event(task_event('received', 'b', name='mul', hostname='w2',
+                           weight=4))
+        self.assertEqual(s.task_count, 5)
+        self.assertEqual(s.tasks['a'].state, states.STARTED)
+        self.assertIs(s.tasks['a'].worker, s.workers['w1'])
+        self.assertEqual(s.task_types(), ['add', 'mul'])
+        self.assertEqual([u for u, _ in s.tasks_by_type('add')], ['a'])
+        self.assertEqual([u for u, _ in s.tasks_by_worker('w2')], ['b'])
+        self.assertEqual(
+            [u for u, _ in s.tasks_by_state(states.STARTED)], ['a'],
+        )
+        self.assertEqual([u for u, _ in s.tasks_by_time()], ['b', 'a'])
+        self.assertEqual([u for u, _ in s.itertasks(limit=1)], ['a'])
+        self.assertEqual([u for u, _ in s.tasks_between(0.0, 1.0)], ['a'])
+
+    def test_get_or_create_task(self):
+        task, created = self.state.get_or_create_task('a')
+        self.assertTrue(created)
+        self.assertEqual(task.state, states.PENDING)
+        task, created = self.state.get_or_create_task('a')
+        self.assertFalse(created)
+
+    def test_clear(self):
+        self.state.event(task_event('received', 'a'))
+        self.state.event(task_event('succeeded', 'b'))
+        self.state.clear()
+        self.assertFalse(self.state.workers)
+        self.assertEqual(list(self.state.tasks), ['a'])
+        self.state.clear(ready=False)
+        self.assertFalse(self.state.tasks)
+
+    def test_changes(self):
+        s = IndexedState(max_tasks_in_memory=2)
+        s.track_changes()
+        s.event(task_event('received', 'a', name='add'))
+        s.event(task_event('received', 'b', name='add'))
+        changes = s.changes()
+        self.assertEqual(sorted(changes.tasks), ['a', 'b'])
+        self.assertEqual(changes.tasks['a'].name, 'add')
+        self.assertEqual(list(changes.workers), ['w1'])
+        s.event(task_event('started', 'b'))
+        s.event(task_event('received', 'c'))
+        changes = s.changes()
+        self.assertEqual(sorted(changes.tasks), ['b', 'c'])
+        self.assertEqual(changes.tasks['b'].state, states.STARTED)
+        self.assertEqual(changes.removed_tasks, set(['a']))
+        s.event(task_event('succeeded', 'b'))
+        s.clear_tasks()
+        changes = s.changes()
+        self.assertFalse(changes.tasks)
+        self.assertEqual(changes.removed_tasks, set(['b']))
+
+    def test_pickle(self):
+        self.state.event(task_event('received', 'a', name='add'))
+        state = pickle.loads(pickle.dumps(self.state))
+        self.assertEqual(state.tasks['a'].name, 'add')
+        self.assertEqual(state.max_tasks_in_memory, 100)
+
+    def test_app_setting(self):
+        # the class is resolved when first accessed.
+        app = Celery(set_as_current=False)
+        app.conf.CELERY_EVENT_STATE = 'celery.events.indexed:IndexedState'
+        self.assertTrue(issubclass(app.events.State, IndexedState))
@@ -0,0 +1,132 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+
+from tempfile import mkdtemp
+
+from mock import Mock
+
+from celery import states
+from celery.events import Event
+from celery.events.log import EventLog, INDEX_SUFFIX
+from celery.events.state import State
+from celery.five import range
+from celery.tests.case import Case
+
+
+def event(i, type='task-received', **fields):
+    fields.setdefault('clock', i + 1)
+    fields.setdefault('timestamp', float(i))
+    return Event(type, uuid=str(i), hostname='w1', **fields)
+
+
+class test_EventLog(Case):
+
+    def setUp(self):
+        self.path = mkdtemp()
+        self.log = EventLog(self.path, block_size=3, flush_interval=1e6)
+
+    def tearDown(self):
+        self.log.close()
+        shutil.rmtree(self.path)
+
+    def record(self, n, log=None):
+        log = log or self.log
+        for i in range(n):
+            log.append(event(i))
+        log.close()
+
+    def timestamps(self, **kwargs):
+        return [e['timestamp'] for e in self.log.events(**kwargs)]
+
+    def test_append_buffers(self):
+        self.log.append(event(0))
+        self.assertFalse(list(self.log.events()))
+        self.log.flush()
+        self.assertEqual(self.timestamps(), [0.0])
+
+    def test_flush_interval(self):
+        log = EventLog(self.path, flush_interval=0)
+        log.append(event(0))
+        self.assertEqual(self.timestamps(), [0.0])
+        log.close()
+
+    def test_events(self):
+        self.record(10)
+        self.assertEqual(self.timestamps(), [float(i) for i in range(10)])
+        self.assertEqual(len(self.log.index(0)), 4)
+
+    def test_blocks_in_clock_order(self):
+        self.log.append(event(0, clock=3))
+        self.log.append(event(1, clock=1))
+        self.log.append(event(2, clock=2))
+        self.log.close()
+        self.assertEqual(self.timestamps(), [1.0, 2.0, 0.0])
+
+    def test_time_range(self):
+        self.record(10)
+        self.assertEqual(self.timestamps(since=4), [4.0, 5.0, 6.0, 7.0,
+                                                    8.0, 9.0])
+        self.assertEqual(self.timestamps(since=4, until=6.5),
+                         [4.0, 5.0, 6.0])
+        self.assertEqual(self.timestamps(until=1), [0.0, 1.0])
+        self.assertFalse(self.timestamps(since=100))
+
+    def test_new_segment_on_open(self):
+        self.record(2)
+        self.record(2, EventLog(self.path))
+        self.assertEqual(self.log.segments(), [0, 1])
+        self.assertEqual(self.timestamps(), [0.0, 1.0, 0.0, 1.0])
+
+    def test_segment_size(self):
+        self.log.segment_size = 1
+        self.record(9)
+        self.assertEqual(self.log.segments(), [0, 1, 2])
+        self.assertEqual(len(self.timestamps()), 9)
+
+    def test_max_segments(self):
+        self.log.segment_size = 1
+        self.log.max_segments = 2
+        self.record(9)
+        self.assertEqual(self.log.segments(), [1, 2])
+        self.assertEqual(self.timestamps(), [3.0, 4.0, 5.0, 6.0, 7.0, 8.0])
+
+    def test_missing_index(self):
+        self.record(5)
+        index = self.log.index(0)
+        os.unlink(self.log._filename(0, INDEX_SUFFIX))
+        self.assertEqual(self.log.index(0), index)
+        self.assertEqual(len(self.timestamps()), 5)
+
+    def test_incomplete_block(self):
+        self.record(6)
+        with open(self.log._filename(0, '.log'), 'r+b') as fh:
+            fh.truncate(os.path.getsize(fh.name) - 1)
+        self.assertEqual(self.timestamps(), [0.0, 1.0, 2.0])
+
+    def test_corrupt_block(self):
+        self.record(6)
+        offset = self.log.index(0)[1][0]
+        with open(self.log._filename(0, '.log'), 'r+b') as fh:
+            fh.seek(offset + 30)
+            fh.write(b'\x00' * 8)
+        self.assertEqual(self.timestamps(), [0.0, 1.0, 2.0])
+
+    def test_replay(self):
+        self.log.append(event(0, name='add'))
+        self.log.append(event(0, type='task-succeeded', clock=2,
+                              timestamp=1.0))
+        self.log.close()
+        state = State()
+        self.assertEqual(self.log.replay(state), 2)
+        self.assertEqual(state.tasks['0'].name, 'add')
+        self.assertEqual(state.tasks['0'].state, states.SUCCESS)
+        self.assertEqual(self.log.replay(State(), since=1.0), 1)
+
+    def test_recorder(self):
+        state = Mock()
+        self.log.recorder(state)(event(0))
+        state.event.assert_called_with(event(0))
+        self.log.flush()
+        self.assertEqual(self.timestamps(), [0.0])
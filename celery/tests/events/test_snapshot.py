@@ -1,8 +1,8 @@
 from __future__ import absolute_import
 
-from mock import patch
+from mock import Mock, patch
 
-from celery.events import Events
+from celery.events import Event, Events
 from celery.events.snapshot import Polaroid, evcam
 from celery.tests.case import AppCase, restore_logging
 
@@ -96,6 +96,26 @@ class test_Polaroid(AppCase):
             x.shutter()
         self.assertEqual(shutter_signal_sent[0], 1)
 
+    def test_delta(self):
+
+        class DeltaCam(Polaroid):
+            delta = True
+            on_changes = Mock()
+            on_shutter = Mock()
+
+        x = DeltaCam(self.state, app=self.app)
+        self.state.event(Event('task-received', uuid='a', hostname='w1'))
+        x.capture()
+        self.assertFalse(x.on_shutter.called)
+        state, changes = x.on_changes.call_args[0]
+        self.assertIs(state, self.state)
+        self.assertEqual(list(changes.tasks), ['a'])
+        self.assertEqual(list(changes.workers), ['w1'])
+        x.capture()
+        state, changes = x.on_changes.call_args[0]
+        self.assertFalse(changes.tasks)
+        self.assertFalse(changes.workers)
+
 
 class test_evcam(AppCase):
 
@@ -129,6 +149,16 @@ class test_evcam(AppCase):
             finally:
                 self.MockReceiver.raise_keyboard_interrupt = False
 
+    @patch('celery.events.snapshot.EventLog')
+    def test_evcam_event_log(self, EventLog):
+        log = EventLog.return_value
+        log.replay.return_value = 0
+        evcam(Polaroid, timer=timer, event_log='/var/run/events')
+        EventLog.assert_called_with('/var/run/events')
+        self.assertTrue(log.replay.called)
+        log.recorder.assert_called_with(log.replay.call_args[0][0])
+        log.close.assert_called_with()
+
     @patch('celery.platforms.create_pidlock')
     def test_evcam_pidfile(self, create_pidlock):
         evcam(Polaroid, timer=timer, pidfile='/var/pid')
@@ -11,6 +11,8 @@ from celery import states
 from celery.events import Event
 from celery.events.state import (
     State,
+    Histogram,
+    Throughput,
     Worker,
     Task,
     HEARTBEAT_EXPIRE_WINDOW,
@@ -192,6 +194,17 @@ class test_Worker(Case):
         worker.update_heartbeat(time() - 10, time())
         self.assertEqual(len(worker.heartbeats), 1)
 
+    def test_delta_heartbeats(self):
+        worker = Worker(hostname='foo')
+        self.assertIsNone(worker.utilization)
+        worker.on_online(active=1, processed=10, pool_size=4, sw_ident='x')
+        worker.on_heartbeat(active=3, delta=True)
+        self.assertEqual(worker.active, 3)
+        self.assertEqual(worker.processed, 10)
+        self.assertEqual(worker.sw_ident, 'x')
+        self.assertNotIn('delta', worker)
+        self.assertEqual(worker.utilization, 0.75)
+
 
 class test_Task(Case):
 
@@ -385,6 +398,61 @@ class test_State(Case):
         self.assertTrue(state.event_count)
         self.assertTrue(state.task_count)
 
+    def test_weighted_events(self):
+        s = State()
+        s.event(Event('task-received', uuid=uuid(), name='add',
+                      hostname='utest1', weight=10.0))
+        s.event(Event('task-received', uuid=uuid(), name='add',
+                      hostname='utest1'))
+        self.assertEqual(s.task_count, 11)
+        self.assertEqual(s.event_count, 11)
+
+    def test_replay(self):
+        s = State()
+        r = ev_snapshot(s)
+        self.assertEqual(s.replay(iter(r.events)), len(r.events))
+        self.assertEqual(s.event_count, len(r.events))
+        self.assertEqual(s.replay([]), 0)
+
+    def test_changes(self):
+        s = State()
+        with self.assertRaises(RuntimeError):
+            s.changes()
+        s.track_changes()
+        s.event(Event('worker-online', hostname='w1'))
+        s.event(Event('task-received', uuid='a', hostname='w1'))
+        s.event(Event('task-started', uuid='a', hostname='w1'))
+        changes = s.changes()
+        self.assertEqual(changes.tasks, {'a': s.tasks['a']})
+        self.assertEqual(changes.workers, {'w1': s.workers['w1']})
+        self.assertFalse(changes.removed_tasks)
+        changes = s.changes()
+        self.assertFalse(changes.tasks)
+        self.assertFalse(changes.workers)
+
+        s.event(Event('task-succeeded', uuid='a', hostname='w1'))
+        s.event(Event('task-received', uuid='b', hostname='w1'))
+        s.clear_tasks()
+        changes = s.changes()
+        self.assertEqual(list(changes.tasks), ['b'])
+        self.assertEqual(changes.removed_tasks, set(['a']))
+
+        s.clear()
+        self.assertEqual(s.changes().removed_workers, set(['w1']))
+
+    def test_changes_evicted(self):
+        s = State(max_tasks_in_memory=2, max_workers_in_memory=1)
+        s.track_changes()
+        for id in 'a', 'b':
+            s.event(Event('task-received', uuid=id, hostname='w1'))
+        s.changes()
+        s.event(Event('task-received', uuid='c', hostname='w2'))
+        changes = s.changes()
+        self.assertEqual(list(changes.tasks), ['c'])
+        self.assertEqual(list(changes.workers), ['w2'])
+        self.assertEqual(changes.removed_tasks, set(['a']))
+        self.assertEqual(changes.removed_workers, set(['w1']))
+
     def test_freeze_while(self):
         s = State()
         r = ev_snapshot(s)
@@ -500,6 +568,104 @@ class test_State(Case):
         self.assertTrue(scratch.get('recv'))
 
 
+class test_Histogram(Case):
+
+    def test_percentile(self):
+        h = Histogram(base=1.0, buckets=8)
+        self.assertIsNone(h.percentile(50))
+        self.assertIsNone(h.mean)
+        for value in (0.5, 1.5, 3.0, 3.5, 100.0, 1000.0):
+            h.add(value)
+        self.assertEqual(h.buckets, [1, 1, 2, 0, 0, 0, 0, 2])
+        self.assertEqual(h.count, 6)
+        self.assertEqual(h.percentile(10), 1.0)
+        self.assertEqual(h.percentile(50), 4.0)
+        self.assertEqual(h.percentile(100), 1000.0)
+        self.assertEqual(h.max, 1000.0)
+        self.assertAlmostEqual(h.mean, 1108.5 / 6)
+
+    def test_weight(self):
+        h = Histogram()
+        h.add(0.1, weight=10)
+        self.assertEqual(h.count, 10)
+        self.assertAlmostEqual(h.mean, 0.1)
+
+
+class test_Throughput(Case):
+
+    def test_windows(self):
+        t = Throughput(windows=(2, 4))
+        t.add(10.0)
+        t.add(10.5, weight=2)
+        t.add(11.0)
+        self.assertEqual(t.count(2, now=11), 4)
+        self.assertEqual(t.count(2, now=12), 1)
+        self.assertEqual(t.count(4, now=12), 4)
+        self.assertEqual(t.count(4, now=13), 4)
+        self.assertEqual(t.count(4, now=14), 1)
+        self.assertEqual(t.count(4, now=15), 0)
+        self.assertEqual(t.rate(2, now=15), 0.0)
+
+    def test_late_events(self):
+        t = Throughput(windows=(2, 4))
+        t.add(20.0)
+        t.add(17.5)
+        self.assertEqual(t.count(2, now=20), 1)
+        self.assertEqual(t.count(4, now=20), 2)
+        t.add(10.0)  # too old
+        self.assertEqual(t.count(4, now=20), 2)
+
+    def test_reset_after_idle(self):
+        t = Throughput(windows=(2, 4))
+        t.add(10.0)
+        t.add(100.0)
+        self.assertEqual(t.count(4, now=100), 1)
+        self.assertEqual(t.rate(4, now=100), 0.25)
+
+
+class test_Metrics(Case):
+
+    def test_state_events(self):
+        s = State()
+        s.event(Event('task-sent', uuid='a', name='add', hostname='client',
+                      timestamp=1.0, local_received=1.0))
+        s.event(Event('task-received', uuid='a', name='add',
+                      hostname='w1', timestamp=2.0, local_received=2.0))
+        s.event(Event('task-started', uuid='a', hostname='w1',
+                      timestamp=4.0, local_received=4.0))
+        s.event(Event('task-succeeded', uuid='a', hostname='w1',
+                      runtime=0.25, timestamp=5.0, local_received=5.0))
+        s.event(Event('task-failed', uuid='b', name='add',
+                      hostname='w2', timestamp=5.0, local_received=5.0,
+                      weight=3))
+        m = s.metrics
+        self.assertEqual(m.counts()[states.SUCCESS], 1)
+        self.assertEqual(m.counts(name='add')[states.FAILURE], 3)
+        self.assertEqual(m.counts(hostname='w1')[states.STARTED], 1)
+        self.assertEqual(m.counts(hostname='w3'), {})
+        self.assertEqual(m.failure_rate(), 0.75)
+        self.assertEqual(m.failure_rate(hostname='w1'), 0.0)
+        self.assertEqual(m.runtime('add').count, 1)
+        self.assertEqual(m.runtime().max, 0.25)
+        self.assertEqual(m.latency('add').max, 3.0)
+        self.assertIsNone(m.runtime('mul'))
+        self.assertEqual(m.throughput(60, now=5.0), 1 / 60.0)
+        self.assertEqual(m.throughput(60, states.FAILURE, now=5.0),
+                         3 / 60.0)
+        self.assertEqual(m.throughput(60, states.REVOKED), 0.0)
+
+        s.clear()
+        self.assertEqual(m.counts(), {})
+
+    def test_pickle(self):
+        s = State()
+        s.event(Event('task-received', uuid='a', name='add',
+                      hostname='w1', local_received=1.0))
+        s2 = pickle.loads(pickle.dumps(s))
+        self.assertEqual(s2.metrics.counts(name='add'),
+                         {states.RECEIVED: 1})
+
+
 class test_lamportinfo(Case):
 
     def test_repr(self):
@@ -1,6 +1,6 @@
 from __future__ import absolute_import
 
-from mock import Mock
+from mock import Mock, patch
 
 from celery import shared_task
 from celery.canvas import (
@@ -12,6 +12,7 @@ from celery.canvas import (
     xmap,
     xstarmap,
     chunks,
+    ChunkSizer,
     _maybe_group,
     maybe_subtask,
 )
@@ -194,6 +195,77 @@ class test_chunks(AppCase):
         finally:
             self.app.conf.CELERY_ALWAYS_EAGER = False
 
+    def test_adaptive(self):
+        x = add.chunks(range(100), target_runtime=2.0)
+        self.assertIsNone(x.kwargs['n'])
+        self.assertEqual(chunks.from_dict(dict(x)), x)
+        self.assertEqual(
+            chunks.from_dict(dict(x)).kwargs['target_runtime'], 2.0,
+        )
+
+        x.type = Mock()
+        x.apply_async()
+        args, kwargs = x.type.apply_async.call_args
+        self.assertEqual(kwargs, {})
+        self.assertEqual(args[1]['it'], list(range(100)))
+        self.assertIsNone(args[1]['n'])
+
+        with patch('celery.canvas.chunks.apply_adaptive') as apply_adaptive:
+            x()
+            apply_adaptive.assert_called_with(add.s(), x.kwargs['it'], 2.0)
+
+    def test_adaptive_is_opt_in(self):
+        with self.assertRaises(ValueError):
+            add.chunks(range(100))
+
+    def test_apply_adaptive(self):
+        sizes = []
+
+        class Sizer(ChunkSizer):
+
+            def update(self, n, runtime):
+                sizes.append(n)
+                return ChunkSizer.update(self, n, runtime)
+
+        times = iter(range(1000))
+        items = [(i, i) for i in range(30)]
+        with patch('celery.canvas.xstarmap') as xstarmap:
+            with patch('celery.backends.base.BaseBackend.mark_as_done') as m:
+                res = chunks.apply_adaptive(
+                    add.s(), items, 4.0, window=2,
+                    Sizer=Sizer, time=lambda: next(times),
+                )
+                self.assertEqual(m.call_args_list[0][0][1], [0])
+                self.assertEqual(m.call_args_list[1][0][1], [18, 20, 22, 24])
+        # each sample takes one second, so the size grows
+        # towards the target runtime.
+        self.assertEqual(sizes[:2], [1, 4])
+        self.assertEqual(len(res.results),
+                         len(sizes) + xstarmap.call_count)
+        self.assertEqual(
+            sum(sizes) + sum(len(c[0][1]) for c in xstarmap.call_args_list),
+            30,
+        )
+
+
+class test_ChunkSizer(AppCase):
+
+    def test_size(self):
+        x = ChunkSizer(target=1.0, initial=3, max_size=100)
+        self.assertEqual(x.size, 3)
+        self.assertEqual(x.update(10, 1.0), 10)
+        self.assertEqual(x.update(10, 3.0), 5)
+        self.assertEqual(x.update(0, 10.0), 5)
+
+    def test_limits(self):
+        x = ChunkSizer(target=1.0, min_size=2, max_size=100)
+        self.assertEqual(x.update(1, 10.0), 2)
+        x = ChunkSizer(target=1.0, min_size=2, max_size=100)
+        self.assertEqual(x.update(1, 0.0001), 100)
+        self.assertEqual(x.update(1, 0), 100)
+        x.per_item = 0
+        self.assertEqual(x.size, 100)
+
 
 class test_chain(AppCase):
 
@@ -316,6 +388,35 @@ class test_chord(AppCase):
         x.kwargs['body'] = None
         self.assertIn('without body', repr(x))
 
+    def test_reduce_fanin(self):
+        x = chord([add.s(2, 2), add.s(4, 4)], body=mul.s(4), reduce_fanin=3)
+        self.assertEqual(x.kwargs['reduce_fanin'], 3)
+        self.assertEqual(subtask(dict(x)).kwargs['reduce_fanin'], 3)
+        self.assertNotIn('reduce_fanin', chord([add.s(2, 2)]).kwargs)
+
+    def test_reduce_tree(self):
+        body = add.s().set(task_id='id', link=[mul.s(2)], queue='q')
+        tasks = chord.reduce_tree([add.s(i, i) for i in range(10)], body, 3)
+        # 10 -> 4 chords of 3 -> 2 chords of 3
+        self.assertEqual(len(tasks), 2)
+        for node in tasks:
+            self.assertIsInstance(node, chord)
+            self.assertNotIn('task_id', node.body.options)
+            self.assertNotIn('link', node.body.options)
+            self.assertEqual(node.body.options['queue'], 'q')
+            for part in node.tasks:
+                self.assertIsInstance(part, chord)
+                self.assertLessEqual(len(part.tasks), 3)
+        self.assertEqual(body.options['task_id'], 'id')
+
+    def test_reduce_tree_small_header(self):
+        tasks = [add.s(i, i) for i in range(3)]
+        self.assertEqual(chord.reduce_tree(tasks, add.s(), 3), tasks)
+
+    def test_reduce_tree_fanin_too_small(self):
+        with self.assertRaises(ValueError):
+            chord.reduce_tree([add.s(2, 2)], add.s(), 1)
+
 
 class test_maybe_subtask(AppCase):
 
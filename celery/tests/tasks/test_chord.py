@@ -197,6 +197,25 @@ class test_chord(ChordCase):
         finally:
             self.app.conf.CELERY_ALWAYS_EAGER = False
 
+    def test_eager_reduce_fanin(self):
+        from celery import chord
+
+        @self.app.task()
+        def addX(x, y):
+            return x + y
+
+        @self.app.task()
+        def sumX(n):
+            return sum(n)
+
+        self.app.conf.CELERY_ALWAYS_EAGER = True
+        try:
+            x = chord((addX.s(i, i) for i in range(10)), reduce_fanin=3)
+            result = x(sumX.s())
+            self.assertEqual(result.get(), sum(i + i for i in range(10)))
+        finally:
+            self.app.conf.CELERY_ALWAYS_EAGER = False
+
     def test_apply(self):
         self.app.conf.CELERY_ALWAYS_EAGER = False
         from celery import chord
@@ -11,6 +11,7 @@ from celery.result import (
     EagerResult,
     TaskSetResult,
     ResultSet,
+    ResultSequence,
     #GroupResult,
     from_serializable,
 )
@@ -712,3 +713,60 @@ class test_serializable(AppCase):
         )
         self.assertEqual(x, from_serializable(x.serializable(), self.app))
         self.assertEqual(x, from_serializable(x, self.app))
+
+    def test_GroupResult_compact(self):
+        x = self.app.GroupResult('gid', ResultSequence('gid', 3))
+        self.assertEqual(x.serializable(),
+                         ('gid', {'prefix': 'gid', 'count': 3}))
+        y = from_serializable(x.serializable(), self.app)
+        self.assertIsInstance(y.results, ResultSequence)
+        self.assertEqual(x, y)
+
+
+class test_ResultSequence(AppCase):
+
+    def setup(self):
+        self.seq = ResultSequence('gid', 3, app=self.app)
+
+    def test_iter(self):
+        self.assertEqual([r.id for r in self.seq], ['gid-0', 'gid-1', 'gid-2'])
+        self.assertEqual(len(self.seq), 3)
+
+    def test_getitem(self):
+        self.assertEqual(self.seq[1].id, 'gid-1')
+        self.assertEqual(self.seq[-1].id, 'gid-2')
+        self.assertEqual([r.id for r in self.seq[1:]], ['gid-1', 'gid-2'])
+        with self.assertRaises(IndexError):
+            self.seq[3]
+
+    def test_index(self):
+        self.assertEqual(self.seq.index('gid-2'), 2)
+        self.assertEqual(self.seq.index(self.app.AsyncResult('gid-1')), 1)
+        for missing in 'gid-3', 'other-1', 'gid-x', 'gid':
+            with self.assertRaises(ValueError):
+                self.seq.index(missing)
+        self.assertIn('gid-0', self.seq)
+        self.assertNotIn('gid-5', self.seq)
+
+    def test_eq(self):
+        self.assertEqual(self.seq, ResultSequence('gid', 3))
+        self.assertNotEqual(self.seq, ResultSequence('gid', 4))
+        self.assertEqual(
+            self.seq, [self.app.AsyncResult('gid-{0}'.format(i))
+                       for i in range(3)],
+        )
+        self.assertTrue(repr(self.seq))
+
+    def test_GroupResult_join_native(self):
+        backend = self.app.backend
+        backend.get_many = Mock()
+        backend.get_many.return_value = iter([
+            ('gid-2', {'status': states.SUCCESS, 'result': 3}),
+            ('gid-0', {'status': states.SUCCESS, 'result': 1}),
+            ('gid-1', {'status': states.SUCCESS, 'result': 2}),
+        ])
+        try:
+            x = self.app.GroupResult('gid', self.seq)
+            self.assertEqual(x.join_native(), [1, 2, 3])
+        finally:
+            del backend.get_many
@@ -21,7 +21,9 @@ from celery.exceptions import RetryTaskError
 from celery.execute import send_task
 from celery.five import items, range, string_t
 from celery.result import EagerResult
-from celery.schedules import crontab, crontab_parser, ParseException
+from celery.schedules import (
+    crontab, crontab_parser, ParseException, _first_bit, _next_bit,
+)
 from celery.utils import uuid
 from celery.utils.timeutils import parse_iso8601, timedelta_seconds
 
@@ -818,6 +820,14 @@ class test_crontab_parser(AppCase):
         self.assertFalse(object() == crontab(minute='1'))
         self.assertFalse(crontab(minute='1') == object())
 
+    def test_first_bit(self):
+        for value in (0, 1, 5, 31, 59):
+            self.assertEqual(_first_bit(1 << value), value)
+            self.assertEqual(_first_bit((1 << value) | (1 << 60)), value)
+        self.assertEqual(_next_bit(0b101001, 0), 3)
+        self.assertEqual(_next_bit(0b101001, 3), 5)
+        self.assertIsNone(_next_bit(0b101001, 5))
+
 
 class test_crontab_remaining_estimate(AppCase):
 
@@ -990,6 +1000,30 @@ class test_crontab_remaining_estimate(AppCase):
                                    datetime(2010, 1, 28, 14, 30, 15))
         self.assertEqual(next, datetime(2010, 5, 29, 0, 5))
 
+    def test_cached(self):
+        c = crontab(minute=[5, 42])
+        last_run_at = datetime(2010, 9, 11, 14, 30, 15)
+        self.assertEqual(self.next_ocurrance(c, last_run_at),
+                         datetime(2010, 9, 11, 14, 42))
+        with patch('celery.schedules.crontab.remaining_delta') as delta:
+            c.nowfun = lambda: datetime(2010, 9, 11, 14, 35)
+            self.assertEqual(c.remaining_estimate(last_run_at),
+                             timedelta(minutes=7))
+            self.assertFalse(delta.called)
+
+    def test_cache_invalidated(self):
+        c = crontab(minute=[5, 42])
+        last_run_at = datetime(2010, 9, 11, 14, 30, 15)
+        self.next_ocurrance(c, last_run_at)
+        # next time to run depends on the date
+        c.nowfun = lambda: datetime(2010, 9, 12, 10, 0)
+        self.assertEqual(c.remaining_estimate(last_run_at),
+                         -timedelta(hours=18, minutes=55))
+        self.assertEqual(
+            self.next_ocurrance(c, datetime(2010, 9, 11, 14, 50)),
+            datetime(2010, 9, 11, 15, 5),
+        )
+
 
 class test_crontab_is_due(AppCase):
 
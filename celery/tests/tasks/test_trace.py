@@ -2,18 +2,20 @@ from __future__ import absolute_import
 
 from mock import Mock, patch
 
-from celery import uuid
+from celery import subtask, uuid
 from celery import signals
 from celery import states
 from celery.exceptions import RetryTaskError, Ignore
+from celery.app.task import Context
 from celery.app.trace import (
     TraceInfo,
+    build_chain_fuser,
     eager_trace_task,
     trace_task,
     setup_worker_optimizations,
     reset_worker_optimizations,
 )
-from celery.tests.case import AppCase
+from celery.tests.case import AppCase, patch_settings
 
 
 def trace(task, args=(), kwargs={}, propagate=False, **opts):
@@ -115,6 +117,24 @@ class test_trace(TraceCase):
         with self.assertRaises(MemoryError):
             trace(add, (2, 2), {}, eager=False)
 
+    def test_result_compression(self):
+
+        @self.app.task(name='test_trace.add_compressed',
+                       result_compression='zlib')
+        def add_compressed(x, y):
+            return x + y
+        add_compressed.backend = Mock(name='backend')
+        trace(add_compressed, (2, 2), {}, eager=False)
+        add_compressed.backend.store_result.assert_called_with(
+            'id-1', 4, states.SUCCESS, compression='zlib',
+        )
+
+        self.add.backend = Mock(name='backend')
+        trace(self.add, (2, 2), {}, eager=False)
+        self.add.backend.store_result.assert_called_with(
+            'id-1', 4, states.SUCCESS,
+        )
+
     def test_when_Ignore(self):
 
         @self.app.task
@@ -160,6 +180,92 @@ class test_trace(TraceCase):
         self.assertIs(xtask.__trace__, tracer)
 
 
+class test_chain_fusion(TraceCase):
+
+    def setup(self):
+        TraceCase.setup(self)
+        self.app.conf.CELERYD_CHAIN_FUSION_DEPTH = 2
+        self.fuse = build_chain_fuser(self.app, 'w1')
+        self.parent = Context(id='id-1', hostname='w1')
+
+    def test_disabled(self):
+        with patch_settings(self.app, CELERYD_CHAIN_FUSION_DEPTH=0):
+            self.assertIsNone(build_chain_fuser(self.app))
+
+    @patch('celery.app.trace.trace_task')
+    def test_fuse(self, trace_task):
+        step = self.fuse(self.add.s(2).set(task_id='id-2'), (4, ),
+                         self.parent)
+        self.assertTrue(step)
+        self.assertEqual([r.id for r in self.parent.children], ['id-2'])
+        step()
+        task, task_id, args, kwargs, request = trace_task.call_args[0]
+        self.assertIs(task, self.add)
+        self.assertEqual(task_id, 'id-2')
+        self.assertEqual(args, (4, 2))
+        self.assertEqual(request['fused'], 1)
+        self.assertEqual(request['delivery_info']['routing_key'],
+                         self.app.conf.CELERY_DEFAULT_ROUTING_KEY)
+
+    def test_max_depth(self):
+        self.parent.fused = 2
+        self.assertIsNone(self.fuse(self.add.s(2), (4, ), self.parent))
+        self.parent.fused = 1
+        self.assertTrue(self.fuse(self.add.s(2), (4, ), self.parent))
+
+    def test_excluded_options(self):
+        self.assertIsNone(
+            self.fuse(self.add.s(2).set(countdown=10), (4, ), self.parent),
+        )
+        self.add.rate_limit = '10/s'
+        try:
+            self.assertIsNone(self.fuse(self.add.s(2), (4, ), self.parent))
+        finally:
+            self.add.rate_limit = None
+
+    def test_not_registered(self):
+        self.assertIsNone(self.fuse(subtask('xxx.nothere'), (4, ),
+                                    self.parent))
+
+    def test_not_consuming_queue(self):
+        self.app.amqp.queues.select_subset(['celery'])
+        self.assertIsNone(
+            self.fuse(self.add.s(2).set(queue='other'), (4, ), self.parent),
+        )
+        self.assertIsNone(
+            self.fuse(self.add.s(2).set(routing_key='xyz'), (4, ),
+                      self.parent),
+        )
+
+    @patch('celery.app.trace.build_chain_fuser')
+    def test_tracer_executes_fused_steps(self, build_chain_fuser):
+        fuse = build_chain_fuser.return_value
+        step = fuse.return_value
+
+        @self.app.task
+        def add(x, y):
+            return x + y
+        add.backend = Mock()
+
+        callback = self.add.s(2)
+        callback.apply_async = Mock()
+        with patch('celery.canvas.subtask') as subtask:
+            subtask.return_value = callback
+            trace(add, (2, 2), {}, eager=False,
+                  request={'callbacks': [callback]})
+        step.assert_called_with()
+        self.assertFalse(callback.apply_async.called)
+        self.assertIs(fuse.call_args[0][0], callback)
+        self.assertEqual(fuse.call_args[0][1], (4, ))
+
+        fuse.return_value = None
+        with patch('celery.canvas.subtask') as subtask:
+            subtask.return_value = callback
+            trace(add, (2, 2), {}, eager=False,
+                  request={'callbacks': [callback]})
+        callback.apply_async.assert_called_with((4, ))
+
+
 class test_TraceInfo(TraceCase):
 
     class TI(TraceInfo):
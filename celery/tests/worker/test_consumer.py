@@ -12,6 +12,7 @@ from celery.datastructures import LimitedSet
 from celery.worker import state as worker_state
 from celery.worker.consumer import (
     Consumer,
+    Events,
     Heart,
     Tasks,
     Agent,
@@ -176,10 +177,35 @@ class test_Consumer(AppCase):
             self.app.connection = _prev
 
 
+class test_Events(AppCase):
+
+    def test_start_batching(self):
+        c = Mock()
+        dis = c.app.events.Dispatcher.return_value
+        dis.batch_size = 10
+        dis.batch_interval = 0.5
+        ev = Events(c)
+        ev.start(c)
+        c.timer.apply_interval.assert_called_with(500.0, dis.flush_batches)
+        tref = c.timer.apply_interval.return_value
+        ev.stop(c)
+        tref.cancel.assert_called_with()
+        dis.close.assert_called_with()
+        self.assertIsNone(c.event_dispatcher)
+
+    def test_start_no_batching(self):
+        c = Mock()
+        c.app.events.Dispatcher.return_value.batch_size = 0
+        ev = Events(c)
+        ev.start(c)
+        self.assertFalse(c.timer.apply_interval.called)
+
+
 class test_Heart(AppCase):
 
     def test_start(self):
         c = Mock()
+        c.app = self.app
         c.timer = Mock()
         c.event_dispatcher = Mock()
 
@@ -190,7 +216,8 @@ class test_Heart(AppCase):
 
             h.start(c)
             self.assertTrue(c.heart)
-            hcls.assert_called_with(c.timer, c.event_dispatcher)
+            hcls.assert_called_with(c.timer, c.event_dispatcher,
+                                    consumer=c, full_every=10)
             c.heart.start.assert_called_with()
 
 
@@ -260,7 +287,9 @@ class test_Mingle(AppCase):
             }
 
             mingle.start(c)
-            I.hello.assert_called_with()
+            I.hello.assert_called_with(
+                digest=worker_state.revoked_digest([]),
+            )
             c.app.clock.adjust.assert_has_calls([
                 call(312), call(29),
             ], any_order=True)
@@ -270,6 +299,32 @@ class test_Mingle(AppCase):
         finally:
             worker_state.revoked.clear()
 
+    def test_start_compact(self):
+        try:
+            c = Mock()
+            c.app.conf.CELERYD_MINGLE_LIMIT = 0
+            mingle = Mingle(c)
+            A = worker_state.pack_revoked(['Aig-1', 'Aig-2'])
+            I = c.app.control.inspect.return_value = Mock()
+            I.hello.return_value = {
+                'A@example.com': {'clock': 312, 'digest': 'a', 'zrevoked': A},
+                'B@example.com': {'clock': 29, 'digest': 'a', 'zrevoked': A},
+                'C@example.com': {'clock': 30, 'digest': 'c'},
+            }
+            with patch('celery.worker.consumer.unpack_revoked') as unpack:
+                unpack.side_effect = worker_state.unpack_revoked
+                mingle.start(c)
+                unpack.assert_called_once_with(A)
+            c.app.control.inspect.assert_called_with(
+                timeout=c.app.conf.CELERYD_MINGLE_TIMEOUT,
+                connection=c.connection, limit=None,
+            )
+            self.assertEqual(c.app.clock.adjust.call_count, 3)
+            self.assertIn('Aig-1', worker_state.revoked)
+            self.assertIn('Aig-2', worker_state.revoked)
+        finally:
+            worker_state.revoked.clear()
+
 
 class test_Gossip(AppCase):
 
@@ -335,12 +390,95 @@ class test_Gossip(AppCase):
             g.on_elect(event)
             self.assertTrue(error.called)
 
-    def Consumer(self, hostname='foo@x.com', pid=4312):
+    def Consumer(self, hostname='foo@x.com', pid=4312, peers=0):
         c = Mock()
         c.hostname = hostname
         c.pid = pid
+        c.app.conf.CELERYD_GOSSIP_PEERS = peers
         return c
 
+    def Peers(self, hostname='foo@x.com', peers=1, members=()):
+        c = self.Consumer(hostname, peers=peers)
+        g = Gossip(c)
+        g.state = self.app.events.State()
+        g.dispatcher = Mock()
+        g._queue = Mock()
+        g.members = set(members)
+        g.update_peers()
+        return g
+
+    def test_peers_ring(self):
+        hosts = ['{0}@x.com'.format(i) for i in range(6)]
+        for peers in 1, 2:
+            watched = []
+            for host in hosts:
+                g = self.Peers(host, peers, set(hosts) - set([host]))
+                self.assertEqual(len(g.monitored), peers)
+                self.assertNotIn(host, g.monitored)
+                watched.extend(g.monitored)
+            for host in hosts:
+                self.assertEqual(watched.count(host), peers)
+
+    def test_peers_bind(self):
+        g = self.Peers(members=['bar@x.com'])
+        self.assertEqual(g.monitored, set(['bar@x.com']))
+        g._queue.bind_to.assert_called_with(
+            g._queue.exchange, 'worker.heartbeat.bar@x.com',
+        )
+        self.assertTrue(g.state.workers['bar@x.com'].alive)
+        g.remove_member('bar@x.com')
+        self.assertFalse(g.monitored)
+        g._queue.unbind_from.assert_called_with(
+            g._queue.exchange, 'worker.heartbeat.bar@x.com',
+        )
+        self.assertEqual(g.alive_count(), 0)
+
+    def test_peers_start(self):
+        c = self.Consumer(peers=1)
+        c.app.control.inspect.return_value.ping.return_value = {
+            'foo@x.com': 'pong', 'bar@x.com': 'pong',
+        }
+        g = Gossip(c)
+        g.state = self.app.events.State()
+        g.start(c)
+        self.assertEqual(g.members, set(['bar@x.com']))
+        self.assertEqual(g.monitored, set(['bar@x.com']))
+        self.assertTrue(g.event_handlers['worker.lost'])
+
+    def test_peers_on_message_skips_unwatched(self):
+        g = self.Peers(members=['bar@x.com', 'baz@x.com', 'qux@x.com'])
+        hostname = sorted(g.members - g.monitored)[0]
+        prepare = Mock()
+        message = Mock()
+        message.headers = {}
+        message.payload = {'hostname': hostname}
+        message.delivery_info = {
+            'routing_key': 'worker.heartbeat.' + hostname,
+        }
+        g.on_message(prepare, message)
+        self.assertFalse(prepare.called)
+
+    def test_peers_on_lost(self):
+        g = self.Peers(members=['bar@x.com'])
+        with patch('celery.worker.consumer.warn') as warn:
+            g.on_lost({'hostname': 'baz@x.com', 'lost': 'bar@x.com'})
+            warn.assert_called_with('%s went missing!', 'bar@x.com')
+            self.assertFalse(g.members)
+            warn.reset_mock()
+            g.on_lost({'hostname': 'baz@x.com', 'lost': 'bar@x.com'})
+            self.assertFalse(warn.called)
+
+    def test_peers_periodic(self):
+        g = self.Peers(members=['bar@x.com'])
+        g.state.get_or_create_worker('baz@x.com')
+        g.state.workers['bar@x.com'].heartbeats[:] = [1.0]
+        with patch('celery.worker.consumer.warn') as warn:
+            g.periodic()
+            warn.assert_called_once_with('%s went missing!', 'bar@x.com')
+        g.dispatcher.send.assert_called_with('worker-lost', lost='bar@x.com')
+        self.assertNotIn('bar@x.com', g.members)
+        self.assertIn('baz@x.com', g.state.workers)
+
     def setup_election(self, g, c):
         g.start(c)
         g.clock = self.app.clock
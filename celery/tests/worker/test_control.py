@@ -169,6 +169,16 @@ class test_ControlPanel(AppCase):
             x = panel.handle('hello')
             self.assertIn('revoked1', x['revoked'])
             self.assertEqual(x['clock'], 314)  # incremented
+
+            x = panel.handle('hello', {'digest': 'x'})
+            self.assertEqual(
+                x['digest'], worker_state.revoked_digest(['revoked1']),
+            )
+            self.assertEqual(
+                worker_state.unpack_revoked(x['zrevoked']), ['revoked1'],
+            )
+            x = panel.handle('hello', {'digest': x['digest']})
+            self.assertNotIn('zrevoked', x)
         finally:
             worker_state.revoked.discard('revoked1')
 
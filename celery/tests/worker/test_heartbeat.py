@@ -1,5 +1,8 @@
 from __future__ import absolute_import
 
+from mock import Mock, patch
+
+from celery.worker import state
 from celery.worker.heartbeat import Heart
 from celery.tests.case import Case
 
@@ -10,12 +13,14 @@ class MockDispatcher(object):
 
     def __init__(self):
         self.sent = []
+        self.fields = []
         self.on_enabled = set()
         self.on_disabled = set()
         self.enabled = True
 
     def send(self, msg, **_fields):
         self.sent.append(msg)
+        self.fields.append(_fields)
         if self.heart:
             if self.next_iter > 10:
                 self.heart._shutdown.set()
@@ -71,3 +76,58 @@ class test_Heart(Case):
         eventer.enabled = False
         h = Heart(timer, eventer)
         h.stop()
+
+    @patch('celery.worker.heartbeat.load_average')
+    def test_delta(self, load_average):
+        load_average.return_value = (0.1, 0.1, 0.1)
+        eventer = MockDispatcher()
+        consumer = Mock()
+        consumer.pool.num_processes = 4
+        consumer.qos.value = 8
+        h = Heart(MockTimer(), eventer, consumer=consumer, full_every=3)
+        h.start()
+        online = eventer.fields[-1]
+        self.assertEqual(online['pool_size'], 4)
+        self.assertEqual(online['prefetch'], 8)
+        self.assertEqual(online['active'], 0)
+        self.assertIn('sw_ident', online)
+        self.assertNotIn('delta', online)
+
+        h._send('worker-heartbeat')
+        self.assertEqual(eventer.fields[-1], {'freq': 2.0, 'delta': True})
+
+        request = Mock()
+        state.active_requests.add(request)
+        try:
+            h._send('worker-heartbeat')
+            self.assertEqual(eventer.fields[-1],
+                             {'freq': 2.0, 'delta': True, 'active': 1})
+            h._send('worker-heartbeat')
+            full = eventer.fields[-1]
+            self.assertNotIn('delta', full)
+            self.assertEqual(full['active'], 1)
+            self.assertEqual(full['reserved'], len(state.reserved_requests))
+        finally:
+            state.active_requests.discard(request)
+
+    def test_queue_rates(self):
+        prev = dict(state.queue_count)
+        state.queue_count.clear()
+        try:
+            with patch('celery.worker.heartbeat.time') as time:
+                time.return_value = 100.0
+                h = Heart(MockTimer(), MockDispatcher())
+                state.queue_count['celery'] += 10
+                time.return_value = 102.0
+                self.assertEqual(h._queue_rates(), {'celery': 5.0})
+                time.return_value = 104.0
+                self.assertEqual(h._queue_rates(), {'celery': 0.0})
+        finally:
+            state.queue_count.clear()
+            state.queue_count.update(prev)
+
+    def test_utilization_without_consumer(self):
+        h = Heart(MockTimer(), MockDispatcher())
+        fields = h.utilization()
+        self.assertIsNone(fields['pool_size'])
+        self.assertIsNone(fields['prefetch'])
@@ -234,6 +234,7 @@ class test_trace_task(AppCase):
 
 
 class MockEventDispatcher(object):
+    sampled = False
 
     def __init__(self):
         self.sent = []
@@ -257,7 +258,7 @@ class test_Request(AppCase):
         return Request(
             body_from_sig(self.app, sig),
             on_ack=Mock(),
-            eventer=Mock(),
+            eventer=Mock(sampled=False),
             app=self.app,
             connection_errors=(socket.error, ),
             task=sig.type,
@@ -383,6 +384,30 @@ class test_Request(AppCase):
         tw.send_event('task-frobulated')
         self.assertIn('task-frobulated', tw.eventer.sent)
 
+    def test_send_event_sampled(self):
+        tw = TaskRequest(mytask.name, uuid(), [1], {'f': 'x'}, app=self.app)
+        tw.eventer = Mock(sampled=True)
+        tw.eventer.sample.return_value = 0
+        tw.send_event('task-started')
+        tw.eventer.sample.assert_called_with('task-started', tw.name, tw.id)
+        self.assertFalse(tw.eventer.send.called)
+
+        tw.eventer.sample.return_value = 4.0
+        tw.send_event('task-started')
+        tw.eventer.send.assert_called_with(
+            'task-started', uuid=tw.id, weight=4.0,
+        )
+
+    def test_on_success_event_not_sampled(self):
+        tw = TaskRequest(mytask.name, uuid(), [1], {'f': 'x'}, app=self.app)
+        tw.eventer = Mock(sampled=True)
+        tw.eventer.sample.return_value = 0
+        with patch('celery.worker.job._does_info', False):
+            with patch('celery.worker.job.safe_repr') as safe_repr:
+                tw.on_success(42)
+                self.assertFalse(safe_repr.called)
+        self.assertFalse(tw.eventer.send.called)
+
     def test_on_retry(self):
         tw = TaskRequest(mytask.name, uuid(), [1], {'f': 'x'}, app=self.app)
         tw.eventer = MockEventDispatcher()
@@ -26,6 +26,7 @@ class StateResetCase(Case):
         state.active_requests.clear()
         state.revoked.clear()
         state.total_count.clear()
+        state.queue_count.clear()
 
     def on_setup(self):
         pass
@@ -139,10 +140,38 @@ class test_Persistent(StateResetCase):
             self.assertIn(item, saved)
 
 
+class test_pack_revoked(Case):
+
+    def test_pack_unpack(self):
+        ids = ['b', 'a', 'c']
+        self.assertEqual(
+            state.unpack_revoked(state.pack_revoked(ids)), ['a', 'b', 'c'],
+        )
+        self.assertEqual(state.unpack_revoked(state.pack_revoked([])), [])
+
+    def test_digest(self):
+        self.assertEqual(state.revoked_digest(['a', 'b']),
+                         state.revoked_digest(['b', 'a']))
+        self.assertNotEqual(state.revoked_digest(['a']),
+                            state.revoked_digest(['a', 'b']))
+
+    def test_digest_limitedset(self):
+        x = LimitedSet(maxlen=10)
+        x.update(['a', 'b', 'c'])
+        x.add('a')
+        x.discard('c')
+        y = LimitedSet(maxlen=10)
+        y.update(['b', 'a'])
+        self.assertEqual(state.revoked_digest(x), state.revoked_digest(y))
+        self.assertEqual(state.unpack_revoked(state.pack_revoked(x)),
+                         ['a', 'b'])
+
+
 class SimpleReq(object):
 
-    def __init__(self, name):
+    def __init__(self, name, queue='celery'):
         self.name = name
+        self.delivery_info = {'routing_key': queue}
 
 
 class test_state(StateResetCase):
@@ -150,7 +179,7 @@ class test_state(StateResetCase):
     def test_accepted(self, requests=[SimpleReq('foo'),
                                       SimpleReq('bar'),
                                       SimpleReq('baz'),
-                                      SimpleReq('baz')]):
+                                      SimpleReq('baz', queue='images')]):
         for request in requests:
             state.task_accepted(request)
         for req in requests:
@@ -158,6 +187,8 @@ class test_state(StateResetCase):
         self.assertEqual(state.total_count['foo'], 1)
         self.assertEqual(state.total_count['bar'], 1)
         self.assertEqual(state.total_count['baz'], 2)
+        self.assertEqual(state.queue_count['celery'], 3)
+        self.assertEqual(state.queue_count['images'], 1)
 
     def test_ready(self, requests=[SimpleReq('foo'),
                                    SimpleReq('bar')]):
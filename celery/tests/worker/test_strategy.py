@@ -97,6 +97,13 @@ class test_default_strategy(AppCase):
             C.consumer.on_task.assert_called_with(req)
             self.assertTrue(C.event_sent())
 
+    def test_event_not_sampled(self):
+        with self._context(self.add.s(2, 2)) as C:
+            C.consumer.event_dispatcher.sample.return_value = 0
+            C()
+            self.assertTrue(C.was_reserved())
+            self.assertFalse(C.event_sent())
+
     def test_when_events_disabled(self):
         with self._context(self.add.s(2, 2), events=False) as C:
             C()
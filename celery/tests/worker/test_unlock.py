@@ -0,0 +1,185 @@
+from __future__ import absolute_import
+
+from mock import Mock, patch
+
+from celery import states
+from celery.result import AsyncResult
+from celery.worker.unlock import ChordUnlocker, default
+
+from celery.tests.case import AppCase, patch_settings
+
+
+class test_ChordUnlocker(AppCase):
+
+    def setup(self):
+
+        @self.app.task()
+        def callback(results):
+            pass
+        self.callback = callback
+        self.consumer = Mock()
+        self.unlocker = ChordUnlocker(self.app, self.consumer)
+        self.backend = self.app.backend
+        self.backend.get_many_meta = Mock()
+        self.backend.on_chord_ready = Mock()
+
+    def teardown(self):
+        for attr in 'get_many_meta', 'on_chord_ready':
+            self.backend.__dict__.pop(attr, None)
+
+    def Request(self, group_id='gid', ids=('a', 'b'), **kwargs):
+        request = Mock()
+        request.args = [group_id, self.callback.s()]
+        request.kwargs = dict(
+            kwargs, result=[AsyncResult(id).serializable() for id in ids],
+        )
+        request.task.default_retry_delay = 1
+        return request
+
+    def ready(self, *ids, **kwargs):
+        status = kwargs.get('status', states.SUCCESS)
+        metas = dict((id, {'status': states.PENDING}) for id in ids)
+        metas.update((id, {'status': status}) for id in kwargs['ready'])
+        self.backend.get_many_meta.return_value = metas
+
+    def test_add(self):
+        chord = self.unlocker.add(self.Request())
+        self.assertIn('gid', self.unlocker.pending)
+        self.assertEqual(chord.remaining, set(['a', 'b']))
+        self.consumer.qos.increment_eventually.assert_called_with()
+        self.assertTrue(self.consumer.timer.apply_interval.called)
+        self.assertEqual(len(self.unlocker), 1)
+
+    def test_add_duplicate(self):
+        self.unlocker.add(self.Request())
+        dup = self.Request()
+        self.assertIsNone(self.unlocker.add(dup))
+        dup.acknowledge.assert_called_with()
+        self.assertEqual(
+            self.consumer.qos.increment_eventually.call_count, 1,
+        )
+
+    def test_check_not_ready_backs_off(self):
+        chord = self.unlocker.add(self.Request())
+        self.ready('a', 'b', ready=[])
+        self.unlocker.check([chord])
+        self.assertEqual(chord.interval, 2.0)
+        self.unlocker.check([chord])
+        self.assertEqual(chord.interval, 4.0)
+        self.assertFalse(self.backend.on_chord_ready.called)
+
+    def test_check_progress_resets_interval(self):
+        chord = self.unlocker.add(self.Request(ids=('a', 'b', 'c')))
+        chord.interval = 16.0
+        self.ready('a', 'b', 'c', ready=['a'])
+        self.unlocker.check([chord])
+        self.assertEqual(chord.interval, 1)
+        self.assertEqual(chord.remaining, set(['b', 'c']))
+
+    def test_check_ready(self):
+        request = self.Request()
+        chord = self.unlocker.add(request)
+        self.ready('a', 'b', ready=['a', 'b'], status=states.FAILURE)
+        self.unlocker.check([chord])
+        self.assertTrue(self.backend.on_chord_ready.called)
+        request.acknowledge.assert_called_with()
+        self.consumer.qos.decrement_eventually.assert_called_with()
+        self.assertNotIn('gid', self.unlocker.pending)
+
+    def test_check_batches_queries(self):
+        self.unlocker.batch_size = 2
+        chords = [self.unlocker.add(self.Request(str(i), ids=(str(i), )))
+                  for i in range(3)]
+        self.ready('0', '1', '2', ready=[])
+        self.unlocker.check(chords)
+        self.assertEqual(self.backend.get_many_meta.call_count, 2)
+
+    def test_check_backend_error(self):
+        chord = self.unlocker.add(self.Request())
+        self.backend.get_many_meta.side_effect = KeyError()
+        self.unlocker.check([chord])
+        self.assertEqual(chord.retries, 1)
+        self.assertIn('gid', self.unlocker.pending)
+
+    def test_max_retries(self):
+        request = self.Request(max_retries=1)
+        chord = self.unlocker.add(request)
+        self.ready('a', 'b', ready=[])
+        self.unlocker.check([chord])
+        self.assertIn('gid', self.unlocker.pending)
+        self.unlocker.check([chord])
+        self.assertNotIn('gid', self.unlocker.pending)
+        request.acknowledge.assert_called_with()
+        self.assertFalse(self.backend.on_chord_ready.called)
+
+    def test_tick(self):
+        chord = self.unlocker.add(self.Request())
+        self.ready('a', 'b', ready=[])
+        with patch('celery.worker.unlock.time') as time:
+            time.return_value = chord.due - 1
+            self.unlocker.tick()
+            self.assertFalse(self.backend.get_many_meta.called)
+            time.return_value = chord.due
+            self.unlocker.tick()
+            self.assertTrue(self.backend.get_many_meta.called)
+
+    def test_tick_cancels_timer_when_empty(self):
+        chord = self.unlocker.add(self.Request())
+        tref = self.unlocker._tref
+        self.ready('a', 'b', ready=['a', 'b'])
+        with patch('celery.worker.unlock.time') as time:
+            time.return_value = chord.due
+            self.unlocker.tick()
+        tref.cancel.assert_called_with()
+        self.assertIsNone(self.unlocker._tref)
+
+    def test_clear(self):
+        chord = self.unlocker.add(self.Request())
+        tref = self.unlocker._tref
+        self.unlocker.clear()
+        tref.cancel.assert_called_with()
+        self.assertIsNone(self.unlocker._tref)
+        self.assertFalse(self.unlocker.pending)
+        self.assertFalse(self.unlocker._heap)
+
+        # chords being checked while cleared are not unlocked.
+        self.ready('a', 'b', ready=['a', 'b'])
+        self.unlocker.check([chord])
+        self.assertFalse(self.backend.on_chord_ready.called)
+        self.assertFalse(chord.request.acknowledge.called)
+
+
+class test_default_strategy(AppCase):
+
+    def test_disabled(self):
+        task = self.app.tasks['celery.chord_unlock']
+        with patch_settings(self.app, CELERYD_CHORD_UNLOCKER=False):
+            with patch('celery.worker.unlock.default_strategy') as strategy:
+                default(task, self.app, Mock())
+                self.assertTrue(strategy.called)
+
+    def test_enabled(self):
+        task = self.app.tasks['celery.chord_unlock']
+        with patch_settings(self.app, CELERYD_CHORD_UNLOCKER=True):
+            with patch('celery.worker.unlock.ChordUnlocker') as Unlocker:
+                with patch('celery.worker.unlock.Request') as Request:
+                    Request.return_value.revoked.return_value = False
+                    consumer = Mock(chord_unlocker=None)
+                    handler = default(task, self.app, consumer)
+                    handler(Mock(), {}, Mock())
+                    Unlocker.return_value.add.assert_called_with(
+                        Request.return_value,
+                    )
+                    self.assertIs(consumer.chord_unlocker,
+                                  Unlocker.return_value)
+
+    def test_reconnect_clears_unlocker(self):
+        task = self.app.tasks['celery.chord_unlock']
+        consumer = Mock(chord_unlocker=None)
+        with patch_settings(self.app, CELERYD_CHORD_UNLOCKER=True):
+            default(task, self.app, consumer)
+            unlocker = consumer.chord_unlocker
+            unlocker.clear = Mock()
+            default(task, self.app, consumer)
+            self.assertIs(consumer.chord_unlocker, unlocker)
+            unlocker.clear.assert_called_with()
@@ -294,6 +294,13 @@ class _regen(UserList, list):
     def data(self):
         return list(self.__it)
 
+    def consume(self):
+        """Iterate over the items without caching them
+        (unless they have already been evaluated)."""
+        if 'data' in self.__dict__:
+            return iter(self.data)
+        return iter(self.__it)
+
 
 def dictfilter(d=None, **kw):
     """Removes keys which value is :const:`None`"""
@@ -20,21 +20,22 @@ from collections import defaultdict
 from functools import partial
 from heapq import heappush
 from operator import itemgetter
-from time import sleep
+from time import sleep, time
+from zlib import crc32
 
 from billiard.common import restart_state
 from billiard.exceptions import RestartFreqExceeded
 from kombu.common import QoS, ignore_errors
 from kombu.syn import _detect_environment
 from kombu.utils.compat import get_errno
-from kombu.utils.encoding import safe_repr, bytes_t
+from kombu.utils.encoding import safe_repr, str_to_bytes, bytes_t
 from kombu.utils.limits import TokenBucket
 
 from celery import bootsteps
 from celery.app.trace import build_tracer
 from celery.canvas import subtask
 from celery.exceptions import InvalidTaskError
-from celery.five import items, values
+from celery.five import items, range, values
 from celery.utils.functional import noop
 from celery.utils.log import get_logger
 from celery.utils.text import truncate
@@ -42,7 +43,10 @@ from celery.utils.timer2 import default_timer
 from celery.utils.timeutils import humanize_seconds, rate
 
 from . import heartbeat, loops, pidbox
-from .state import task_reserved, maybe_shutdown, revoked, reserved_requests
+from .state import (
+    task_reserved, maybe_shutdown, revoked, reserved_requests,
+    revoked_digest, unpack_revoked,
+)
 
 try:
     buffer_t = buffer
@@ -109,8 +113,6 @@ MESSAGE_REPORT = """\
 body: {0} {{content_type:{1} content_encoding:{2} delivery_info:{3}}}\
 """
 
-MINGLE_GET_FIELDS = itemgetter('clock', 'revoked')
-
 
 def dump_body(m, body):
     if isinstance(body, buffer_t):
@@ -136,6 +138,10 @@ class Consumer(object):
     #: as sending heartbeats.
     timer = None
 
+    #: The :class:`~celery.worker.unlock.ChordUnlocker` instance,
+    #: if enabled by :setting:`CELERYD_CHORD_UNLOCKER`.
+    chord_unlocker = None
+
     restart_count = -1  # first start is the same as a restart
 
     class Blueprint(bootsteps.Blueprint):
@@ -439,6 +445,7 @@ class Events(bootsteps.StartStopStep):
     def __init__(self, c, send_events=None, **kwargs):
         self.send_events = True
         self.groups = None if send_events else ['worker']
+        self._tref = None
         c.event_dispatcher = None
 
     def start(self, c):
@@ -451,8 +458,16 @@ class Events(bootsteps.StartStopStep):
         if prev:
             dis.extend_buffer(prev)
             dis.flush()
+        if dis.batch_size:
+            # make sure batches are sent even if no new events arrive.
+            self._tref = c.timer.apply_interval(
+                dis.batch_interval * 1000.0, dis.flush_batches,
+            )
 
     def stop(self, c):
+        if self._tref:
+            self._tref.cancel()
+            self._tref = None
         if c.event_dispatcher:
             ignore_errors(c, c.event_dispatcher.close)
             c.event_dispatcher = None
@@ -467,7 +482,10 @@ class Heart(bootsteps.StartStopStep):
         c.heart = None
 
     def start(self, c):
-        c.heart = heartbeat.Heart(c.timer, c.event_dispatcher)
+        c.heart = heartbeat.Heart(
+            c.timer, c.event_dispatcher, consumer=c,
+            full_every=c.app.conf.CELERYD_HEARTBEAT_FULL_EVERY,
+        )
         c.heart.start()
 
     def stop(self, c):
@@ -538,21 +556,43 @@ class Mingle(bootsteps.StartStopStep):
 
     def start(self, c):
         info('mingle: searching for neighbors')
-        I = c.app.control.inspect(timeout=1.0, connection=c.connection)
-        replies = I.hello()
+        conf = c.app.conf
+        I = c.app.control.inspect(
+            timeout=conf.CELERYD_MINGLE_TIMEOUT, connection=c.connection,
+            limit=conf.CELERYD_MINGLE_LIMIT or None,
+        )
+        replies = I.hello(digest=revoked_digest(revoked))
         if replies:
+            seen = set()
             for reply in values(replies):
                 try:
-                    other_clock, other_revoked = MINGLE_GET_FIELDS(reply)
+                    other_clock = reply['clock']
                 except KeyError:  # reply from pre-3.1 worker
-                    pass
-                else:
-                    c.app.clock.adjust(other_clock)
-                    revoked.update(other_revoked)
+                    continue
+                c.app.clock.adjust(other_clock)
+                self.sync_revoked(reply, seen)
             info('mingle: synced with %s', ', '.join(replies))
         else:
             info('mingle: no one here')
 
+    def sync_revoked(self, reply, seen):
+        digest = reply.get('digest')
+        if digest is None:  # worker not supporting the compact form
+            revoked.update(reply.get('revoked') or ())
+        elif digest not in seen and 'zrevoked' in reply:
+            # workers usually have the same revoked tasks,
+            # so each distinct set is only merged once.
+            seen.add(digest)
+            revoked.update(unpack_revoked(reply['zrevoked']))
+
+
+def _ring_key(hostname):
+    return crc32(str_to_bytes(hostname)) & 0xffffffff, hostname
+
+
+def _heartbeat_key(hostname):
+    return 'worker.heartbeat.' + hostname
+
 
 class Gossip(bootsteps.ConsumerStep):
     label = 'Gossip'
@@ -561,6 +601,15 @@ class Gossip(bootsteps.ConsumerStep):
         'id', 'clock', 'hostname', 'pid', 'topic', 'action', 'cver',
     )
 
+    #: Routing keys of the events consumed from all workers
+    #: when only the heartbeats of peers are consumed.
+    #: ``worker.heartbeat`` receives the heartbeats of workers
+    #: that don't have peer mode enabled.
+    membership_keys = (
+        'worker.online', 'worker.offline', 'worker.lost',
+        'worker.elect', 'worker.elect.ack', 'worker.heartbeat',
+    )
+
     def __init__(self, c, enable_gossip=True, interval=5.0, **kwargs):
         self.enabled = enable_gossip
         self.app = c.app
@@ -582,6 +631,14 @@ class Gossip(bootsteps.ConsumerStep):
         }
         self.clock = c.app.clock
 
+        # number of peers to watch, zero means all workers.
+        self.peers = c.app.conf.CELERYD_GOSSIP_PEERS
+        self.members = set()
+        self.monitored = set()
+        self._queue = None
+        if self.peers:
+            self.event_handlers['worker.lost'] = self.on_lost
+
         self.election_handlers = {
             'task': self.call_task
         }
@@ -613,19 +670,29 @@ class Gossip(bootsteps.ConsumerStep):
         self.dispatcher.send('worker-elect-ack', id=id_)
 
     def start(self, c):
+        if self.peers:
+            self._queue = None
+            self.discover(c)
         super(Gossip, self).start(c)
         self.dispatcher = c.event_dispatcher
 
+    def discover(self, c):
+        # heartbeats are not received from all workers,
+        # so we have to ask who is out there.
+        replies = c.app.control.inspect(
+            timeout=1.0, connection=c.connection).ping() or {}
+        for hostname in replies:
+            self.add_member(hostname)
+
     def on_elect_ack(self, event):
         id = event['id']
         try:
             replies = self.consensus_replies[id]
         except KeyError:
             return  # not for us
-        alive_workers = self.state.alive_workers()
         replies.append(event['hostname'])
 
-        if len(replies) >= len(alive_workers):
+        if len(replies) >= self.alive_count():
             _, leader, topic, action = self.clock.sort_heap(
                 self.consensus_requests[id],
             )
@@ -651,6 +718,56 @@ class Gossip(bootsteps.ConsumerStep):
     def on_node_lost(self, worker):
         warn('%s went missing!', worker.hostname)
 
+    def alive_count(self):
+        if self.peers:
+            return len(self.members)
+        return len(self.state.alive_workers())
+
+    def add_member(self, hostname):
+        if hostname != self.hostname and hostname not in self.members:
+            self.members.add(hostname)
+            self.update_peers()
+
+    def remove_member(self, hostname):
+        if hostname in self.members:
+            self.members.discard(hostname)
+            self.update_peers()
+
+    def update_peers(self):
+        """Select the workers to watch: the workers following this
+        worker on a hash ring of all known workers, so that every worker
+        is watched by the same number of peers."""
+        ring = sorted(self.members | set([self.hostname]), key=_ring_key)
+        i = ring.index(self.hostname)
+        peers = set(ring[(i + j) % len(ring)]
+                    for j in range(1, min(self.peers, len(ring) - 1) + 1))
+        if self._queue is not None:
+            for hostname in peers - self.monitored:
+                self._bind(_heartbeat_key(hostname))
+                # the worker is alive until proven otherwise.
+                worker, _ = self.state.get_or_create_worker(hostname)
+                now = time()
+                worker.update_heartbeat(now, now)
+            for hostname in self.monitored - peers:
+                self._unbind(_heartbeat_key(hostname))
+            self.monitored = peers
+
+    def _bind(self, routing_key):
+        self._queue.bind_to(self._queue.exchange, routing_key)
+
+    def _unbind(self, routing_key):
+        self._queue.unbind_from(self._queue.exchange, routing_key)
+
+    def on_lost(self, event):
+        hostname = event.get('lost')
+        if hostname in self.members:
+            worker, _ = self.state.get_or_create_worker(hostname)
+            try:
+                self.on_node_lost(worker)
+            finally:
+                self.state.workers.pop(hostname, None)
+                self.remove_member(hostname)
+
     def register_timer(self):
         if self._tref is not None:
             self._tref.cancel()
@@ -662,21 +779,34 @@ class Gossip(bootsteps.ConsumerStep):
         workers = self.state.workers
         dirty = set()
         for worker in values(workers):
+            if self.peers and worker.hostname not in self.monitored:
+                continue  # another worker is watching this one.
             if not worker.alive:
                 dirty.add(worker)
                 self.on_node_lost(worker)
         for worker in dirty:
             workers.pop(worker.hostname, None)
+            if self.peers:
+                self.dispatcher.send('worker-lost', lost=worker.hostname)
+                self.remove_member(worker.hostname)
 
     def get_consumers(self, channel):
         self.register_timer()
-        ev = self.Receiver(channel, routing_key='worker.#')
-        return [kombu.Consumer(
+        routing_key = self.membership_keys[0] if self.peers else 'worker.#'
+        ev = self.Receiver(channel, routing_key=routing_key)
+        consumer = kombu.Consumer(
             channel,
             queues=[ev.queue],
             on_message=partial(self.on_message, ev.event_from_message),
             no_ack=True
-        )]
+        )
+        if self.peers:
+            self._queue = consumer.queues[0]
+            for key in self.membership_keys[1:]:
+                self._bind(key)
+            self.monitored = set()
+            self.update_peers()
+        return [consumer]
 
     def on_message(self, prepare, message):
         _type = message.delivery_info['routing_key']
@@ -690,6 +820,11 @@ class Gossip(bootsteps.ConsumerStep):
         hostname = (message.headers.get('hostname') or
                     message.payload['hostname'])
         if hostname != self.hostname:
+            if self.peers and _type.startswith('worker.heartbeat.'):
+                self.add_member(hostname)
+                if hostname not in self.monitored:
+                    # fanout exchanges deliver the heartbeats of all workers.
+                    return
             type, event = prepare(message.payload)
             group, _, subject = type.partition('-')
             worker, created = self.update_state(subject, event)
@@ -698,7 +833,11 @@ class Gossip(bootsteps.ConsumerStep):
                     self.on_node_leave(worker)
                 finally:
                     self.state.workers.pop(worker.hostname, None)
+                    if self.peers:
+                        self.remove_member(worker.hostname)
             elif created or subject == 'online':
+                if self.peers:
+                    self.add_member(worker.hostname)
                 self.on_node_join(worker)
         else:
             self.clock.forward()
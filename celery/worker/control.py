@@ -215,9 +215,16 @@ def dump_revoked(state, **kwargs):
 
 
 @Panel.register
-def hello(state, **kwargs):
-    return {'revoked': worker_state.revoked._data,
-            'clock': state.app.clock.forward()}
+def hello(state, digest=None, **kwargs):
+    revoked = worker_state.revoked
+    if digest is None:  # sent by worker not supporting the compact form
+        return {'revoked': revoked._data,
+                'clock': state.app.clock.forward()}
+    reply = {'clock': state.app.clock.forward(),
+             'digest': worker_state.revoked_digest(revoked)}
+    if reply['digest'] != digest:
+        reply['zrevoked'] = worker_state.pack_revoked(revoked)
+    return reply
 
 
 @Panel.register
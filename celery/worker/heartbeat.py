@@ -6,13 +6,23 @@
     This is the internal thread that sends heartbeat events
     at regular intervals.
 
+    Heartbeats also report the utilization of the worker, and only the
+    fields that changed since the previous heartbeat are sent, with
+    all fields sent in every :setting:`CELERYD_HEARTBEAT_FULL_EVERY`'th
+    heartbeat.
+
 """
 from __future__ import absolute_import
 
-from celery.five import values
+from time import time
+
+from celery.five import items, values
 from celery.utils.sysinfo import load_average
 
-from .state import SOFTWARE_INFO, active_requests, total_count
+from .state import (
+    SOFTWARE_INFO, active_requests, reserved_requests,
+    queue_count, total_count,
+)
 
 
 class Heart(object):
@@ -22,25 +32,72 @@ class Heart(object):
     :param eventer: Event dispatcher used to send the event.
     :keyword interval: Time in seconds between heartbeats.
                        Default is 30 seconds.
+    :keyword consumer: The worker consumer, used to report the
+        pool size and prefetch count.
+    :keyword full_every: Send all fields in every n'th heartbeat,
+        and only the fields that changed in the heartbeats between.
+        Set to 1 to always send all fields.
 
     """
+    full_every = 10
 
-    def __init__(self, timer, eventer, interval=None):
+    def __init__(self, timer, eventer, interval=None, consumer=None,
+                 full_every=None):
         self.timer = timer
         self.eventer = eventer
         self.interval = float(interval or 2.0)
+        self.consumer = consumer
+        self.full_every = full_every or self.full_every
         self.tref = None
+        self._beats = 0
+        self._last = {}
+        self._queue_counts, self._queue_time = dict(queue_count), time()
 
         # Make event dispatcher start/stop us when enabled/disabled.
         self.eventer.on_enabled.add(self.start)
         self.eventer.on_disabled.add(self.stop)
 
+    def utilization(self):
+        """Returns the fields describing the load of the worker."""
+        consumer = self.consumer
+        pool = consumer and consumer.pool
+        qos = consumer and getattr(consumer, 'qos', None)
+        return {
+            'active': len(active_requests),
+            'processed': sum(values(total_count)),
+            'loadavg': load_average(),
+            'reserved': len(reserved_requests),
+            'pool_size': pool.num_processes if pool else None,
+            'prefetch': qos.value if qos else None,
+            'queues': self._queue_rates(),
+        }
+
+    def _queue_rates(self):
+        # tasks accepted per second from each queue since the last beat.
+        now, counts = time(), dict(queue_count)
+        prev, elapsed = self._queue_counts, now - self._queue_time
+        self._queue_counts, self._queue_time = counts, now
+        elapsed = max(elapsed, 1e-3)
+        return dict(
+            (queue, round((count - prev.get(queue, 0)) / elapsed, 2))
+            for queue, count in items(counts)
+        )
+
     def _send(self, event):
-        return self.eventer.send(event, freq=self.interval,
-                                 active=len(active_requests),
-                                 processed=sum(values(total_count)),
-                                 loadavg=load_average(),
-                                 **SOFTWARE_INFO)
+        fields = self.utilization()
+        full = event != 'worker-heartbeat' or \
+            not self._beats % self.full_every
+        self._beats += 1
+        if full:
+            self._last = fields
+            fields = dict(fields, **SOFTWARE_INFO)
+        else:
+            last = self._last
+            fields = dict((key, value) for key, value in items(fields)
+                          if last.get(key) != value)
+            last.update(fields)
+            fields['delta'] = True
+        return self.eventer.send(event, freq=self.interval, **fields)
 
     def start(self):
         if self.eventer.enabled:
@@ -299,8 +299,22 @@ class Request(object):
             return True
         return False
 
-    def send_event(self, type, **fields):
-        if self.eventer and self.eventer.enabled:
+    def event_weight(self, type):
+        """Returns the sampling weight of event `type` for this task,
+        or 0 if the event should not be sent."""
+        eventer = self.eventer
+        if eventer and eventer.enabled:
+            if eventer.sampled:
+                return eventer.sample(type, self.name, self.id)
+            return 1
+        return 0
+
+    def send_event(self, type, weight=None, **fields):
+        if weight is None:
+            weight = self.event_weight(type)
+        if weight:
+            if weight != 1:
+                fields['weight'] = weight
             self.eventer.send(type, uuid=self.id, **fields)
 
     def on_accepted(self, pid, time_accepted):
@@ -343,10 +357,11 @@ class Request(object):
         if self.task.acks_late:
             self.acknowledge()
 
-        if self.eventer and self.eventer.enabled:
+        weight = self.event_weight('task-succeeded')
+        if weight:
             now = nowfun()
             runtime = self.time_start and (now - self.time_start) or 0
-            self.send_event('task-succeeded',
+            self.send_event('task-succeeded', weight,
                             result=safe_repr(ret_value), runtime=runtime)
 
         if _does_info:
@@ -17,8 +17,12 @@ import platform
 import shelve
 import zlib
 
+from base64 import b64decode, b64encode
+from hashlib import sha1
+
 from kombu.serialization import pickle, pickle_protocol
 from kombu.utils import cached_property
+from kombu.utils.encoding import bytes_to_str, str_to_bytes
 
 from celery import __version__
 from celery.datastructures import LimitedSet
@@ -46,6 +50,11 @@ active_requests = set()
 #: count of tasks accepted by the worker, sorted by type.
 total_count = Counter()
 
+#: count of tasks accepted by the worker, sorted by the routing key
+#: of the message (which is the name of the queue unless
+#: custom routing is used).
+queue_count = Counter()
+
 #: the list of currently revoked tasks.  Persistent if statedb set.
 revoked = LimitedSet(maxlen=REVOKES_MAX, expires=REVOKE_EXPIRES)
 
@@ -67,6 +76,7 @@ def task_accepted(request):
     """Updates global state when a task has been accepted."""
     active_requests.add(request)
     total_count[request.name] += 1
+    queue_count[request.delivery_info.get('routing_key')] += 1
 
 
 def task_ready(request):
@@ -132,6 +142,32 @@ if C_BENCH:  # pragma: no cover
         return __ready(request)
 
 
+def _revoked_data(ids):
+    if isinstance(ids, LimitedSet):
+        # iterating over a LimitedSet walks the heap, which can still
+        # contain discarded and duplicate ids.
+        ids = ids.as_dict()
+    return str_to_bytes('\n'.join(sorted(ids)))
+
+
+def revoked_digest(ids):
+    """Returns a digest of a set of revoked task ids, used to find
+    out if two workers have the same revoked tasks without
+    transferring the ids."""
+    return sha1(_revoked_data(ids)).hexdigest()
+
+
+def pack_revoked(ids):
+    """Compact, json serializable form of a set of revoked task ids."""
+    return bytes_to_str(b64encode(zlib.compress(_revoked_data(ids))))
+
+
+def unpack_revoked(data):
+    """Reverse of :func:`pack_revoked`."""
+    data = bytes_to_str(zlib.decompress(b64decode(str_to_bytes(data))))
+    return data.split('\n') if data else []
+
+
 class Persistent(object):
     """This is the persistent data stored by the worker when
     :option:`--statedb` is enabled.
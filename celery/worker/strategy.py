@@ -32,6 +32,7 @@ def default(task, app, consumer,
     _does_info = logger.isEnabledFor(logging.INFO)
     events = eventer and eventer.enabled
     send_event = eventer.send
+    sample = events and eventer.sampled and eventer.sample
     timer_apply_at = consumer.timer.apply_at
     apply_eta_task = consumer.apply_eta_task
     rate_limits_enabled = not consumer.disable_rate_limits
@@ -51,14 +52,17 @@ def default(task, app, consumer,
             info('Got task from broker: %s', req)
 
         if events:
-            send_event(
-                'task-received',
-                uuid=req.id, name=req.name,
-                args=safe_repr(req.args), kwargs=safe_repr(req.kwargs),
-                retries=req.request_dict.get('retries', 0),
-                eta=req.eta and req.eta.isoformat(),
-                expires=req.expires and req.expires.isoformat(),
-            )
+            weight = sample('task-received', req.name, req.id) \
+                if sample else 1
+            if weight:
+                send_event(
+                    'task-received', weight=weight,
+                    uuid=req.id, name=req.name,
+                    args=safe_repr(req.args), kwargs=safe_repr(req.kwargs),
+                    retries=req.request_dict.get('retries', 0),
+                    eta=req.eta and req.eta.isoformat(),
+                    expires=req.expires and req.expires.isoformat(),
+                )
 
         if req.eta:
             try:
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+    celery.worker.unlock
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Event-driven chord unlocking for result backends
+    without native chord support.
+
+    The ``celery.chord_unlock`` task re-publishes itself every second
+    for every pending chord, so a thousand concurrent chords means a
+    thousand broker messages and backend scans every second.
+
+    When the :setting:`CELERYD_CHORD_UNLOCKER` setting is enabled
+    the worker will instead keep the unlock requests it receives in a
+    single index, checking the due chords using batched backend queries
+    and backing off for chords that do not make progress.
+
+    The unlock message is not acknowledged until the chord
+    callback has been applied, so it will be redelivered to another
+    worker if this worker is lost.
+
+"""
+from __future__ import absolute_import
+
+import heapq
+import threading
+
+from time import time
+
+from celery import states
+from celery.canvas import subtask
+from celery.five import range
+from celery.result import from_serializable
+from celery.utils.log import get_logger
+
+from .job import Request
+from .strategy import default as default_strategy
+
+__all__ = ['PendingChord', 'ChordUnlocker', 'default']
+
+logger = get_logger(__name__)
+debug, error = logger.debug, logger.error
+
+READY_STATES = states.READY_STATES
+
+
+class PendingChord(object):
+    """A chord waiting for its header to complete."""
+    __slots__ = ('request', 'group_id', 'callback', 'result', 'remaining',
+                 'propagate', 'base_interval', 'interval', 'max_retries',
+                 'retries', 'due')
+
+    def __init__(self, request, group_id, callback, result,
+                 propagate=True, interval=1.0, max_retries=None):
+        self.request = request
+        self.group_id = group_id
+        self.callback = callback
+        self.result = result
+        self.remaining = set(r.id for r in result)
+        self.propagate = propagate
+        self.base_interval = self.interval = interval
+        self.max_retries = max_retries
+        self.retries = 0
+        self.due = None
+
+    def __repr__(self):
+        return '<PendingChord: {0} ({1}/{2} remaining)>'.format(
+            self.group_id, len(self.remaining), len(self.result),
+        )
+
+
+class ChordUnlocker(object):
+    """Keeps an index of pending chords, and applies the chord
+    callback when all of the header tasks are ready.
+
+    :param app: The app instance.
+    :param consumer: The consumer instance the unlock requests
+        are received by, used to access the timer and prefetch count.
+
+    """
+
+    #: How often (in seconds) the index is checked for due chords.
+    tick_interval = 1.0
+
+    #: Maximum number of seconds between checks for a chord
+    #: that is not making any progress.
+    max_interval = 30.0
+
+    #: The interval of a chord not making progress is multiplied
+    #: by this number every time it's checked.
+    backoff = 2.0
+
+    #: Maximum number of task ids to fetch in a single backend query.
+    batch_size = 1000
+
+    def __init__(self, app, consumer, tick_interval=None, max_interval=None,
+                 backoff=None, batch_size=None):
+        self.app = app
+        self.consumer = consumer
+        self.tick_interval = tick_interval or self.tick_interval
+        self.max_interval = max_interval or self.max_interval
+        self.backoff = backoff or self.backoff
+        self.batch_size = batch_size or self.batch_size
+        self.default_propagate = app.conf.CELERY_CHORD_PROPAGATES
+        self.pending = {}
+        self._heap = []
+        self._tref = None
+        self._mutex = threading.Lock()
+
+    def add(self, request):
+        """Start tracking the chord described by a
+        ``celery.chord_unlock`` request."""
+        group_id, callback = request.args[:2]
+        kwargs = request.kwargs
+        propagate = kwargs.get('propagate')
+        chord = PendingChord(
+            request, group_id, callback,
+            [from_serializable(r, self.app)
+             for r in kwargs.get('result') or ()],
+            propagate=(self.default_propagate if propagate is None
+                       else propagate),
+            interval=(kwargs.get('interval') or
+                      request.task.default_retry_delay),
+            max_retries=kwargs.get('max_retries'),
+        )
+        with self._mutex:
+            if group_id in self.pending:
+                # redelivered, or published more than once.
+                debug('Chord %s already pending: discarding duplicate',
+                      group_id)
+                request.acknowledge()
+                return
+            self.pending[group_id] = chord
+            self._schedule(chord, chord.interval)
+            if self._tref is None:
+                self._tref = self.consumer.timer.apply_interval(
+                    self.tick_interval * 1000.0, self.tick,
+                )
+        self.consumer.qos.increment_eventually()
+        return chord
+
+    def _schedule(self, chord, interval):
+        chord.due = time() + interval
+        heapq.heappush(self._heap, (chord.due, chord.group_id))
+
+    def tick(self):
+        """Check all of the chords that are due."""
+        now, due = time(), []
+        with self._mutex:
+            heap, pending = self._heap, self.pending
+            while heap and heap[0][0] <= now:
+                when, group_id = heapq.heappop(heap)
+                chord = pending.get(group_id)
+                # entries are lazily removed from the heap,
+                # so make sure this is the current one.
+                if chord is not None and chord.due == when:
+                    due.append(chord)
+        if due:
+            self.check(due)
+        with self._mutex:
+            if not self.pending and self._tref is not None:
+                self._tref.cancel()
+                self._tref = None
+
+    def check(self, chords):
+        """Check a list of pending chords using batched queries,
+        unlocking the chords that are ready."""
+        try:
+            metas = self.get_many_meta(
+                set(tid for chord in chords for tid in chord.remaining),
+            )
+        except Exception as exc:
+            error('Chord unlock: cannot get task states: %r', exc,
+                  exc_info=True)
+            for chord in chords:
+                self.retry(chord)
+            return
+        for chord in chords:
+            if self.pending.get(chord.group_id) is not chord:
+                continue  # cleared while the states were fetched.
+            ready = set(tid for tid in chord.remaining
+                        if metas[tid]['status'] in READY_STATES)
+            chord.remaining.difference_update(ready)
+            if chord.remaining:
+                self.retry(chord, progress=bool(ready))
+            else:
+                self.unlock(chord)
+
+    def get_many_meta(self, task_ids):
+        backend, task_ids, metas = self.app.backend, list(task_ids), {}
+        for i in range(0, len(task_ids), self.batch_size):
+            metas.update(backend.get_many_meta(
+                task_ids[i:i + self.batch_size],
+            ))
+        return metas
+
+    def retry(self, chord, progress=False):
+        chord.retries += 1
+        if chord.max_retries is not None and \
+                chord.retries > chord.max_retries:
+            error('Chord %s: max retries exceeded (%s): giving up',
+                  chord.group_id, chord.max_retries)
+            return self.release(chord)
+        if progress:
+            # start from the original interval again.
+            chord.interval = chord.base_interval
+        else:
+            chord.interval = min(chord.interval * self.backoff,
+                                 self.max_interval)
+        with self._mutex:
+            self._schedule(chord, chord.interval)
+
+    def unlock(self, chord):
+        debug('Chord %s ready: applying callback', chord.group_id)
+        try:
+            self.app.backend.on_chord_ready(
+                self.app.GroupResult(chord.group_id, chord.result),
+                subtask(chord.callback), chord.propagate,
+            )
+        finally:
+            self.release(chord)
+
+    def release(self, chord):
+        with self._mutex:
+            self.pending.pop(chord.group_id, None)
+        chord.request.acknowledge()
+        self.consumer.qos.decrement_eventually()
+
+    def clear(self):
+        """Forget all pending chords and stop the timer.
+
+        Used when the connection is reset, as the requests that
+        were not acknowledged will be redelivered to the new channel.
+
+        """
+        with self._mutex:
+            if self._tref is not None:
+                self._tref.cancel()
+                self._tref = None
+            self.pending.clear()
+            self._heap[:] = []
+
+    def __len__(self):
+        return len(self.pending)
+
+
+def default(task, app, consumer, **kwargs):
+    """Execution strategy for the ``celery.chord_unlock`` task.
+
+    Falls back to the default strategy unless the
+    :setting:`CELERYD_CHORD_UNLOCKER` setting is enabled.
+
+    """
+    if not app.conf.CELERYD_CHORD_UNLOCKER:
+        return default_strategy(task, app, consumer, **kwargs)
+    hostname = consumer.hostname
+    eventer = consumer.event_dispatcher
+    connection_errors = consumer.connection_errors
+    Req = Request
+    # one index for every consumer, cleared when the connection
+    # is reset as messages can only be acked by the channel that
+    # received them.
+    unlocker = consumer.chord_unlocker
+    if unlocker is None:
+        unlocker = consumer.chord_unlocker = ChordUnlocker(app, consumer)
+    else:
+        unlocker.clear()
+
+    def task_message_handler(message, body, ack):
+        req = Req(body, on_ack=ack, app=app, hostname=hostname,
+                  eventer=eventer, task=task,
+                  connection_errors=connection_errors,
+                  delivery_info=message.delivery_info)
+        if req.revoked():
+            return
+        unlocker.add(req)
+
+    return task_message_handler
@@ -0,0 +1,91 @@
+"""Measures the time it takes to check if crontab schedules are due,
+like the beat scheduler does on every tick.
+
+The ``uncached`` benchmark clears the cached next time to run
+before every check, so that it shows the cost of computing it.
+
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+from datetime import timedelta
+
+from celery import Celery
+from celery.five import range
+from celery.schedules import crontab
+
+DEFAULT_ENTRIES = 10000
+DEFAULT_TICKS = 10
+
+celery = Celery(__name__, set_as_current=False)
+celery.conf.update(
+    CELERY_TIMEZONE=os.environ.get('TZ', 'UTC'),
+)
+
+SPECS = [
+    dict(),
+    dict(minute=[5, 42]),
+    dict(minute=0, hour='*/3'),
+    dict(minute='*/15', hour='8-17', day_of_week='mon-fri'),
+    dict(minute=30, hour=4, day_of_month='1,15'),
+    dict(minute=0, hour=0, day_of_month=1, month_of_year='*/3'),
+    dict(minute='1,13,30-45', hour='0,8-17/2', day_of_week='sun'),
+]
+
+
+def generate(n):
+    now = celery.now()
+    schedules = []
+    for i in range(n):
+        s = crontab(nowfun=lambda: now, **SPECS[i % len(SPECS)])
+        s.app = celery
+        schedules.append((s, now - timedelta(seconds=i % 3600)))
+    return schedules
+
+
+def check_cached(schedules):
+    for s, last_run_at in schedules:
+        s.is_due(last_run_at)
+
+
+def check_uncached(schedules):
+    for s, last_run_at in schedules:
+        s._next_run = None
+        s.is_due(last_run_at)
+
+
+BENCHMARKS = {
+    'cached': check_cached,
+    'uncached': check_uncached,
+}
+
+
+def bench(name, schedules, ticks):
+    check = BENCHMARKS[name]
+    time_start = time.time()
+    for _ in range(ticks):
+        check(schedules)
+    total = time.time() - time_start
+    print('-- {0}: {1} entries x {2} ticks in {3:.3f}s, {4:.1f}ms/tick'.format(
+        name, len(schedules), ticks, total, total / ticks * 1000))
+
+
+def main(argv=sys.argv):
+    if len(argv) < 2:
+        print('Usage: {0} [{1}|all] [entries=10k] [ticks=10]'.format(
+            os.path.basename(argv[0]), '|'.join(sorted(BENCHMARKS))))
+        return sys.exit(1)
+    n = int(argv[2]) if len(argv) > 2 else DEFAULT_ENTRIES
+    ticks = int(argv[3]) if len(argv) > 3 else DEFAULT_TICKS
+    print('timezone: {0}'.format(celery.conf.CELERY_TIMEZONE))
+    schedules = generate(n)
+    names = sorted(BENCHMARKS) if argv[1] == 'all' else [argv[1]]
+    for name in names:
+        bench(name, schedules, ticks)
+
+
+if __name__ == '__main__':
+    main()
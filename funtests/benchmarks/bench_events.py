@@ -0,0 +1,99 @@
+"""Measures the number of events per second that can be received
+and applied to :class:`celery.events.state.State`.
+
+No broker is needed: the events are generated and JSON encoded
+up front (in batches, like dispatchers with batching enabled send them),
+so only decoding and processing by the receiver is measured.
+
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+import anyjson
+
+from celery import Celery
+from celery.five import range
+
+DEFAULT_ITS = 300000
+BATCH_SIZE = 100
+
+celery = Celery(__name__, set_as_current=False)
+celery.conf.update(
+    BROKER_URL='memory://',
+    CELERY_EVENT_STATE=os.environ.get(
+        'EVENT_STATE', 'celery.events.state:State'),
+)
+
+
+def generate(n, batch_size=BATCH_SIZE):
+    events, clock, ts = [], 0, time.time()
+    for i in range(n // 3):
+        uuid, hostname = str(i), 'worker{0}'.format(i % 4)
+        for type, fields in (('received', {'name': 'tasks.add',
+                                           'args': '(2, 2)', 'kwargs': '{}',
+                                           'retries': 0, 'eta': None}),
+                             ('started', {}),
+                             ('succeeded', {'result': '4',
+                                            'runtime': 0.01})):
+            clock += 1
+            events.append(dict(fields, type='task-' + type, uuid=uuid,
+                               hostname=hostname, clock=clock,
+                               timestamp=ts + i * 0.001, utcoffset=0,
+                               pid=1))
+    return [anyjson.dumps(events[i:i + batch_size])
+            for i in range(0, len(events), batch_size)]
+
+
+def bench(name, payloads, receive):
+    state = celery.events.State()
+    recv = celery.events.Receiver(celery.connection(),
+                                  handlers={'*': state.event},
+                                  localize=name != 'nolocalize')
+    loads = anyjson.loads
+    time_start = time.time()
+    receive(recv, payloads, loads)
+    total = time.time() - time_start
+    print('-- {0}: {1} events in {2:.3f}s, {3:.0f} events/s'.format(
+        name, state.event_count, total, state.event_count / total))
+
+
+def receive_single(recv, payloads, loads):
+    # one event at a time, as before events were processed in batches.
+    process, from_message = recv.process, recv.event_from_message
+    for payload in payloads:
+        for event in loads(payload):
+            process(*from_message(event))
+
+
+def receive_batch(recv, payloads, loads):
+    process_events = recv.process_events
+    for payload in payloads:
+        process_events(loads(payload))
+
+
+BENCHMARKS = {
+    'single': receive_single,
+    'batch': receive_batch,
+    'nolocalize': receive_batch,
+}
+
+
+def main(argv=sys.argv):
+    if len(argv) < 2:
+        print('Usage: {0} [{1}|all] [n=300k]'.format(
+            os.path.basename(argv[0]), '|'.join(sorted(BENCHMARKS))))
+        return sys.exit(1)
+    n = int(argv[2]) if len(argv) > 2 else DEFAULT_ITS
+    print('anyjson implementation: {0!r}'.format(anyjson.implementation.name))
+    print('state: {0}'.format(celery.conf.CELERY_EVENT_STATE))
+    payloads = generate(n)
+    names = sorted(BENCHMARKS) if argv[1] == 'all' else [argv[1]]
+    for name in names:
+        bench(name, payloads, BENCHMARKS[name])
+
+
+if __name__ == '__main__':
+    main()